@@ -0,0 +1,163 @@
+"""
+Conditional and compressed responses for data-returning routes.
+
+Every JSON/file response gets a strong content-hash ETag and
+`Cache-Control: no-cache`, so clients revalidate with `If-None-Match` and
+get a bodiless 304 when nothing changed. Bodies above MIN_COMPRESS_SIZE are
+compressed with brotli (if installed) or gzip according to Accept-Encoding.
+A strong ETag names exact bytes, so compressed bodies carry the content
+hash with a "-gzip"/"-br" suffix; If-None-Match ignores the suffix, since
+every coding of the same content is equally fresh.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from app.services import serialization
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+MIN_COMPRESS_SIZE = int(os.getenv("HTTP_MIN_COMPRESS_SIZE", "1024"))
+CACHE_CONTROL = "no-cache"
+
+# (path, mtime, size) -> etag, so unchanged files aren't rehashed on every request
+_file_etags = {}
+_file_etags_lock = threading.Lock()
+
+
+ENCODINGS = ("br", "gzip")
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag for the content of `etag` sent with a content-coding: adds a -gzip/-br suffix"""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def _content_etag(tag: str) -> str:
+    # Weak comparison, and any content-coding of the same content matches
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def matching_etag(request: Request, etag: str) -> Optional[str]:
+    """
+    RFC 9110 If-None-Match against a comma-separated list or *: the
+    client's tag that matches `etag`'s content (in any coding), or None.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    if header.strip() == "*":
+        return etag
+    bare = _content_etag(etag)
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate and _content_etag(candidate) == bare:
+            return candidate
+    return None
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"})
+
+
+def _qvalue(params) -> float:
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def _negotiate_encoding(request: Request) -> Optional[str]:
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        # q=0 (or 0.0, 0.000) means "not acceptable"
+        if coding and _qvalue(params) > 0:
+            accepted.add(coding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compressed_response(request: Request, body: bytes, etag: str, media_type: str, headers: Optional[dict] = None) -> Response:
+    """Return `body` with caching headers, compressed when the client allows it"""
+    encoding = _negotiate_encoding(request) if len(body) >= MIN_COMPRESS_SIZE else None
+    headers = {"ETag": encoded_etag(etag, encoding), "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding",
+               **(headers or {})}
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)
+        headers["Content-Encoding"] = "br"
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def json_response(request: Request, payload: Any, etag: Optional[str] = None) -> Response:
+    """
+    Serialize `payload` and answer conditionally. When `etag` is supplied
+    (e.g. derived from a stored content hash) a matching If-None-Match is
+    answered before serializing anything; `payload` may then be a callable
+    so the body is only built when it is actually sent.
+    """
+    matched = etag and matching_etag(request, etag)
+    if matched:
+        return not_modified(matched)
+    if callable(payload):
+        payload = payload()
+    body = serialization.dumps(payload)
+    etag = etag or make_etag(body)
+    matched = matching_etag(request, etag)
+    if matched:
+        return not_modified(matched)
+    return compressed_response(request, body, etag, "application/json")
+
+
+def file_response(request: Request, path: str, media_type: str, filename: Optional[str] = None) -> Response:
+    """Serve a file with a content-hash ETag; raises FileNotFoundError if missing"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _file_etags_lock:
+        etag = _file_etags.get(key)
+    matched = etag and matching_etag(request, etag)
+    if matched:
+        return not_modified(matched)
+
+    with open(path, "rb") as f:
+        body = f.read()
+    if etag is None:
+        etag = make_etag(body)
+        with _file_etags_lock:
+            # Only the latest version of each file matters
+            for stale in [k for k in _file_etags if k[0] == path]:
+                del _file_etags[stale]
+            _file_etags[key] = etag
+        matched = matching_etag(request, etag)
+        if matched:
+            return not_modified(matched)
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'} if filename else None
+    return compressed_response(request, body, etag, media_type, headers)
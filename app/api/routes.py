@@ -1,32 +1,62 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from app.models.schemas import TariffRequest, TariffResponse
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import PlainTextResponse
+from app.api.responses import json_response, file_response
+from app.models.schemas import TariffRequest, TariffResponse, OptimizeRequest
+from app.models.database import get_db, get_async_db
 from app.services import pdf_service, ai_service, db_service
 from app.services import ai_service_simple
+from app.services import metrics, profiler, tariff_diff, optimizer, tariff_store, serialization, validation
+from app.services.cache_backend import get_cache
+from app.services.country_index import get_country_index
+from app.services.zone_index import get_zone_index, service_key
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import hashlib
+import os
+import time
 
-router = APIRouter()
+# ProfiledRoute: X-Profile requests also profile plain def endpoints on their threadpool thread
+router = APIRouter(route_class=profiler.ProfiledRoute)
+
+# Seconds an /optimize result stays cached; keys include the tariff version, so a reload never serves old prices
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "300"))
 
 class SimpleRequest(BaseModel):
     url: str
     force_refresh: bool = False  # Set to True to bypass cache
 
 @router.post("/ingest", response_model=TariffResponse)
-async def ingest_tariff(request: TariffRequest):
+async def ingest_tariff(request: TariffRequest, http_request: Request):
     """
     Ingest a Freight Tariff PDF URL, extract data, and return structured JSON.
     """
+    start = time.perf_counter()
     try:
+        # Zone views are a plain filter over the stored extraction - no model call needed -
+        # but only when that extraction came from this PDF; any other URL is extracted
+        if request.zone and request.zone != "all" and request.zone.isdigit():
+            snapshot = tariff_store.current()
+            if snapshot.zone_index and snapshot.source_url == request.url:
+                response = json_response(http_request, snapshot.zone_index.tariff_response(int(request.zone)))
+                metrics.pipeline_seconds.observe(time.perf_counter() - start, route="ingest", source="zone_index")
+                return response
+
         # 1. Download PDF
-        pdf_content = pdf_service.download_pdf(request.url)
+        with metrics.stage_seconds.time(route="ingest", stage="download"):
+            pdf_content = pdf_service.download_pdf(request.url)
         
         # 2. Extract Text
-        text_content = pdf_service.extract_text_from_pdf(pdf_content)
+        with metrics.stage_seconds.time(route="ingest", stage="extract_text"):
+            text_content = pdf_service.extract_text_from_pdf(pdf_content)
         
         # 3. Parse with AI
         # Note: This requires GEMINI_API_KEY to be set
-        parsed_data = ai_service.parse_tariff_data(text_content, request.zone)
+        with metrics.stage_seconds.time(route="ingest", stage="ai_parse"):
+            parsed_data = ai_service.parse_tariff_data(text_content, request.zone)
         
+        metrics.pipeline_seconds.observe(time.perf_counter() - start, route="ingest", source="ai")
         return parsed_data
         
     except HTTPException as e:
@@ -35,55 +65,79 @@ async def ingest_tariff(request: TariffRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/extract_full")
-async def extract_full_tariff(request: SimpleRequest):
+async def extract_full_tariff(request: SimpleRequest, http_request: Request, db: Session = Depends(get_db), async_db: AsyncSession = Depends(get_async_db)):
     """
     Extract complete tariff data with database caching.
     Uses chunked extraction to avoid token limits.
     """
+    start = time.perf_counter()
     try:
         # Check cache first (unless force_refresh is True)
         if not request.force_refresh:
-            cached_data = db_service.get_cached_data(request.url, max_age_days=30)
-            if cached_data:
-                return {
+            with metrics.stage_seconds.time(route="extract_full", stage="cache_lookup"):
+                cache = await db_service.get_cached_entry_async(request.url, max_age_days=30, session=async_db)
+            if cache:
+                # The stored content hash identifies the body, so revalidation needs no decompression
+                etag = f'"{cache.content_hash[:32]}-cache"' if cache.content_hash else None
+                response = json_response(http_request, lambda: {
                     "status": "success",
                     "source": "cache",
-                    "data": cached_data,
+                    "data": db_service.cache_payload(cache),
                     "message": "Data loaded from cache (less than 30 days old)"
-                }
+                }, etag=etag)
+                metrics.pipeline_seconds.observe(time.perf_counter() - start, route="extract_full", source="cache")
+                return response
         
         # Download and extract PDF
-        pdf_content = pdf_service.download_pdf(request.url)
-        text_content = pdf_service.extract_text_from_pdf(pdf_content)
+        with metrics.stage_seconds.time(route="extract_full", stage="download"):
+            pdf_content = pdf_service.download_pdf(request.url)
+        with metrics.stage_seconds.time(route="extract_full", stage="extract_text"):
+            text_content = pdf_service.extract_text_from_pdf(pdf_content)
         
         # Try AI extraction first, fall back to manual if quota exhausted
         try:
-            extracted_data = ai_service_simple.extract_full_tariff_chunked(text_content)
+            with metrics.stage_seconds.time(route="extract_full", stage="ai_extract"):
+                extracted_data = ai_service_simple.extract_full_tariff_chunked(text_content)
             extraction_method = "AI"
+            reextract = lambda service: ai_service_simple.extract_service_prices(text_content, service)
+            manual = False
         except Exception as e:
             # If AI fails (quota exhausted), use manual extraction
             if "429" in str(e) or "quota" in str(e).lower():
                 print("AI quota exhausted, using manual extraction...")
                 from app.services import manual_extractor
-                extracted_data = manual_extractor.extract_full_tariff_manual(text_content)
+                with metrics.stage_seconds.time(route="extract_full", stage="manual_extract"):
+                    extracted_data = manual_extractor.extract_full_tariff_manual(text_content)
                 extraction_method = "Manual (AI quota exhausted)"
+                # The regex extractor is deterministic; re-running it can't fix a table
+                reextract = None
+                manual = True
             else:
                 raise e
         
+        # Check the result against the last extraction of this PDF and re-extract only failing services
+        with metrics.stage_seconds.time(route="extract_full", stage="validate"):
+            reference = await db_service.get_cached_data_async(request.url, max_age_days=365, session=async_db)
+            extracted_data, report = validation.repair(extracted_data, reextract, reference=reference, manual=manual)
+        
         # Save to database
-        db_service.save_to_database(request.url, extracted_data)
+        with metrics.stage_seconds.time(route="extract_full", stage="save"):
+            db_service.save_to_database(request.url, extracted_data, session=db)
         
         # Export to JSON file
-        json_file = db_service.export_to_json('ups_data.json')
+        with metrics.stage_seconds.time(route="extract_full", stage="export_json"):
+            json_file = db_service.export_to_json('ups_data.json', session=db)
         
-        return {
+        metrics.pipeline_seconds.observe(time.perf_counter() - start, route="extract_full", source="fresh_extraction")
+        return json_response(http_request, {
             "status": "success",
             "source": "fresh_extraction",
             "extraction_method": extraction_method,
             "data": extracted_data,
+            "validation": report.to_dict(),
             "json_file": json_file,
             "message": f"Data extracted successfully using {extraction_method}"
-        }
+        })
         
     except HTTPException as e:
         raise e
@@ -91,13 +145,121 @@ async def extract_full_tariff(request: SimpleRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/download_json")
-async def download_json():
+async def download_json(request: Request):
     """Download the ups_data.json file"""
     try:
-        return FileResponse(
+        return file_response(
+            request,
             'ups_data.json',
             media_type='application/json',
             filename='ups_data.json'
         )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="JSON file not found. Please run /extract_full first.")
+
+@router.get("/countries/{query}")
+async def lookup_country(query: str, request: Request, limit: int = 10):
+    """Resolve a country by ISO code, name or alias, falling back to prefix/fuzzy matches"""
+    index = get_country_index()
+    country = index.resolve(query)
+    if country:
+        return json_response(request, {"query": query, "match": "exact", "results": [country]})
+
+    matches = index.search(query, limit=limit)
+    if not matches:
+        raise HTTPException(status_code=404, detail=f"No country matches '{query}'")
+    return json_response(request, {"query": query, "match": "partial", "results": matches})
+
+@router.get("/zones/{zone}/countries")
+async def countries_in_zone(zone: int, request: Request, service: Optional[str] = None, direction: Optional[str] = None):
+    """List countries in a zone, optionally for one service and export/import direction"""
+    if direction and direction not in ("export", "import"):
+        raise HTTPException(status_code=400, detail="direction must be 'export' or 'import'")
+    countries = get_zone_index().countries_in_zone(zone, service, direction)
+    return json_response(request, {"zone": zone, "service": service, "direction": direction, "count": len(countries), "countries": countries})
+
+@router.get("/ratecards/{country}")
+def rate_card(country: str, request: Request, service: Optional[str] = None, db: Session = Depends(get_db)):
+    """Precomputed, zone-resolved price grid for a country (ISO code, name or alias)"""
+    # Plain def: the sync session query runs in the threadpool, not on the event loop
+    country_index = get_country_index()
+    match = country_index.resolve(country)
+    if not match:
+        raise HTTPException(status_code=404, detail=f"No country matches '{country}'")
+    code = (match["code"] or "").upper()
+    if country.strip().upper() == code and code in country_index.duplicate_codes:
+        names = ", ".join(country_index.duplicate_codes[code])
+        raise HTTPException(status_code=409, detail=f"Country code {code} is shared by {names}; look up by name instead")
+    cards = db_service.get_rate_cards(match["code"], service_key(service) if service else None, country_name=match["name"], session=db)
+    if not cards:
+        raise HTTPException(status_code=404, detail=f"No rate card for {match['name']}")
+    return json_response(request, {"country": match, "count": len(cards), "rate_cards": cards})
+
+@router.post("/optimize")
+def optimize_shipments(request: OptimizeRequest, http_request: Request):
+    """Rank all services for each shipment by cost or speed, with batch totals per service"""
+    if request.objective not in optimizer.OBJECTIVES:
+        raise HTTPException(status_code=400, detail=f"objective must be one of {', '.join(optimizer.OBJECTIVES)}")
+    if any(s.item_type not in ("envelopes", "documents", "non_documents") for s in request.shipments):
+        raise HTTPException(status_code=400, detail="item_type must be 'envelopes', 'documents' or 'non_documents'")
+    if any(s.direction not in ("export", "import") for s in request.shipments):
+        raise HTTPException(status_code=400, detail="direction must be 'export' or 'import'")
+    # One snapshot for tariff and country lookups, so a concurrent reload can't mix versions
+    snapshot = tariff_store.current()
+    tariff = snapshot.tariff
+    if not tariff.services:
+        raise HTTPException(status_code=404, detail="No tariff loaded. Please run /extract_full first.")
+    services = [service_key(s) for s in request.services] if request.services else None
+    shipments = [s.model_dump() for s in request.shipments]
+
+    def price():
+        with metrics.stage_seconds.time(route="optimize", stage="price"):
+            return optimizer.optimize(
+                tariff,
+                shipments,
+                snapshot.country_index.resolve,
+                objective=request.objective,
+                services=services,
+            )
+
+    digest = hashlib.sha1(serialization.dumps([repr(snapshot.version), request.model_dump()])).hexdigest()
+    result = get_cache().get_or_set(f"quote:{digest}", price, QUOTE_CACHE_TTL, label="quote")
+    return json_response(http_request, result)
+
+def _load_version(version: str, db: Session) -> dict:
+    # "current" is the live countries/prices tables; anything else is a tariff_cache id.
+    # Blocking DB reads: only call from plain def routes, which run in the threadpool
+    if version == "current":
+        return db_service.get_all_data(session=db)
+    if not version.isdigit():
+        raise HTTPException(status_code=400, detail=f"Invalid version '{version}': use a tariff_cache id or 'current'")
+    data = db_service.get_cache_version(int(version), session=db)
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"Tariff version {version} not found")
+    return data
+
+@router.get("/tariffs/versions")
+def tariff_versions(request: Request, pdf_url: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    """List stored tariff versions (tariff_cache ids) usable with /tariffs/diff"""
+    versions = db_service.list_cache_versions(pdf_url, limit=limit, session=db)
+    return json_response(request, {"count": len(versions), "versions": versions})
+
+@router.get("/tariffs/diff")
+def diff_tariffs(request: Request, from_version: str = Query(..., alias="from"), to_version: str = Query("current", alias="to"), db: Session = Depends(get_db)):
+    """Price deltas, added/removed weight bands and country zone reassignments between two versions"""
+    diff = tariff_diff.diff_tariffs(_load_version(from_version, db), _load_version(to_version, db))
+    return json_response(request, {"from": from_version, "to": to_version, **diff})
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = "folded", x_admin_token: Optional[str] = Header(None)):
+    """Fetch a captured request profile (admin only) as folded stacks, pstats text or JSON"""
+    if not profiler.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    profile = profiler.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    if format == "folded":
+        return PlainTextResponse(profile["folded"])
+    if format == "pstats":
+        return PlainTextResponse(profile["pstats"])
+    return profile
@@ -1,23 +1,49 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.routes import router as api_router
+from app.models.database import init_db
+from app.services.tariff_store import get_tariff_store
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema setup happens here rather than at import time
+    init_db()
+    # Each worker keeps its tariff snapshot fresh in the background
+    store = get_tariff_store()
+    if store.poll_seconds > 0:
+        store.start()
+    yield
+    store.stop()
+
 app = FastAPI(
     title="FreightFlow Tariff API",
     description="AI-powered backend for ingesting and parsing Freight Tariff PDFs.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.include_router(api_router, prefix="/api/v1")
 
+from app.services.profiler import ProfilingMiddleware
+
+# Pass-through unless a request carries X-Profile with a valid admin token
+app.add_middleware(ProfilingMiddleware)
+
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
+from app.services import metrics
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 @app.get("/")
 async def root():
     return FileResponse('app/static/index.html')
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,7 +1,14 @@
+import itertools
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, JSON, DateTime
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, String, Float, JSON, DateTime, LargeBinary
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
 from datetime import datetime
 
 # Database configuration
@@ -10,19 +17,146 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Railway/Render provide DATABASE_URL starting with postgres://
 # SQLAlchemy 1.4+ requires postgresql:// instead of postgres://
-if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+def _normalize_url(url: str) -> str:
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+if DATABASE_URL:
+    DATABASE_URL = _normalize_url(DATABASE_URL)
 
 # Fallback to SQLite for local development
 if not DATABASE_URL:
     DATABASE_URL = "sqlite:///./tariff_data.db"
 
-# Create engine with appropriate settings
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
+# Optional read replicas (comma-separated). Reads are spread across them; writes always go to DATABASE_URL.
+REPLICA_URLS = [_normalize_url(url.strip()) for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# After a write, keep reading from the primary for this long so callers see their own writes
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+# Connection pool settings (shared by SQLite and PostgreSQL)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; stay under server/proxy idle timeouts
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Size of SQLAlchemy's compiled statement cache
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1000"))
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a write is in progress; NORMAL sync is safe under WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def make_engine(url: str):
+    """Create an engine with pool settings and, for SQLite, WAL pragmas"""
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url in ("sqlite://", "sqlite:///"):
+            return create_engine(url, connect_args={"check_same_thread": False}, query_cache_size=STATEMENT_CACHE_SIZE)
+        sqlite_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=QueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            query_cache_size=STATEMENT_CACHE_SIZE,
+        )
+        event.listen(sqlite_engine, "connect", _sqlite_pragmas)
+        return sqlite_engine
+
     # PostgreSQL settings
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_recycle=POOL_RECYCLE,
+        pool_timeout=POOL_TIMEOUT,
+        query_cache_size=STATEMENT_CACHE_SIZE,
+    )
+
+engine = make_engine(DATABASE_URL)
+replica_engines = [make_engine(url) for url in REPLICA_URLS]
+
+# Read/write routing
+_last_write_at = 0.0
+_force_primary = ContextVar("force_primary", default=False)
+_replica_counter = itertools.count()
+
+def mark_write():
+    """Record a committed write so reads stay on the primary for READ_YOUR_WRITES_SECONDS"""
+    global _last_write_at
+    _last_write_at = time.monotonic()
+
+@contextmanager
+def use_primary():
+    """Route every read inside this block to the primary"""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+def _prefer_primary() -> bool:
+    return _force_primary.get() or time.monotonic() - _last_write_at < READ_YOUR_WRITES_SECONDS
+
+class RoutingSession(Session):
+    """
+    Session that sends writes (and anything after a write in the same
+    transaction) to the primary and plain reads to a replica. Sessions are
+    spread round-robin over the replicas, but each session keeps the replica
+    it first read from until it is closed, so its reads don't see replicas
+    at different replication lag. Without replicas configured it behaves like
+    a normal Session.
+    """
+    primary = None
+    replicas = ()
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            not self.replicas
+            or self._flushing
+            or self.info.get("wrote")
+            or isinstance(clause, UpdateBase)
+            or _prefer_primary()
+        ):
+            return self.primary
+        replica = self.info.get("replica")
+        if replica is None:
+            replica = self.info["replica"] = self.replicas[next(_replica_counter) % len(self.replicas)]
+        return replica
+
+    def close(self):
+        # A session used again after close() picks a replica afresh
+        self.info.pop("replica", None)
+        super().close()
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _track_bulk_writes(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "after_flush")
+def _track_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "after_commit")
+def _track_commit(session):
+    if session.info.pop("wrote", False):
+        mark_write()
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _reset_after_rollback(session):
+    session.info.pop("wrote", None)
+
+class _SyncRoutingSession(RoutingSession):
+    primary = engine
+    replicas = tuple(replica_engines)
 
 Base = declarative_base()
 
@@ -31,7 +165,7 @@ class Country(Base):
     
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
-    code = Column(String, nullable=False)  # Removed unique constraint to allow duplicates
+    code = Column(String, nullable=False, index=True)  # Removed unique constraint to allow duplicates
     export_zone = Column(Integer)
     import_zone = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -51,10 +185,143 @@ class TariffCache(Base):
     __tablename__ = 'tariff_cache'
     
     id = Column(Integer, primary_key=True)
-    pdf_url = Column(String, nullable=False)
+    pdf_url = Column(String, nullable=False, index=True)
     extracted_at = Column(DateTime, default=datetime.utcnow)
-    data = Column(JSON, nullable=False)
+    data = Column(JSON, nullable=True)  # Legacy uncompressed payload; new rows use `payload`
+    payload = Column(LargeBinary, nullable=True)  # Compressed JSON (see cache_codec)
+    encoding = Column(String, nullable=True)  # zstd or gzip
+    content_hash = Column(String(64), nullable=True)  # sha256 of the canonical JSON
+    size_bytes = Column(Integer, nullable=True)  # Uncompressed JSON size
+
+class RateCard(Base):
+    __tablename__ = 'rate_cards'
+    
+    id = Column(Integer, primary_key=True)
+    country_code = Column(String, nullable=False, index=True)
+    service = Column(String, nullable=False)
+    export_zone = Column(Integer)
+    import_zone = Column(Integer)
+    card = Column(JSON, nullable=False)  # Zone-resolved price grid, see app.services.ratecards
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+def _create_missing_tables(bind):
+    # create_all, one table at a time, so a table another worker created first is skipped
+    for table in Base.metadata.sorted_tables:
+        try:
+            table.create(bind, checkfirst=True)
+        except DBAPIError:
+            if not inspect(bind).has_table(table.name):
+                raise
+
+def _add_missing_columns(bind):
+    # create_all doesn't alter existing tables; add columns introduced after a table was first created
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            try:
+                with bind.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            except DBAPIError:
+                # Every worker runs init_db at startup; another one may have added it first
+                if column.name not in {c["name"] for c in inspect(bind).get_columns(table.name)}:
+                    raise
+
+def _add_missing_indexes(bind):
+    # Likewise for indexes declared after a table was first created (e.g. countries.code)
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind, checkfirst=True)
+            except DBAPIError:
+                if index.name not in {i["name"] for i in inspect(bind).get_indexes(table.name)}:
+                    raise
+
+def init_db(bind=None):
+    """
+    Create missing tables, columns and indexes. Runs at startup in every
+    worker (app lifespan) and from CLI scripts before they touch the
+    database - not at import time. Safe to run from several processes at
+    once: DDL that fails because another process got there first is skipped.
+    """
+    bind = bind or engine
+    _create_missing_tables(bind)
+    _add_missing_columns(bind)
+    _add_missing_indexes(bind)
+
+SessionLocal = sessionmaker(class_=_SyncRoutingSession)
+
+def get_db():
+    """FastAPI dependency: one session per request, returned to the pool afterwards"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+# Async engine for read paths in async routes (asyncpg for PostgreSQL, aiosqlite locally).
+# Created lazily so CLI scripts that only use the sync engine don't need the async drivers.
+def to_async_url(url: str) -> str:
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+def make_async_engine(url: str):
+    """Async counterpart of make_engine with the same pool settings and SQLite pragmas"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_url = to_async_url(url)
+    if async_url.startswith("sqlite"):
+        async_engine = create_async_engine(async_url, query_cache_size=STATEMENT_CACHE_SIZE)
+        if ":memory:" not in async_url:
+            event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+        return async_engine
+    return create_async_engine(
+        async_url,
+        pool_pre_ping=True,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_recycle=POOL_RECYCLE,
+        pool_timeout=POOL_TIMEOUT,
+        query_cache_size=STATEMENT_CACHE_SIZE,
+    )
+
+_async_engine = None
+_async_sessionmaker = None
+
+def get_async_sessionmaker():
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _async_engine = make_async_engine(DATABASE_URL)
+        async_replicas = [make_async_engine(url) for url in REPLICA_URLS]
+        # AsyncSession drives a sync Session internally; route it over the async engines' sync facades
+        routing = type("_AsyncRoutingSession", (RoutingSession,), {
+            "primary": _async_engine.sync_engine,
+            "replicas": tuple(e.sync_engine for e in async_replicas),
+        })
+        _async_sessionmaker = async_sessionmaker(sync_session_class=routing, expire_on_commit=False)
+    return _async_sessionmaker
+
+async def get_async_db():
+    """FastAPI dependency: one AsyncSession per request for non-blocking reads"""
+    async with get_async_sessionmaker()() as session:
+        yield session
 
-# Database setup
-Base.metadata.create_all(engine)
-SessionLocal = sessionmaker(bind=engine)
+if __name__ == "__main__":
+    # python -m app.models.database - create/upgrade the schema without starting the app
+    init_db()
+    print("Database schema is up to date")
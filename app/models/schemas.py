@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 
 class TariffRequest(BaseModel):
@@ -31,3 +31,22 @@ class TariffResponse(BaseModel):
     countries: List[Country]
     zone_rates: Dict[str, List[ZoneRates]]  # service_name -> list of zone rates
     raw_data: Optional[Dict[str, Any]] = None
+
+class Piece(BaseModel):
+    weight_kg: float = Field(gt=0)
+    length_cm: float = Field(0.0, ge=0)  # 0 = dimensions not given
+    width_cm: float = Field(0.0, ge=0)
+    height_cm: float = Field(0.0, ge=0)
+
+class ShipmentRequest(BaseModel):
+    pieces: List[Piece] = Field(min_length=1)
+    country: Optional[str] = None  # ISO code, name or alias
+    zone: Optional[int] = None  # Explicit zone, overrides country lookup
+    direction: str = "export"  # "export" or "import"
+    item_type: str = "non_documents"  # "envelopes", "documents" or "non_documents"
+    reference: Optional[str] = None
+
+class OptimizeRequest(BaseModel):
+    shipments: List[ShipmentRequest]
+    objective: str = "cost"  # "cost" or "speed"
+    services: Optional[List[str]] = None  # Limit to these services (default: all six)
@@ -0,0 +1,257 @@
+"""
+Compact in-memory tariff model.
+
+The JSON shape produced by the extractors repeats zone keys and weight
+strings in every row. Here each row keeps its original label once, parsed
+numeric weight bounds, and a fixed-length array of zone prices, so lookups
+are arithmetic on floats instead of string parsing.
+
+`Tariff.from_dict(data)` and `tariff.to_dict()` convert losslessly to and
+from the existing {"countries": [...], "prices": {...}} shape.
+"""
+import math
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+ITEM_TYPES = ("envelopes", "documents", "non_documents")
+
+# Row kinds
+ENVELOPE = "envelope"  # flat envelope rate
+WEIGHT = "weight"  # single weight break, e.g. "1.5 kg"
+RANGE = "range"  # per-kg band, e.g. "21-44 kg"
+ABOVE = "above"  # open-ended band, e.g. "Above 1000 kg", "1000 kg or more"
+MINIMUM = "minimum"  # freight "Min rate"
+OTHER = "other"
+
+MISSING = math.nan
+INF = math.inf
+ENVELOPE_MAX_KG = 0.5
+
+_WEIGHT = re.compile(r"^\s*([\d.]+)\s*kg\s*$", re.I)
+_RANGE = re.compile(r"^\s*([\d.]+)\s*-\s*([\d.]+)\s*kg\s*$", re.I)
+_ABOVE = re.compile(r"^\s*above\s+([\d.]+)\s*kg\s*$", re.I)
+_OR_MORE = re.compile(r"^\s*([\d.]+)\s*kg\s+or\s+more\s*$", re.I)
+# Zones are 1-based; "zone_0" or "zone_01" would not round-trip through a
+# price slot, so those keys stay in raw_zones
+_ZONE_KEY = re.compile(r"^zone_([1-9]\d*)$")
+
+
+def parse_weight(label: str) -> Tuple[str, float, float]:
+    """Return (kind, min_kg, max_kg) for a weight label from the rate tables"""
+    text = (label or "").strip()
+    match = _WEIGHT.match(text)
+    if match:
+        value = float(match.group(1))
+        return WEIGHT, value, value
+    match = _RANGE.match(text)
+    if match:
+        return RANGE, float(match.group(1)), float(match.group(2))
+    match = _ABOVE.match(text) or _OR_MORE.match(text)
+    if match:
+        return ABOVE, float(match.group(1)), INF
+    lowered = text.lower()
+    if lowered.startswith("envelope"):
+        return ENVELOPE, 0.0, ENVELOPE_MAX_KG
+    if lowered.startswith("min"):
+        return MINIMUM, 0.0, 0.0
+    return OTHER, MISSING, MISSING
+
+
+@dataclass(slots=True)
+class RateRow:
+    label: str
+    kind: str
+    min_kg: float
+    max_kg: float
+    pricing_type: str
+    prices: array  # array('d'), one slot per zone; NaN = no price
+    integral: bool = True  # prices were ints in the source
+    explicit_pricing_type: bool = False  # source row carried a pricing_type key
+    raw_zones: Optional[Dict[str, Any]] = None  # null / non-numeric zone values, kept verbatim
+    extra: Optional[Dict[str, Any]] = None  # any other keys, kept for round-tripping
+
+    def price(self, zone: int) -> Optional[float]:
+        """Price for a 1-based zone number, or None if the row has none"""
+        if 1 <= zone <= len(self.prices):
+            value = self.prices[zone - 1]
+            if not math.isnan(value):
+                return value
+        return None
+
+    @classmethod
+    def from_dict(cls, row: Dict[str, Any], zone_count: int) -> "RateRow":
+        label = row.get("weight", "")
+        kind, min_kg, max_kg = parse_weight(label)
+        prices = array("d", [MISSING]) * zone_count
+        integral = True
+        raw_zones = {}
+        for key, value in (row.get("zones") or {}).items():
+            match = _ZONE_KEY.match(key)
+            if not match or isinstance(value, bool) or not isinstance(value, (int, float)):
+                raw_zones[key] = value
+                continue
+            prices[int(match.group(1)) - 1] = value
+            integral = integral and isinstance(value, int)
+        extra = {k: v for k, v in row.items() if k not in ("weight", "zones", "pricing_type")} or None
+        return cls(
+            label=label,
+            kind=kind,
+            min_kg=min_kg,
+            max_kg=max_kg,
+            pricing_type=row.get("pricing_type", "fixed"),
+            prices=prices,
+            integral=integral,
+            explicit_pricing_type="pricing_type" in row,
+            raw_zones=raw_zones or None,
+            extra=extra,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        zones = {}
+        for zone, value in enumerate(self.prices, start=1):
+            if not math.isnan(value):
+                zones[f"zone_{zone}"] = int(value) if self.integral else value
+        if self.raw_zones:
+            zones.update(self.raw_zones)
+        row = {"weight": self.label}
+        if self.explicit_pricing_type:
+            row["pricing_type"] = self.pricing_type
+        row["zones"] = zones
+        if self.extra:
+            row.update(self.extra)
+        return row
+
+
+def _zone_count(rows: List[Dict[str, Any]]) -> int:
+    count = 0
+    for row in rows:
+        for key in (row.get("zones") or {}):
+            match = _ZONE_KEY.match(key)
+            if match:
+                count = max(count, int(match.group(1)))
+    return count
+
+
+@dataclass(slots=True)
+class RateTable:
+    zone_count: int
+    rows: List[RateRow]
+    # Sorted upper bounds of single-weight rows and lower bounds of per-kg
+    # bands, for bisect lookups
+    weight_breaks: array = field(default_factory=lambda: array("d"))
+    weight_rows: List[RateRow] = field(default_factory=list)
+    band_starts: array = field(default_factory=lambda: array("d"))
+    band_rows: List[RateRow] = field(default_factory=list)
+    minimum_row: Optional[RateRow] = None
+
+    def __post_init__(self):
+        if not self.weight_rows:
+            singles = sorted((r for r in self.rows if r.kind == WEIGHT), key=lambda r: r.max_kg)
+            self.weight_rows = singles
+            self.weight_breaks = array("d", (r.max_kg for r in singles))
+        if not self.band_rows:
+            bands = sorted((r for r in self.rows if r.kind in (RANGE, ABOVE)), key=lambda r: (r.min_kg, r.max_kg))
+            self.band_rows = bands
+            self.band_starts = array("d", (r.min_kg for r in bands))
+        if self.minimum_row is None:
+            self.minimum_row = self.row_of_kind(MINIMUM)
+
+    def row_of_kind(self, kind: str) -> Optional[RateRow]:
+        for row in self.rows:
+            if row.kind == kind:
+                return row
+        return None
+
+    def row_for_weight(self, weight_kg: float) -> Optional[RateRow]:
+        """Smallest single-weight break that covers `weight_kg`"""
+        i = bisect_left(self.weight_breaks, weight_kg)
+        return self.weight_rows[i] if i < len(self.weight_rows) else None
+
+    def band_for_weight(self, weight_kg: float) -> Optional[RateRow]:
+        """Per-kg range or open-ended band containing `weight_kg`"""
+        i = bisect_right(self.band_starts, weight_kg) - 1
+        # Bands are inclusive at both ends; on a shared bound ("300-1000 kg" /
+        # "Above 1000 kg") the earlier band wins
+        if i > 0 and self.band_rows[i - 1].max_kg >= weight_kg:
+            i -= 1
+        if i >= 0 and weight_kg <= self.band_rows[i].max_kg:
+            return self.band_rows[i]
+        return None
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "RateTable":
+        zone_count = _zone_count(rows)
+        return cls(zone_count=zone_count, rows=[RateRow.from_dict(r, zone_count) for r in rows])
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        return [row.to_dict() for row in self.rows]
+
+
+@dataclass(slots=True)
+class ServiceTariff:
+    tables: Dict[str, RateTable]  # item_type -> table
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ServiceTariff":
+        tables = {item_type: RateTable.from_rows(data[item_type]) for item_type in data if item_type in ITEM_TYPES}
+        extra = {k: v for k, v in data.items() if k not in ITEM_TYPES} or None
+        return cls(tables=tables, extra=extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {item_type: table.to_rows() for item_type, table in self.tables.items()}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class CountryZones:
+    name: str
+    code: str
+    export_zone: Optional[int]
+    import_zone: Optional[int]
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CountryZones":
+        extra = {k: v for k, v in data.items() if k not in ("name", "code", "export_zone", "import_zone")} or None
+        return cls(data.get("name"), data.get("code"), data.get("export_zone"), data.get("import_zone"), extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"name": self.name, "code": self.code, "export_zone": self.export_zone, "import_zone": self.import_zone}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Tariff:
+    countries: List[CountryZones]
+    services: Dict[str, ServiceTariff]
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Tariff":
+        extra = {k: v for k, v in data.items() if k not in ("countries", "prices")} or None
+        return cls(
+            countries=[CountryZones.from_dict(c) for c in data.get("countries", [])],
+            services={name: ServiceTariff.from_dict(s) for name, s in data.get("prices", {}).items()},
+            extra=extra,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "countries": [c.to_dict() for c in self.countries],
+            "prices": {name: s.to_dict() for name, s in self.services.items()},
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def table(self, service: str, item_type: str) -> Optional[RateTable]:
+        service_tariff = self.services.get(service)
+        return service_tariff.tables.get(item_type) if service_tariff else None
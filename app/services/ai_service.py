@@ -1,21 +1,31 @@
 import os
 import json
-import google.generativeai as genai
 from fastapi import HTTPException
 from dotenv import load_dotenv
 from typing import Optional
+from app.services import metrics
 
 load_dotenv()
 
 # Configure Gemini
 api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
+_genai = None
+
+def _load_genai():
+    """Import and configure the Gemini SDK on first use - it dominates cold-start import time"""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        if api_key:
+            genai.configure(api_key=api_key)
+        _genai = genai
+    return _genai
 
 def parse_tariff_data(text: str, zone: Optional[str] = None) -> dict:
     if not api_key:
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
 
+    genai = _load_genai()
     model = genai.GenerativeModel('gemini-2.0-flash')
 
     # Determine which zones to extract rates for
@@ -160,20 +170,23 @@ def parse_tariff_data(text: str, zone: Optional[str] = None) -> dict:
     retries = 3
     for attempt in range(retries):
         try:
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    max_output_tokens=8192
+            with metrics.ai_call_seconds.time(operation="parse_tariff"):
+                response = model.generate_content(
+                    prompt,
+                    generation_config=genai.GenerationConfig(
+                        response_mime_type="application/json",
+                        max_output_tokens=8192
+                    )
                 )
-            )
             # Clean up response if it contains markdown code blocks (though JSON mode usually avoids this)
             cleaned_text = response.text.replace("```json", "").replace("```", "").strip()
             return json.loads(cleaned_text)
         except Exception as e:
             if "429" in str(e) and attempt < retries - 1:
                 print(f"429 Error (Resource Exhausted). Retrying in 5 seconds... (Attempt {attempt + 1}/{retries})")
+                metrics.ai_retries.inc(operation="parse_tariff")
                 time.sleep(5)
                 continue
             print(f"AI Parsing Error: {e}")
+            metrics.ai_errors.inc(operation="parse_tariff")
             raise HTTPException(status_code=500, detail=f"AI Parsing failed: {str(e)}")
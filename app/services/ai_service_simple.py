@@ -1,27 +1,52 @@
 import os
 import json
-import google.generativeai as genai
 from fastapi import HTTPException
 from dotenv import load_dotenv
 import time
 import re
+from app.services import metrics
+from app.services.chunk_planner import CountryChunk, estimate_tokens, merge_countries, plan_country_chunks
+from app.services.json_stream import RowStreamParser, StreamError
 
 load_dotenv()
 
 # Configure Gemini
 api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
+_genai = None
 
-def extract_countries_batch(text: str, letter_range: str) -> list:
-    """Extract countries starting with specific letters"""
+# Stream service price responses and validate rows as they arrive (AI_STREAM=0 waits for the full response)
+STREAM_RESPONSES = os.getenv("AI_STREAM", "1") == "1"
+# Rows between streamed progress lines
+PROGRESS_EVERY = 10
+
+def _load_genai():
+    """Import and configure the Gemini SDK on first use - it dominates cold-start import time"""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        if api_key:
+            genai.configure(api_key=api_key)
+        _genai = genai
+    return _genai
+
+def extract_countries_chunk(chunk: CountryChunk) -> list:
+    """Extract the countries in one planned slice of the zone table"""
     if not api_key:
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
 
+    genai = _load_genai()
     model = genai.GenerativeModel('gemini-2.0-flash')
 
+    if chunk.letters:
+        # Fallback chunk: the zone table wasn't located, so the model finds it in the leading text
+        scope = f"Extract ONLY countries starting with letters {chunk.letters} from the UPS Zone Table."
+        rule = f"ONLY include countries starting with {chunk.letters}"
+    else:
+        scope = "Extract EVERY country row from this slice of the UPS Zone Table."
+        rule = "One entry per country row below - do not add countries that are not listed"
+
     prompt = f"""
-    Extract ONLY countries starting with letters {letter_range} from the UPS Zone Table.
+    {scope}
     
     Return JSON array:
     [
@@ -34,41 +59,85 @@ def extract_countries_batch(text: str, letter_range: str) -> list:
     ]
     
     Rules:
-    1. Extract from Zone Table (pages 6-9)
+    1. {rule}
     2. Use export_zone for "Express" service column
     3. Use import_zone for "Express" service column  
     4. If no zone number, use null
-    5. ONLY include countries starting with {letter_range}
     
-    Text:
-    {text[:40000]}
+    Zone Table rows:
+    {chunk.text}
     """
+    metrics.ai_prompt_tokens.inc(estimate_tokens(prompt), operation="countries_batch")
 
     retries = 3
     for attempt in range(retries):
         try:
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    max_output_tokens=4096
+            with metrics.ai_call_seconds.time(operation="countries_batch"):
+                response = model.generate_content(
+                    prompt,
+                    generation_config=genai.GenerationConfig(
+                        response_mime_type="application/json",
+                        max_output_tokens=4096
+                    )
                 )
-            )
             cleaned_text = response.text.replace("```json", "").replace("```", "").strip()
             return json.loads(cleaned_text)
         except Exception as e:
             if "429" in str(e) and attempt < retries - 1:
                 print(f"429 Error. Retrying in 5 seconds...")
+                metrics.ai_retries.inc(operation="countries_batch")
                 time.sleep(5)
                 continue
-            print(f"AI Parsing Error for {letter_range}: {e}")
+            print(f"AI Parsing Error for {chunk.label}: {e}")
+            metrics.ai_errors.inc(operation="countries_batch")
             return []
 
-def extract_service_prices(text: str, service: str) -> dict:
-    """Extract prices for a single service with regex fallback for envelopes"""
+def _chunk_text(chunk) -> str:
+    # Chunks carrying only a finish reason or safety data have no text
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+def _print_progress(service: str, section: str, rows: int):
+    if rows % PROGRESS_EVERY == 0:
+        print(f"    {service}: {rows} {section} rows parsed...")
+
+def _stream_service_prices(model, genai, prompt: str, service: str, progress=None) -> dict:
+    """
+    Stream one service's response, parsing and validating each row as it
+    completes. Raises StreamError on the first malformed row so the caller
+    can retry without waiting for the rest of the output.
+    """
+    progress = progress or _print_progress
+    start = time.perf_counter()
+    response = model.generate_content(
+        prompt,
+        generation_config=genai.GenerationConfig(
+            response_mime_type="application/json",
+            max_output_tokens=8192
+        ),
+        stream=True
+    )
+    parser = RowStreamParser()
+    counts = {}
+    for chunk in response:
+        for section, _ in parser.feed(_chunk_text(chunk)):
+            if not counts:
+                metrics.ai_first_row_seconds.observe(time.perf_counter() - start, operation="service_prices")
+            counts[section] = counts.get(section, 0) + 1
+            progress(service, section, counts[section])
+    return parser.finish()
+
+def extract_service_prices(text: str, service: str, progress=None) -> dict:
+    """
+    Extract prices for a single service with regex fallback for envelopes.
+    `progress(service, section, rows)` is called per parsed row when streaming.
+    """
     if not api_key:
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
 
+    genai = _load_genai()
     model = genai.GenerativeModel('gemini-2.0-flash')
 
     service_map = {
@@ -184,19 +253,24 @@ def extract_service_prices(text: str, service: str) -> dict:
     Text (full PDF text):
     {text}
     """
+    metrics.ai_prompt_tokens.inc(estimate_tokens(prompt), operation="service_prices")
 
     retries = 3
     for attempt in range(retries):
         try:
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    max_output_tokens=8192
-                )
-            )
-            cleaned_text = response.text.replace("```json", "").replace("```", "").strip()
-            result = json.loads(cleaned_text)
+            with metrics.ai_call_seconds.time(operation="service_prices"):
+                if STREAM_RESPONSES:
+                    result = _stream_service_prices(model, genai, prompt, service, progress)
+                else:
+                    response = model.generate_content(
+                        prompt,
+                        generation_config=genai.GenerationConfig(
+                            response_mime_type="application/json",
+                            max_output_tokens=8192
+                        )
+                    )
+                    cleaned_text = response.text.replace("```json", "").replace("```", "").strip()
+                    result = json.loads(cleaned_text)
             
             # Add regex-extracted envelope data
             if envelope_data:
@@ -213,44 +287,57 @@ def extract_service_prices(text: str, service: str) -> dict:
             
             return result
         except Exception as e:
+            if isinstance(e, StreamError) and attempt < retries - 1:
+                # Malformed output is usually a one-off - retry straight away
+                print(f"    {service}: invalid response ({e}), retrying...")
+                metrics.ai_retries.inc(operation="service_prices")
+                continue
             if "429" in str(e) and attempt < retries - 1:
                 print(f"429 Error. Retrying in 5 seconds...")
+                metrics.ai_retries.inc(operation="service_prices")
                 time.sleep(5)
                 continue
             print(f"AI Parsing Error for {service}: {e}")
+            metrics.ai_errors.inc(operation="service_prices")
             # Return structure with regex envelope data if available
             result = {"envelopes": [], "documents": [], "non_documents": []}
             if envelope_data:
                 result['envelopes'] = [envelope_data]
             return result
 
-def extract_full_tariff_chunked(text: str) -> dict:
-    """Extract complete tariff data using chunked approach with parallel processing"""
+def _timed_service_prices(text: str, service: str, progress=None) -> dict:
+    with metrics.extraction_seconds.time(service=service, method="ai"):
+        return extract_service_prices(text, service, progress)
+
+def extract_full_tariff_chunked(text: str, progress=None):
+    """
+    Extract complete tariff data using chunked approach with parallel processing.
+    `progress` is passed to extract_service_prices for streamed row updates.
+    """
     from concurrent.futures import ThreadPoolExecutor, as_completed
     
-    print("Extracting countries in parallel...")
-    all_countries = []
-    
-    # Extract countries in parallel
-    batches = ["A-C", "D-F", "G-I", "J-L", "M-O", "P-R", "S-U", "V-Z"]
+    chunks = plan_country_chunks(text)
+    print(f"Extracting countries in parallel ({len(chunks)} chunks)...")
+    results = [[] for _ in chunks]
     
     with ThreadPoolExecutor(max_workers=4) as executor:
-        # Submit all country batch jobs
-        future_to_batch = {
-            executor.submit(extract_countries_batch, text, batch): batch 
-            for batch in batches
+        # Submit all country chunk jobs
+        future_to_chunk = {
+            executor.submit(extract_countries_chunk, chunk): chunk 
+            for chunk in chunks
         }
         
         # Collect results as they complete
-        for future in as_completed(future_to_batch):
-            batch = future_to_batch[future]
+        for future in as_completed(future_to_chunk):
+            chunk = future_to_chunk[future]
             try:
-                countries = future.result()
-                all_countries.extend(countries)
-                print(f"  ✓ Extracted countries {batch}: {len(countries)} countries")
+                results[chunk.index] = future.result()
+                print(f"  ✓ Extracted countries {chunk.label}: {len(results[chunk.index])} of {len(chunk.rows)} rows")
             except Exception as e:
-                print(f"  ✗ Error extracting {batch}: {e}")
+                print(f"  ✗ Error extracting {chunk.label}: {e}")
     
+    # Merge in table order so duplicates resolve the same way every run
+    all_countries = merge_countries(results)
     print(f"Total countries extracted: {len(all_countries)}")
     
     print("\nExtracting prices for all services in parallel...")
@@ -260,7 +347,7 @@ def extract_full_tariff_chunked(text: str) -> dict:
     with ThreadPoolExecutor(max_workers=3) as executor:
         # Submit all service jobs
         future_to_service = {
-            executor.submit(extract_service_prices, text, service): service 
+            executor.submit(_timed_service_prices, text, service, progress): service 
             for service in services
         }
         
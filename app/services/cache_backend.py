@@ -0,0 +1,295 @@
+"""
+Pluggable cache for hot results shared across requests (and, with Redis,
+across app instances).
+
+Two backends with the same interface:
+  - MemoryCache: in-process LRU with per-entry TTL and an entry limit
+  - RedisCache: any Redis-protocol server (Redis, Valkey, KeyDB, fakeredis)
+
+get_or_set() adds stampede protection: concurrent misses for one key in a
+process share a single load, and RedisCache also takes a short SET NX lock
+so only one instance recomputes while the others wait for its result. The
+lock holds a random token and is released only by its owner, so a load
+that outlives LOCK_TTL can't delete another instance's lock.
+
+    CACHE_BACKEND=memory|redis|none   (default memory)
+    REDIS_URL=redis://localhost:6379/0
+    CACHE_MAX_ENTRIES=256             (memory backend)
+    CACHE_DEFAULT_TTL=3600            (seconds)
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from app.services import metrics, serialization
+
+BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+DEFAULT_TTL = float(os.getenv("CACHE_DEFAULT_TTL", "3600"))
+KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "freightflow:")
+
+# How long a Redis recompute lock is held, and how long other instances wait on it
+LOCK_TTL = float(os.getenv("CACHE_LOCK_TTL", "30"))
+LOCK_POLL = 0.05
+
+# Delete the lock only if it still holds our token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class CacheBackend(ABC):
+    """Interface shared by the cache backends. Values must be JSON-serializable."""
+
+    name = "base"
+
+    def __init__(self):
+        self._inflight: Dict[str, threading.Lock] = {}
+        self._inflight_lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._inflight_lock:
+            if key not in self._inflight:
+                self._inflight[key] = threading.Lock()
+            return self._inflight[key]
+
+    def _release_key_lock(self, key: str):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+
+    def _load_and_set(self, key: str, loader: Callable[[], Any], ttl: Optional[float]):
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def get_or_set(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None, label: str = "default") -> Any:
+        """
+        Return the cached value for `key`, or call `loader()` once and cache
+        its result. None results are returned but not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            metrics.cache_requests.inc(cache=label, result="hit")
+            return value
+
+        lock = self._key_lock(key)
+        with lock:
+            # Another thread may have loaded it while we waited
+            value = self.get(key)
+            if value is not None:
+                metrics.cache_requests.inc(cache=label, result="hit")
+                return value
+            metrics.cache_requests.inc(cache=label, result="miss")
+            try:
+                return self._load_and_set(key, loader, ttl)
+            finally:
+                self._release_key_lock(key)
+
+
+class NullCache(CacheBackend):
+    """Caching disabled: every lookup misses"""
+
+    name = "none"
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """Thread-safe in-process LRU. Cached objects are shared - callers must not mutate them."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, default_ttl: float = DEFAULT_TTL):
+        super().__init__()
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl > 0 else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """
+    Redis-protocol backend. Values are stored as JSON under KEY_PREFIX; the
+    server's own maxmemory policy bounds total size. Pass any client with
+    the redis-py API (e.g. fakeredis.FakeRedis() in tests).
+    """
+
+    name = "redis"
+
+    def __init__(self, client=None, url: str = REDIS_URL, default_ttl: float = DEFAULT_TTL, prefix: str = KEY_PREFIX):
+        super().__init__()
+        if client is None:
+            # Imported here so the default memory backend doesn't pay for redis-py at startup
+            try:
+                import redis
+            except ImportError:  # optional dependency
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self._scripting = True  # cleared if the server rejects EVAL
+
+    def _k(self, key: str) -> str:
+        return self.prefix + key
+
+    def get(self, key):
+        raw = self.client.get(self._k(key))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        body = serialization.dumps(value)
+        if ttl > 0:
+            self.client.set(self._k(key), body, px=max(1, int(ttl * 1000)))
+        else:
+            self.client.set(self._k(key), body)
+
+    def delete(self, key):
+        self.client.delete(self._k(key))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+    def _load_and_set(self, key, loader, ttl):
+        # Cross-instance single flight: whoever wins the NX lock recomputes,
+        # the rest wait for its value (or for the lock to lapse)
+        lock_key = self._k(key) + ":lock"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_TTL
+        while not self.client.set(lock_key, token, nx=True, px=int(LOCK_TTL * 1000)):
+            time.sleep(LOCK_POLL)
+            value = self.get(key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                break
+        try:
+            # The previous holder may have stored the value just before we got the lock
+            value = self.get(key)
+            if value is not None:
+                return value
+            return super()._load_and_set(key, loader, ttl)
+        finally:
+            self._release_lock(lock_key, token)
+
+    def _release_lock(self, lock_key: str, token: str):
+        from redis.exceptions import ResponseError, WatchError
+
+        if self._scripting:
+            try:
+                self.client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                return
+            except ResponseError:
+                # No scripting on this server; fall back to an optimistic transaction
+                self._scripting = False
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(lock_key)
+                held = pipe.get(lock_key)
+                if held in (token, token.encode()):
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+            except WatchError:
+                pass  # the lock changed hands meanwhile, so it isn't ours to delete
+
+
+def make_backend(kind: str = BACKEND) -> CacheBackend:
+    if kind == "redis":
+        return RedisCache()
+    if kind == "none":
+        return NullCache()
+    return MemoryCache()
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_cache() -> CacheBackend:
+    """Return the process-wide cache backend selected by CACHE_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend()
+    return _backend
+
+
+def set_cache(backend: CacheBackend):
+    """Swap the process-wide backend (tests, or wiring a pre-built client)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,55 @@
+"""
+Compression for stored tariff payloads.
+
+Payloads are serialized as canonical JSON, hashed (sha256) and compressed
+with zstd when the `zstandard` package is installed, otherwise gzip.
+"""
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+DEFAULT_ENCODING = os.getenv("CACHE_COMPRESSION") or ("zstd" if zstandard else "gzip")
+ZSTD_LEVEL = int(os.getenv("CACHE_ZSTD_LEVEL", "10"))
+GZIP_LEVEL = int(os.getenv("CACHE_GZIP_LEVEL", "6"))
+
+
+def canonical_json(data: Any) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def content_hash(data: Any) -> str:
+    return hashlib.sha256(canonical_json(data)).hexdigest()
+
+
+def encode(data: Any, encoding: str = DEFAULT_ENCODING) -> Tuple[bytes, str, str, int]:
+    """Return (compressed payload, encoding, content hash, uncompressed size)"""
+    raw = canonical_json(data)
+    digest = hashlib.sha256(raw).hexdigest()
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("CACHE_COMPRESSION=zstd requires the 'zstandard' package")
+        payload = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    elif encoding == "gzip":
+        payload = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        raise ValueError(f"Unknown cache encoding: {encoding}")
+    return payload, encoding, digest, len(raw)
+
+
+def decode(payload: bytes, encoding: str) -> Any:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Cached payload is zstd-compressed but 'zstandard' is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    elif encoding == "gzip":
+        raw = gzip.decompress(payload)
+    else:
+        raise ValueError(f"Unknown cache encoding: {encoding}")
+    return json.loads(raw)
@@ -0,0 +1,166 @@
+"""
+Plans the country extraction prompts.
+
+Instead of sending the first 40,000 characters of the PDF once per fixed
+letter range, the zone table rows are located in the text and split into
+contiguous slices of near-equal row count, each small enough to stay under
+a prompt token budget. Each slice becomes one prompt, so no batch is much
+slower than the others and no prompt carries the rate tables.
+
+    COUNTRY_CHUNK_TOKENS=3000   token budget for the zone-table text of one prompt
+    COUNTRY_CHUNK_MAX_ROWS=60   cap on rows per prompt (bounds the response size)
+"""
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+CHUNK_TOKENS = int(os.getenv("COUNTRY_CHUNK_TOKENS", "3000"))
+CHUNK_MAX_ROWS = int(os.getenv("COUNTRY_CHUNK_MAX_ROWS", "60"))
+
+# Rough chars-per-token for Gemini on tabular English text; only used for budgeting
+CHARS_PER_TOKEN = 4
+
+# Where the zone table starts and where the rate tables take over
+_TABLE_START = re.compile(r"Zone\s+Table|Country.*?Export\s+Zone", re.IGNORECASE)
+_TABLE_END = re.compile(r"^Export\s*-|^UPS Worldwide", re.MULTILINE)
+# A country row starts with a letter and carries at least one zone number
+_ROW = re.compile(r"^[^\W\d_].*\d")
+
+# Used when the table can't be located: the fixed batches' slice of text,
+# asked for one letter range at a time so each response stays small
+FALLBACK_CHARS = 40000
+FALLBACK_LETTER_RANGES = ("A-C", "D-F", "G-I", "J-L", "M-O", "P-R", "S-U", "V-Z")
+
+
+@dataclass
+class CountryChunk:
+    index: int
+    rows: List[str]
+    header: str = ""
+    letters: Optional[str] = None  # fallback chunks: only countries starting with these letters
+
+    @property
+    def label(self) -> str:
+        """Human-readable range, e.g. 'Afghanistan..Bahrain'"""
+        if self.letters:
+            return f"letters {self.letters}"
+        if not self.rows:
+            return f"chunk {self.index + 1}"
+        return f"{_row_name(self.rows[0])}..{_row_name(self.rows[-1])}"
+
+    @property
+    def text(self) -> str:
+        return "\n".join(filter(None, [self.header] + self.rows))
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _row_name(row: str) -> str:
+    match = re.match(r"[^\d]+", row)
+    return (match.group(0) if match else row).strip()
+
+
+def _section_rows(section: str):
+    header, rows = [], []
+    for line in section.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if _ROW.match(line):
+            rows.append(line)
+        elif not rows:
+            header.append(line)
+        # Repeated page headers inside the table are dropped
+    return "\n".join(header), rows
+
+
+def zone_table(text: str):
+    """
+    (header, rows) of the country zone table, or None when it can't be found.
+    "Zone Table" can also appear in a contents page or running headers, so
+    every candidate section is scanned and the one with the most rows wins.
+    """
+    best = None
+    for start in _TABLE_START.finditer(text):
+        line_start = text.rfind("\n", 0, start.start()) + 1
+        end = _TABLE_END.search(text, start.end())
+        header, rows = _section_rows(text[line_start:end.start() if end else len(text)])
+        if rows and (best is None or len(rows) > len(best[1])):
+            best = (header, rows)
+    return best
+
+
+def _split_even(rows: List[str], parts: int) -> List[List[str]]:
+    size, extra = divmod(len(rows), parts)
+    slices, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(rows[start:end])
+        start = end
+    return slices
+
+
+def plan_country_chunks(text: str, max_tokens: int = CHUNK_TOKENS, max_rows: int = CHUNK_MAX_ROWS) -> List[CountryChunk]:
+    """
+    Split the zone table into the fewest balanced slices that each fit
+    `max_tokens` and `max_rows`. When no zone table is recognised, falls
+    back to one chunk of the leading text per FALLBACK_LETTER_RANGES entry.
+    """
+    table = zone_table(text)
+    if table is None:
+        leading = text[:FALLBACK_CHARS]
+        return [CountryChunk(index=i, rows=[], header=leading, letters=letters)
+                for i, letters in enumerate(FALLBACK_LETTER_RANGES)]
+    header, rows = table
+
+    header_tokens = estimate_tokens(header)
+    row_tokens = estimate_tokens("\n".join(rows))
+    budget = max(1, max_tokens - header_tokens)
+    parts = max(1, math.ceil(len(rows) / max_rows), math.ceil(row_tokens / budget))
+    while True:
+        slices = _split_even(rows, parts)
+        # Rows vary in length, so an even split can still overshoot; add a part and retry
+        if parts >= len(rows) or all(estimate_tokens("\n".join(s)) <= budget for s in slices):
+            break
+        parts += 1
+    return [CountryChunk(index=i, rows=s, header=header) for i, s in enumerate(slices)]
+
+
+def _country_key(country: dict) -> Optional[str]:
+    code = (country.get("code") or "").strip().upper()
+    if code:
+        return code
+    name = (country.get("name") or "").strip().lower()
+    return f"name:{name}" if name else None
+
+
+def merge_countries(batches: Iterable[List[dict]]) -> List[dict]:
+    """
+    Concatenate per-chunk results in table order, dropping duplicates by
+    country code (rows on a slice boundary can come back twice). The first
+    occurrence wins; zones it is missing are filled from later duplicates.
+    """
+    merged: Dict[str, dict] = {}
+    for countries in batches:
+        for country in countries or []:
+            if not isinstance(country, dict):
+                continue
+            key = _country_key(country)
+            if key is None:
+                continue
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = dict(country)
+                continue
+            for field, value in country.items():
+                if existing.get(field) is None and value is not None:
+                    existing[field] = value
+    return list(merged.values())
@@ -0,0 +1,136 @@
+"""
+In-memory country lookup index.
+
+Built once from the stored country-zone table and rebuilt after every
+save, so lookups by ISO code, name or alias are plain dict hits instead of
+scans over the `countries` list.
+"""
+import bisect
+import difflib
+import re
+import unicodedata
+from typing import Dict, List, Optional, Any
+
+# Common alternative spellings -> canonical (normalized) names as they appear in the tariff guide.
+# The first candidate present in the index wins.
+ALIASES = {
+    "uk": ["united kingdom"],
+    "gb": ["united kingdom"],
+    "great britain": ["united kingdom"],
+    "britain": ["united kingdom"],
+    "england": ["united kingdom"],
+    "usa": ["united states", "united states of america"],
+    "us": ["united states", "united states of america"],
+    "america": ["united states", "united states of america"],
+    "uae": ["united arab emirates"],
+    "emirates": ["united arab emirates"],
+    "holland": ["netherlands", "netherlands the"],
+    "south korea": ["korea south", "korea republic of", "korea"],
+    "korea": ["korea south", "korea republic of"],
+    "russia": ["russian federation", "russia"],
+    "czechia": ["czech republic"],
+    "vietnam": ["viet nam", "vietnam"],
+    "ivory coast": ["cote d ivoire", "cote divoire"],
+    "burma": ["myanmar"],
+    "macau": ["macao", "macau sar china"],
+    "hong kong": ["hong kong sar china", "hong kong"],
+    "turkiye": ["turkey"],
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(value: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = value.encode("ascii", "ignore").decode("ascii").lower()
+    return _NON_ALNUM.sub(" ", value).strip()
+
+
+class CountryIndex:
+    """Hash index over country records keyed by code, normalized name and alias"""
+
+    def __init__(self, countries: List[Dict[str, Any]]):
+        self.countries = countries
+        self.by_code: Dict[str, Dict[str, Any]] = {}
+        self.by_name: Dict[str, Dict[str, Any]] = {}
+        self.by_alias: Dict[str, Dict[str, Any]] = {}
+        self.duplicate_codes: Dict[str, List[str]] = {}
+
+        for country in countries:
+            code = (country.get("code") or "").upper()
+            name = normalize(country.get("name", ""))
+            if code:
+                if code in self.by_code:
+                    # Keep the first record; remember the clash so it can be reported
+                    self.duplicate_codes.setdefault(code, [self.by_code[code]["name"]]).append(country["name"])
+                else:
+                    self.by_code[code] = country
+            if name and name not in self.by_name:
+                self.by_name[name] = country
+
+        for alias, candidates in ALIASES.items():
+            for candidate in candidates:
+                if candidate in self.by_name:
+                    self.by_alias[alias] = self.by_name[candidate]
+                    break
+
+        # Sorted keys for prefix matching on user input
+        self._sorted_names = sorted(self.by_name)
+
+    def __len__(self) -> int:
+        return len(self.countries)
+
+    def resolve(self, query: str) -> Optional[Dict[str, Any]]:
+        """Exact O(1) lookup by ISO code, name or alias"""
+        if not query:
+            return None
+        stripped = query.strip()
+        if len(stripped) <= 3:
+            country = self.by_code.get(stripped.upper())
+            if country:
+                return country
+        key = normalize(stripped)
+        return self.by_name.get(key) or self.by_alias.get(key)
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Exact match first, then name prefix matches, then fuzzy matches"""
+        results: List[Dict[str, Any]] = []
+        seen = set()
+
+        def add(country):
+            if country is not None and id(country) not in seen:
+                seen.add(id(country))
+                results.append(country)
+
+        add(self.resolve(query))
+        key = normalize(query)
+        if not key:
+            return results
+
+        # Prefix matches via binary search over the sorted names
+        pos = bisect.bisect_left(self._sorted_names, key)
+        while pos < len(self._sorted_names) and len(results) < limit:
+            name = self._sorted_names[pos]
+            if not name.startswith(key):
+                break
+            add(self.by_name[name])
+            pos += 1
+
+        for alias, country in self.by_alias.items():
+            if len(results) >= limit:
+                break
+            if alias.startswith(key):
+                add(country)
+
+        if len(results) < limit:
+            for name in difflib.get_close_matches(key, self._sorted_names, n=limit, cutoff=0.75):
+                add(self.by_name[name])
+
+        return results[:limit]
+
+
+def get_country_index() -> CountryIndex:
+    """Return the index from this process's current tariff snapshot (see tariff_store)"""
+    from app.services.tariff_store import current
+    return current().country_index
@@ -1,116 +1,365 @@
-import json
+import asyncio
+import os
+import time
+from contextlib import contextmanager, asynccontextmanager
 from datetime import datetime, timedelta
-from app.models.database import SessionLocal, Country, Price, TariffCache
+from typing import Dict
+from sqlalchemy import JSON, func, select
+from app.models.database import SessionLocal, Country, Price, TariffCache, get_async_sessionmaker
+from app.services.tariff_store import get_tariff_store
+from app.services import metrics, cache_codec, serialization, ratecards, tariff_diff
+from app.services.cache_backend import get_cache
 
-def get_cached_data(pdf_url: str, max_age_days: int = 30):
-    """Check if we have cached data for this PDF URL that's less than max_age_days old"""
-    session = SessionLocal()
-    try:
-        cache = session.query(TariffCache).filter(
-            TariffCache.pdf_url == pdf_url
-        ).order_by(TariffCache.extracted_at.desc()).first()
-        
-        if cache:
-            age = datetime.utcnow() - cache.extracted_at
-            if age.days < max_age_days:
-                return cache.data
-        return None
-    finally:
-        session.close()
+# Number of extractions kept per PDF URL in tariff_cache
+CACHE_RETENTION_VERSIONS = int(os.getenv("CACHE_RETENTION_VERSIONS", "3"))
+# How long a fresh extraction stays in the shared cache in front of tariff_cache.
+# Saves clear the key on the saving instance; other in-process caches expire after this.
+EXTRACTION_CACHE_TTL = float(os.getenv("EXTRACTION_CACHE_TTL", "300"))
 
-def save_to_database(pdf_url: str, data: dict):
-    """Save extracted data to database"""
+@contextmanager
+def _session_scope(session=None):
+    """Use the caller's (request-scoped) session if given, otherwise open and close one"""
+    if session is not None:
+        yield session
+        return
     session = SessionLocal()
     try:
-        # Delete existing cache for this URL to avoid UPDATE operations
-        session.query(TariffCache).filter(TariffCache.pdf_url == pdf_url).delete()
-        
-        # Delete existing countries and prices to start fresh
-        session.query(Country).delete()
-        session.query(Price).delete()
-        
-        # Save countries
-        for country_data in data.get('countries', []):
-            country = Country(
-                name=country_data['name'],
-                code=country_data['code'],
-                export_zone=country_data.get('export_zone'),
-                import_zone=country_data.get('import_zone')
-            )
-            session.add(country)
-        
-        # Save prices
-        for service, service_data in data.get('prices', {}).items():
-            for item_type in ['envelopes', 'documents', 'non_documents']:
-                if item_type in service_data:
-                    for price_entry in service_data[item_type]:
-                        price = Price(
-                            service=service,
-                            item_type=item_type,
-                            weight=price_entry['weight'],
-                            pricing_type=price_entry.get('pricing_type', 'fixed'),
-                            zones=price_entry['zones']
-                        )
-                        session.add(price)
-        
-        # Save cache entry
-        cache = TariffCache(
-            pdf_url=pdf_url,
-            data=data
-        )
-        session.add(cache)
-        
-        session.commit()
-        return True
-    except Exception as e:
-        session.rollback()
-        raise e
+        yield session
     finally:
         session.close()
 
-def get_all_data():
-    """Retrieve all data from database"""
-    session = SessionLocal()
-    try:
-        countries = session.query(Country).all()
-        prices = session.query(Price).all()
-        
-        # Convert to dict format
-        countries_list = [
+@asynccontextmanager
+async def _async_session_scope(session=None):
+    """Async counterpart of _session_scope"""
+    if session is not None:
+        yield session
+        return
+    async with get_async_sessionmaker()() as session:
+        yield session
+
+def _latest_cache_query(pdf_url: str):
+    return select(TariffCache).where(
+        TariffCache.pdf_url == pdf_url
+    ).order_by(TariffCache.extracted_at.desc()).limit(1)
+
+def cache_payload(cache):
+    """Decompressed data of a TariffCache row (legacy rows keep it uncompressed in `data`)"""
+    if cache.payload is not None:
+        return cache_codec.decode(cache.payload, cache.encoding)
+    return cache.data
+
+def _fresh_cache_entry(cache, max_age_days: int):
+    if cache:
+        age = datetime.utcnow() - cache.extracted_at
+        if age.days < max_age_days:
+            metrics.cache_requests.inc(cache="tariff_cache", result="hit")
+            return cache
+    metrics.cache_requests.inc(cache="tariff_cache", result="miss")
+    return None
+
+class SharedCacheEntry:
+    """A tariff_cache row as held in the shared cache backend (payload already decoded)"""
+    __slots__ = ("pdf_url", "extracted_at", "content_hash", "data", "payload", "encoding")
+
+    def __init__(self, pdf_url: str, extracted_at: datetime, content_hash, data):
+        self.pdf_url = pdf_url
+        self.extracted_at = extracted_at
+        self.content_hash = content_hash
+        self.data = data
+        # Same shape as a legacy uncompressed row, so cache_payload() returns `data`
+        self.payload = None
+        self.encoding = None
+
+def _shared_key(pdf_url: str) -> str:
+    return f"tariff_cache:{pdf_url}"
+
+def _from_shared(pdf_url: str, value, max_age_days: int):
+    if value is None:
+        return None
+    extracted_at = datetime.fromisoformat(value["extracted_at"])
+    if (datetime.utcnow() - extracted_at).days >= max_age_days:
+        return None
+    return SharedCacheEntry(pdf_url, extracted_at, value.get("content_hash"), value["data"])
+
+def _to_shared(cache):
+    if cache is None:
+        return None
+    return {
+        "extracted_at": cache.extracted_at.isoformat(),
+        "content_hash": cache.content_hash,
+        "data": cache_payload(cache),
+    }
+
+def get_cached_entry(pdf_url: str, max_age_days: int = 30, session=None):
+    """
+    Latest tariff_cache entry for this URL if it is less than max_age_days old.
+    Goes through the shared cache backend first, so concurrent misses (across
+    instances too, with Redis) make one database read and one decompression.
+    """
+    def load():
+        with _session_scope(session) as scoped:
+            with metrics.db_read_seconds.time(operation="get_cached_data"):
+                cache = scoped.execute(_latest_cache_query(pdf_url)).scalars().first()
+            return _to_shared(_fresh_cache_entry(cache, max_age_days))
+
+    value = get_cache().get_or_set(_shared_key(pdf_url), load, EXTRACTION_CACHE_TTL, label="shared")
+    return _from_shared(pdf_url, value, max_age_days)
+
+# Per-key locks so concurrent async misses for one URL share a single load
+_async_inflight: Dict[str, asyncio.Lock] = {}
+
+async def get_cached_entry_async(pdf_url: str, max_age_days: int = 30, session=None):
+    """Async version of get_cached_entry for use inside async routes"""
+    backend = get_cache()
+    key = _shared_key(pdf_url)
+    # Redis calls block, so keep them off the event loop
+    value = await asyncio.to_thread(backend.get, key)
+    if value is not None:
+        metrics.cache_requests.inc(cache="shared", result="hit")
+        return _from_shared(pdf_url, value, max_age_days)
+
+    lock = _async_inflight.setdefault(key, asyncio.Lock())
+    async with lock:
+        try:
+            # Another request may have loaded it while we waited
+            value = await asyncio.to_thread(backend.get, key)
+            if value is not None:
+                metrics.cache_requests.inc(cache="shared", result="hit")
+                return _from_shared(pdf_url, value, max_age_days)
+            metrics.cache_requests.inc(cache="shared", result="miss")
+            async with _async_session_scope(session) as scoped:
+                with metrics.db_read_seconds.time(operation="get_cached_data_async"):
+                    cache = (await scoped.execute(_latest_cache_query(pdf_url))).scalars().first()
+                value = _to_shared(_fresh_cache_entry(cache, max_age_days))
+            if value is not None:
+                await asyncio.to_thread(backend.set, key, value, EXTRACTION_CACHE_TTL)
+        finally:
+            if _async_inflight.get(key) is lock:
+                del _async_inflight[key]
+    return _from_shared(pdf_url, value, max_age_days)
+
+def get_cached_data(pdf_url: str, max_age_days: int = 30, session=None):
+    """Check if we have cached data for this PDF URL that's less than max_age_days old"""
+    cache = get_cached_entry(pdf_url, max_age_days, session)
+    return cache.data if cache else None
+
+async def get_cached_data_async(pdf_url: str, max_age_days: int = 30, session=None):
+    """Async version of get_cached_data for use inside async routes"""
+    cache = await get_cached_entry_async(pdf_url, max_age_days, session)
+    return cache.data if cache else None
+
+def get_cache_version(cache_id: int, session=None):
+    """Decompressed data of one stored extraction by TariffCache id, or None"""
+    with _session_scope(session) as session:
+        with metrics.db_read_seconds.time(operation="get_cache_version"):
+            cache = session.get(TariffCache, cache_id)
+        return cache_payload(cache) if cache else None
+
+def list_cache_versions(pdf_url: str = None, limit: int = 50, session=None):
+    """Stored extraction versions, newest first (metadata only, payloads stay compressed)"""
+    query = select(
+        TariffCache.id, TariffCache.pdf_url, TariffCache.extracted_at,
+        TariffCache.content_hash, TariffCache.size_bytes
+    ).order_by(TariffCache.extracted_at.desc(), TariffCache.id.desc()).limit(limit)
+    if pdf_url:
+        query = query.where(TariffCache.pdf_url == pdf_url)
+    with _session_scope(session) as session:
+        return [
             {
-                'name': c.name,
-                'code': c.code,
-                'export_zone': c.export_zone,
-                'import_zone': c.import_zone
+                "id": row.id,
+                "pdf_url": row.pdf_url,
+                "extracted_at": row.extracted_at.isoformat() if row.extracted_at else None,
+                "content_hash": row.content_hash,
+                "size_bytes": row.size_bytes,
             }
-            for c in countries
+            for row in session.execute(query)
         ]
-        
-        # Group prices by service and item_type
-        prices_dict = {}
-        for p in prices:
-            if p.service not in prices_dict:
-                prices_dict[p.service] = {'envelopes': [], 'documents': [], 'non_documents': []}
+
+def _write_cache_entry(session, pdf_url: str, data: dict):
+    payload, encoding, digest, size = cache_codec.encode(data)
+    
+    latest = session.execute(_latest_cache_query(pdf_url)).scalars().first()
+    if latest is not None and latest.content_hash == digest:
+        # Same content as the newest version - just refresh its timestamp
+        latest.extracted_at = datetime.utcnow()
+    else:
+        session.add(TariffCache(
+            pdf_url=pdf_url,
+            data=JSON.NULL,  # JSON null, not SQL NULL - pre-compression tables declare `data` NOT NULL
+            payload=payload,
+            encoding=encoding,
+            content_hash=digest,
+            size_bytes=size
+        ))
+        session.flush()
+    
+    # Retention: keep only the newest CACHE_RETENTION_VERSIONS rows for this URL
+    stale_ids = session.execute(
+        select(TariffCache.id)
+        .where(TariffCache.pdf_url == pdf_url)
+        .order_by(TariffCache.extracted_at.desc(), TariffCache.id.desc())
+        .offset(CACHE_RETENTION_VERSIONS)
+    ).scalars().all()
+    if stale_ids:
+        session.query(TariffCache).filter(TariffCache.id.in_(stale_ids)).delete(synchronize_session=False)
+
+def _replace_tariff_tables(session, data: dict):
+    # Delete existing countries and prices to start fresh
+    session.query(Country).delete()
+    session.query(Price).delete()
+    
+    # Save countries
+    session.add_all(
+        Country(
+            name=country_data['name'],
+            code=country_data['code'],
+            export_zone=country_data.get('export_zone'),
+            import_zone=country_data.get('import_zone')
+        )
+        for country_data in data.get('countries', [])
+    )
+    
+    # Save prices
+    for service, service_data in data.get('prices', {}).items():
+        for item_type in ['envelopes', 'documents', 'non_documents']:
+            if item_type in service_data:
+                session.add_all(
+                    Price(
+                        service=service,
+                        item_type=item_type,
+                        weight=price_entry['weight'],
+                        pricing_type=price_entry.get('pricing_type', 'fixed'),
+                        zones=price_entry['zones']
+                    )
+                    for price_entry in service_data[item_type]
+                )
+
+def save_to_database(pdf_url: str, data: dict, session=None):
+    """Save extracted data to database"""
+    return save_batch_to_database([(pdf_url, data)], operation="save_to_database", session=session)
+
+def save_batch_to_database(entries: list, operation: str = "save_batch", session=None, update_live: bool = True):
+    """
+    Save several (pdf_url, data) extractions in one transaction.
+    Every URL gets its cache entry; the countries/prices tables hold a single
+    current tariff, so they are rebuilt once from the last entry. Rate cards
+    and the in-memory indexes are refreshed from the diff against the
+    previous tariff, so an unchanged re-save touches neither. With
+    update_live=False only the cache entries are written.
+    """
+    if not entries:
+        return False
+    start = time.perf_counter()
+    with _session_scope(session) as session:
+        try:
+            if not update_live:
+                for pdf_url, data in entries:
+                    _write_cache_entry(session, pdf_url, data)
+                session.commit()
+                backend = get_cache()
+                for pdf_url, _ in entries:
+                    backend.delete(_shared_key(pdf_url))
+                return True
+
+            previous = _serialize_tariff(
+                session.execute(select(Country).order_by(Country.id)).scalars().all(),
+                session.execute(select(Price).order_by(Price.id)).scalars().all()
+            )
+            current = entries[-1][1]
+            for pdf_url, data in entries:
+                _write_cache_entry(session, pdf_url, data)
+            _replace_tariff_tables(session, current)
             
-            price_entry = {
-                'weight': p.weight,
-                'zones': p.zones
-            }
-            if p.pricing_type != 'fixed':
-                price_entry['pricing_type'] = p.pricing_type
+            diff = tariff_diff.diff_tariffs(previous, current)
+            with metrics.db_write_seconds.time(operation="rate_cards"):
+                ratecards.refresh_rate_cards(session, previous if previous['countries'] else None, current, diff)
             
-            prices_dict[p.service][p.item_type].append(price_entry)
+            session.commit()
+            backend = get_cache()
+            for pdf_url, _ in entries:
+                backend.delete(_shared_key(pdf_url))
+            if not tariff_diff.is_empty(diff):
+                get_tariff_store().invalidate()
+            return True
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            metrics.db_write_seconds.observe(time.perf_counter() - start, operation=operation)
+
+def _serialize_tariff(countries, prices) -> dict:
+    # Convert to dict format
+    countries_list = [
+        {
+            'name': c.name,
+            'code': c.code,
+            'export_zone': c.export_zone,
+            'import_zone': c.import_zone
+        }
+        for c in countries
+    ]
+    
+    # Group prices by service and item_type
+    prices_dict = {}
+    for p in prices:
+        if p.service not in prices_dict:
+            prices_dict[p.service] = {'envelopes': [], 'documents': [], 'non_documents': []}
         
-        return {
-            'countries': countries_list,
-            'prices': prices_dict
+        price_entry = {
+            'weight': p.weight,
+            'zones': p.zones
         }
-    finally:
-        session.close()
+        if p.pricing_type != 'fixed':
+            price_entry['pricing_type'] = p.pricing_type
+        
+        prices_dict[p.service][p.item_type].append(price_entry)
+    
+    return {
+        'countries': countries_list,
+        'prices': prices_dict
+    }
+
+def get_all_data(session=None):
+    """Retrieve all data from database"""
+    with _session_scope(session) as session:
+        with metrics.db_read_seconds.time(operation="get_all_data"):
+            countries = session.execute(select(Country).order_by(Country.id)).scalars().all()
+            prices = session.execute(select(Price).order_by(Price.id)).scalars().all()
+        return _serialize_tariff(countries, prices)
+
+def get_tariff_version(session=None) -> tuple:
+    """
+    Cheap stamp that moves whenever a tariff is saved: every save writes or
+    touches a tariff_cache row and rewrites the countries table.
+    """
+    with _session_scope(session) as session:
+        row = session.execute(select(
+            select(func.max(TariffCache.id)).scalar_subquery(),
+            select(func.max(TariffCache.extracted_at)).scalar_subquery(),
+            select(func.count(Country.id)).scalar_subquery(),
+        )).one()
+        return (row[0], row[1].isoformat() if row[1] else None, row[2])
+
+def get_tariff_source_url(session=None):
+    """
+    PDF URL the live countries/prices tables were last rebuilt from. Saves
+    write the live tariff's cache entry last, so it is the newest one.
+    """
+    with _session_scope(session) as session:
+        return session.execute(
+            select(TariffCache.pdf_url)
+            .order_by(TariffCache.extracted_at.desc(), TariffCache.id.desc())
+            .limit(1)
+        ).scalar()
+
+def get_rate_cards(country_code: str, service: str = None, country_name: str = None, session=None):
+    """Precomputed rate cards for one country (see app.services.ratecards)"""
+    with _session_scope(session) as session:
+        with metrics.db_read_seconds.time(operation="get_rate_cards"):
+            return ratecards.get_rate_cards(session, country_code, service, country_name)
 
-def export_to_json(filename: str = 'ups_data.json'):
+def export_to_json(filename: str = 'ups_data.json', session=None):
     """Export database data to JSON file"""
-    data = get_all_data()
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+    data = get_all_data(session)
+    serialization.dump_to_file(data, filename)
     return filename
@@ -0,0 +1,154 @@
+"""
+Shared HTTP client for tariff downloads.
+
+One pooled `requests.Session` per process with connect/read timeouts,
+bounded retries on transient errors, a per-host concurrency cap and HTTP
+Range resume when a transfer is cut off part way through a PDF.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+MAX_RESUMES = int(os.getenv("HTTP_MAX_RESUMES", "3"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+CHUNK_SIZE = 64 * 1024
+
+# Errors that can interrupt a body mid-transfer and are worth a Range resume
+_RESUMABLE_ERRORS = (
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ReadTimeout,
+)
+
+
+class IncompleteDownload(requests.RequestException):
+    """The server closed the transfer early and the download could not be resumed"""
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+_host_limits_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=MAX_RETRIES,
+                    connect=MAX_RETRIES,
+                    read=MAX_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["GET", "HEAD"]),
+                    respect_retry_after_header=True,
+                )
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["User-Agent"] = "FreightFlow-Tariff/0.1"
+                _session = session
+    return _session
+
+
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_limits[host]
+
+
+def _content_range_start(response: requests.Response) -> Optional[int]:
+    # "bytes 1000-4999/5000" -> 1000
+    value = response.headers.get("Content-Range", "")
+    try:
+        return int(value.split()[1].split("-")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def download(url: str, timeout: Optional[tuple] = None) -> bytes:
+    """
+    Download `url` into memory. If the body is cut off, re-request the
+    remainder with a Range header (guarded by If-Range) up to MAX_RESUMES
+    times; servers that ignore Range restart the transfer from zero.
+    """
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    session = get_session()
+    buffer = bytearray()
+    expected: Optional[int] = None
+    validator: Optional[str] = None
+    resumes = 0
+
+    with _host_limit(url):
+        while True:
+            headers = {}
+            if buffer:
+                headers["Range"] = f"bytes={len(buffer)}-"
+                if validator:
+                    headers["If-Range"] = validator
+
+            try:
+                with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+                    response.raise_for_status()
+                    if buffer and (response.status_code != 206 or _content_range_start(response) != len(buffer)):
+                        # Range not honoured (or the file changed) - start over
+                        buffer.clear()
+                    if not buffer:
+                        length = response.headers.get("Content-Length")
+                        expected = int(length) if length and "Content-Encoding" not in response.headers else None
+                        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        buffer.extend(chunk)
+            except _RESUMABLE_ERRORS:
+                if not buffer or resumes >= MAX_RESUMES:
+                    raise
+                resumes += 1
+                continue
+
+            if expected is not None and len(buffer) < expected:
+                if resumes >= MAX_RESUMES:
+                    raise IncompleteDownload(f"Received {len(buffer)} of {expected} bytes from {url}")
+                resumes += 1
+                continue
+            return bytes(buffer)
+
+
+def download_many(urls: List[str], max_workers: int = POOL_SIZE) -> Dict[str, Union[bytes, Exception]]:
+    """Download several URLs concurrently; failures are returned as exception values"""
+    def fetch(url):
+        try:
+            return download(url)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(urls, executor.map(fetch, urls)))
+
+
+async def download_async(url: str, timeout: Optional[tuple] = None) -> bytes:
+    """Async variant: runs the pooled download in a worker thread so the event loop stays free"""
+    return await asyncio.to_thread(download, url, timeout)
+
+
+async def download_many_async(urls: List[str]) -> Dict[str, Union[bytes, Exception]]:
+    """Async variant of download_many; the per-host cap still applies"""
+    results = await asyncio.gather(*(download_async(url) for url in urls), return_exceptions=True)
+    return dict(zip(urls, results))
@@ -0,0 +1,147 @@
+"""
+Incremental parsing of streamed price-table JSON.
+
+Gemini responses for a service look like
+    {"envelopes": [...], "documents": [{row}, ...], "non_documents": [{row}, ...]}
+and can take most of the 8192-token budget. RowStreamParser is fed the text
+chunks as they arrive, scans each character once, and hands back every
+row object as soon as its closing brace is seen, so malformed output can be
+rejected after the first bad row instead of after the whole response.
+"""
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+SECTIONS = ("envelopes", "documents", "non_documents")
+
+
+class StreamError(ValueError):
+    """The streamed response is structurally invalid; the call should be retried"""
+
+
+def validate_row(section: str, row, zone_count: Optional[int]) -> int:
+    """
+    Check one price row and return its zone count. Rows need a weight label
+    and zones zone_1..zone_N holding integer prices (null for a missing zone).
+    """
+    if not isinstance(row, dict):
+        raise StreamError(f"{section}: row is not an object")
+    weight = row.get("weight")
+    if not isinstance(weight, str) or not weight.strip():
+        raise StreamError(f"{section}: row without a weight label")
+    zones = row.get("zones")
+    if not isinstance(zones, dict) or not zones:
+        raise StreamError(f"{section} {weight}: missing zones")
+    count = len(zones)
+    if any(f"zone_{i}" not in zones for i in range(1, count + 1)):
+        raise StreamError(f"{section} {weight}: zones are not zone_1..zone_{count}")
+    if zone_count is not None and count != zone_count:
+        raise StreamError(f"{section} {weight}: {count} zones, expected {zone_count}")
+    for zone, price in zones.items():
+        if price is not None and (not isinstance(price, int) or isinstance(price, bool)):
+            raise StreamError(f"{section} {weight}: {zone} price {price!r} is not an integer")
+    return count
+
+
+class RowStreamParser:
+    """
+    Feed text chunks with feed(); each call returns the (section, row) pairs
+    completed by that chunk, already validated. Call finish() once the
+    stream ends to get the assembled result.
+    """
+
+    def __init__(self, validate: bool = True):
+        self.validate = validate
+        self.rows: Dict[str, List[dict]] = {}
+        self.zone_count: Optional[int] = None
+        self._pos = 0  # absolute offset of the next character to scan
+        self._text = ""
+        self._stack = []  # open containers: "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None  # last complete string at the top level (candidate key)
+        self._key = None  # key whose value is being read at the top level
+        self._row_start = None
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, dict]]:
+        self._text += chunk
+        completed = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = json.loads(text[self._string_start:i + 1])
+                continue
+            if self._done:
+                # Only whitespace or a closing code fence may follow the object
+                if not ch.isspace() and ch != "`":
+                    raise StreamError("trailing data after the JSON object")
+                continue
+            if not self._stack:
+                # Skip a leading ```json fence or whitespace
+                if ch == "{":
+                    self._stack.append("{")
+                elif ch == "[" or ch == '"':
+                    raise StreamError("response is not a JSON object")
+                continue
+            if self._stack == ["{", "["] and self._key in SECTIONS and ch not in "{]," and not ch.isspace():
+                raise StreamError(f"{self._key}: row is not an object")
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and len(self._stack) == 1:
+                self._key = self._last_string
+            elif ch == "{" or ch == "[":
+                if len(self._stack) == 1 and self._key in SECTIONS and ch != "[":
+                    raise StreamError(f"{self._key} is not an array")
+                if ch == "{" and self._stack == ["{", "["]:
+                    self._row_start = i
+                self._stack.append(ch)
+            elif ch == "}" or ch == "]":
+                opener = self._stack.pop() if self._stack else None
+                if (opener, ch) not in (("{", "}"), ("[", "]")):
+                    raise StreamError(f"unbalanced '{ch}'")
+                if ch == "}" and self._row_start is not None and self._stack == ["{", "["]:
+                    completed.append(self._complete_row(text[self._row_start:i + 1]))
+                    self._row_start = None
+                elif not self._stack:
+                    self._done = True
+        self._pos = len(text)
+        return completed
+
+    def _complete_row(self, raw: str) -> Tuple[str, dict]:
+        try:
+            row = json.loads(raw)
+        except ValueError as e:
+            raise StreamError(f"{self._key}: unparseable row ({e})")
+        section = self._key or ""
+        if self.validate and section in SECTIONS:
+            self.zone_count = validate_row(section, row, self.zone_count)
+        self.rows.setdefault(section, []).append(row)
+        return section, row
+
+    def finish(self) -> dict:
+        """Rows by section, assembled while parsing; raises StreamError if the stream ended early"""
+        if not self._done or self._in_string:
+            raise StreamError("response ended before the JSON object was closed")
+        result = {section: [] for section in SECTIONS}
+        result.update(self.rows)
+        return result
+
+
+def parse_stream(chunks, on_row: Optional[Callable[[str, dict], None]] = None, validate: bool = True) -> dict:
+    """Parse an iterable of text chunks, calling on_row(section, row) as rows complete"""
+    parser = RowStreamParser(validate=validate)
+    for chunk in chunks:
+        for section, row in parser.feed(chunk):
+            if on_row:
+                on_row(section, row)
+    return parser.finish()
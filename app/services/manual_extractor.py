@@ -4,6 +4,10 @@ This bypasses AI quota limits by using direct text parsing.
 """
 import re
 from typing import Dict, List, Any
+from app.services import metrics
+
+# Heading of the next rate table; a table's rows never run past it
+_NEXT_TABLE = re.compile(r"^(?:Export\s*-|UPS Worldwide)", re.MULTILINE)
 
 def extract_rate_table(text: str, service_name: str, start_marker: str, has_envelope: bool = True) -> Dict[str, Any]:
     """Extract rates for a service using regex patterns"""
@@ -14,8 +18,12 @@ def extract_rate_table(text: str, service_name: str, start_marker: str, has_enve
         print(f"  ✗ Could not find rate table for {service_name}")
         return {"envelopes": [], "documents": [], "non_documents": []}
     
-    # Get section (next 20000 chars to capture full table)
-    section = text[section_start:section_start+20000]
+    # Get section (up to the next rate table, at most 20000 chars)
+    section_end = section_start + 20000
+    next_table = _NEXT_TABLE.search(text, section_start + len(start_marker), section_end)
+    if next_table:
+        section_end = next_table.start()
+    section = text[section_start:section_end]
     
     result = {
         "envelopes": [],
@@ -341,46 +349,60 @@ def extract_freight_rates(text: str, service_name: str, start_marker: str) -> Di
     
     return result
 
+# service -> (extractor, display name, rate table marker, extra kwargs)
+MANUAL_SERVICES = {
+    "express": (
+        extract_rate_table,
+        "Express",
+        "Export - UPS Worldwide Express® and UPS Worldwide Express Plus®",
+        {"has_envelope": True}
+    ),
+    "express_plus": (
+        extract_rate_table,
+        "Express Plus",
+        "Export - UPS Worldwide Express® and UPS Worldwide Express Plus®",
+        {"has_envelope": True}
+    ),
+    "express_saver": (
+        extract_rate_table,
+        "Express Saver",
+        "Export - UPS Worldwide Express Saver™",
+        {"has_envelope": True}
+    ),
+    "expedited": (
+        extract_rate_table,
+        "Expedited",
+        "UPS Worldwide Expedited®",
+        {"has_envelope": True}  # Expedited DOES have envelopes
+    ),
+    "express_freight": (
+        extract_freight_rates,
+        "Express Freight",
+        "Export - UPS Worldwide Express Freight™",
+        {}
+    ),
+    "express_freight_midday": (
+        extract_freight_rates,
+        "Express Freight Midday",
+        "Export - UPS Worldwide Express Freight™ Midday",
+        {}
+    ),
+}
+
+def extract_service_manual(text: str, service: str) -> Dict[str, Any]:
+    """Extract one service's rate table with regex (used for targeted re-extraction)"""
+    extractor, name, marker, kwargs = MANUAL_SERVICES[service]
+    with metrics.extraction_seconds.time(service=service, method="manual"):
+        return extractor(text, name, marker, **kwargs)
+
 def extract_all_services_manual(text: str) -> Dict[str, Any]:
     """Extract all services using manual regex patterns"""
     
     print("Starting manual extraction (no AI quota needed)...")
     
     services = {
-        "express": extract_rate_table(
-            text, 
-            "Express", 
-            "Export - UPS Worldwide Express® and UPS Worldwide Express Plus®",
-            has_envelope=True
-        ),
-        "express_plus": extract_rate_table(
-            text,
-            "Express Plus",
-            "Export - UPS Worldwide Express® and UPS Worldwide Express Plus®",
-            has_envelope=True
-        ),
-        "express_saver": extract_rate_table(
-            text,
-            "Express Saver",
-            "Export - UPS Worldwide Express Saver™",
-            has_envelope=True
-        ),
-        "expedited": extract_rate_table(
-            text,
-            "Expedited",
-            "UPS Worldwide Expedited®",
-            has_envelope=True  # Expedited DOES have envelopes
-        ),
-        "express_freight": extract_freight_rates(
-            text,
-            "Express Freight",
-            "Export - UPS Worldwide Express Freight™"
-        ),
-        "express_freight_midday": extract_freight_rates(
-            text,
-            "Express Freight Midday",
-            "Export - UPS Worldwide Express Freight™ Midday"
-        )
+        service: extract_service_manual(text, service)
+        for service in MANUAL_SERVICES
     }
     
     # Print summary
@@ -402,7 +424,8 @@ def extract_full_tariff_manual(text: str) -> Dict[str, Any]:
     print("=== Manual Tariff Extraction (No AI Quota Needed) ===")
     
     # Extract countries using regex
-    countries = extract_countries_manual(text)
+    with metrics.extraction_seconds.time(service="countries", method="manual"):
+        countries = extract_countries_manual(text)
     
     # Extract all service prices
     prices = extract_all_services_manual(text)
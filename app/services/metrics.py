@@ -0,0 +1,184 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Counters and histograms for the ingestion pipeline stages. Kept
+dependency-free; the output of `render()` is served at /metrics.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Default latency buckets (seconds) - from fast cache hits up to multi-minute AI extractions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return int(state[-1]) if state else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, cumulative in zip(self.buckets, state):
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+        return lines
+
+
+def render() -> str:
+    """Render every registered metric in Prometheus text format (version 0.0.4)"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Pipeline metrics
+pipeline_seconds = Histogram(
+    "freightflow_pipeline_seconds", "End-to-end latency of an ingestion route", ("route", "source"))
+stage_seconds = Histogram(
+    "freightflow_stage_seconds", "Latency of a single ingestion stage", ("route", "stage"))
+
+download_seconds = Histogram(
+    "freightflow_pdf_download_seconds", "PDF download latency")
+download_bytes = Histogram(
+    "freightflow_pdf_download_bytes", "Size of downloaded PDFs in bytes", buckets=SIZE_BUCKETS)
+download_errors = Counter(
+    "freightflow_pdf_download_errors_total", "Failed PDF downloads")
+
+pdf_parse_seconds = Histogram(
+    "freightflow_pdf_parse_seconds", "Time spent extracting text from a PDF")
+pdf_pages = Counter(
+    "freightflow_pdf_pages_parsed_total", "PDF pages run through text extraction")
+pdf_text_chars = Histogram(
+    "freightflow_pdf_text_chars", "Characters of text extracted per PDF", buckets=SIZE_BUCKETS)
+
+extraction_seconds = Histogram(
+    "freightflow_extraction_seconds", "Per-service tariff extraction time", ("service", "method"))
+
+ai_call_seconds = Histogram(
+    "freightflow_ai_call_seconds", "Latency of a single Gemini generate_content call", ("operation",))
+ai_retries = Counter(
+    "freightflow_ai_retries_total", "Gemini calls retried after a 429", ("operation",))
+ai_errors = Counter(
+    "freightflow_ai_errors_total", "Gemini calls that failed after retries", ("operation",))
+ai_first_row_seconds = Histogram(
+    "freightflow_ai_first_row_seconds", "Time until the first price row of a streamed Gemini response parsed", ("operation",))
+ai_prompt_tokens = Counter(
+    "freightflow_ai_prompt_tokens_total", "Estimated prompt tokens sent to Gemini", ("operation",))
+
+validation_issues = Counter(
+    "freightflow_validation_issues_total", "Problems found when validating an extraction", ("check", "severity"))
+reextractions = Counter(
+    "freightflow_reextractions_total", "Services re-extracted after failing validation", ("service", "result"))
+
+db_write_seconds = Histogram(
+    "freightflow_db_write_seconds", "Time to persist an extraction", ("operation",))
+db_read_seconds = Histogram(
+    "freightflow_db_read_seconds", "Time to read tariff data from the database", ("operation",))
+
+cache_requests = Counter(
+    "freightflow_cache_requests_total", "Tariff cache lookups", ("cache", "result"))
+
+tariff_store_reload_seconds = Histogram(
+    "freightflow_tariff_store_reload_seconds", "Time to build a new in-memory tariff snapshot")
+tariff_store_reloads = Counter(
+    "freightflow_tariff_store_reloads_total", "In-memory tariff snapshot reloads", ("result",))
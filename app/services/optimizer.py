@@ -0,0 +1,140 @@
+"""
+Service optimizer for batches of shipments.
+
+Each service is priced over the whole batch in one price_batch pass, then
+every shipment's options are ranked by cost or speed, and the batch gets a
+cost total per service as well as the total for the best option per shipment.
+"""
+from typing import Any, Dict, List, Optional
+
+from app.models.tariff import Tariff
+from app.services.pricing import Piece, PricingError, Shipment, chargeable_weight, price_batch
+from app.services.zone_index import SERVICE_NAMES, service_zones
+
+SERVICES = ["express_plus", "express", "express_saver", "expedited", "express_freight", "express_freight_midday"]
+
+# Relative delivery commitment, lower is faster: Express Plus early morning,
+# Express / Express Freight Midday by midday, Express Saver / Express Freight
+# end of day, Expedited scheduled day-definite delivery.
+SERVICE_SPEED = {
+    "express_plus": 1,
+    "express": 2,
+    "express_freight_midday": 2,
+    "express_saver": 3,
+    "express_freight": 3,
+    "expedited": 4,
+}
+
+OBJECTIVES = ("cost", "speed")
+
+
+def _rank_key(objective: str):
+    if objective == "speed":
+        return lambda option: (SERVICE_SPEED.get(option["service"], 99), option["amount"])
+    return lambda option: (option["amount"], SERVICE_SPEED.get(option["service"], 99))
+
+
+def optimize(tariff: Tariff, shipments: List[Dict[str, Any]], resolve_country, objective: str = "cost",
+             services: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Rank services for each shipment.
+
+    `shipments` are dicts with `pieces` ([{weight_kg, length_cm, width_cm, height_cm}]),
+    `item_type`, `direction` ("export"/"import") and either `country`
+    (resolved through `resolve_country`) or an explicit `zone`.
+    """
+    services = [s for s in (services or SERVICES) if s in tariff.services]
+    rank_key = _rank_key(objective)
+
+    # Resolve destinations once per distinct country
+    countries: Dict[str, Optional[Dict[str, Any]]] = {}
+    resolved = []
+    for item in shipments:
+        country = None
+        if item.get("zone") is None:
+            query = item.get("country") or ""
+            if query not in countries:
+                countries[query] = resolve_country(query)
+            country = countries[query]
+        resolved.append(country)
+
+    pieces = [[Piece(**piece) for piece in item["pieces"]] for item in shipments]
+
+    # One batched pricing pass per service
+    quotes_by_service = {}
+    for service in services:
+        batch = []
+        zone_cache = {}
+        for item, country, item_pieces in zip(shipments, resolved, pieces):
+            zone = item.get("zone")
+            if zone is None and country is not None:
+                if id(country) not in zone_cache:
+                    zone_cache[id(country)] = service_zones(country, service)
+                export_zone, import_zone = zone_cache[id(country)]
+                zone = import_zone if item.get("direction") == "import" else export_zone
+            batch.append(Shipment(
+                pieces=item_pieces,
+                zone=zone if zone is not None else 0,
+                item_type=item.get("item_type", "non_documents"),
+                reference=item.get("reference"),
+            ))
+        quotes_by_service[service] = price_batch(tariff, service, batch)
+
+    results = []
+    totals = {service: {"amount": 0.0, "priced": 0, "unpriced": 0} for service in services}
+    best_total = 0.0
+    unpriceable = 0
+    for i, (item, country) in enumerate(zip(shipments, resolved)):
+        options, errors = [], {}
+        for service in services:
+            quote = quotes_by_service[service][i]
+            if quote.error or quote.amount is None:
+                errors[service] = quote.error if country or item.get("zone") is not None else f"Unknown country '{item.get('country')}'"
+                totals[service]["unpriced"] += 1
+                continue
+            totals[service]["amount"] += quote.amount
+            totals[service]["priced"] += 1
+            options.append({
+                "service": service,
+                "service_name": SERVICE_NAMES.get(service, service),
+                "zone": quote.zone,
+                "billed_kg": quote.billed_kg,
+                "band": quote.band,
+                "amount": quote.amount,
+                "minimum_applied": quote.minimum_applied,
+                "speed_rank": SERVICE_SPEED.get(service),
+            })
+        options.sort(key=rank_key)
+        if options:
+            best_total += options[0]["amount"]
+        else:
+            unpriceable += 1
+        try:
+            chargeable_kg = round(chargeable_weight(pieces[i]), 3)
+        except PricingError:
+            chargeable_kg = None
+        results.append({
+            "index": i,
+            "reference": item.get("reference"),
+            "country": country["code"] if country else None,
+            "chargeable_kg": chargeable_kg,
+            "best": options[0]["service"] if options else None,
+            "options": options,
+            "errors": errors,
+        })
+
+    for total in totals.values():
+        total["amount"] = round(total["amount"], 2)
+        # Only a service that priced every shipment is a complete choice for the batch
+        total["complete"] = total["unpriced"] == 0
+    return {
+        "objective": objective,
+        "shipments": len(shipments),
+        "services": services,
+        "results": results,
+        "totals": {
+            "by_service": totals,
+            "best_per_shipment": round(best_total, 2),
+            "unpriceable_shipments": unpriceable,
+        },
+    }
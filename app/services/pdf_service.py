@@ -1,28 +1,34 @@
 import requests
-import pdfplumber
 import io
 from fastapi import HTTPException
+from app.services import metrics, http_client
 
 def download_pdf(url: str) -> bytes:
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.content
+        with metrics.download_seconds.time():
+            content = http_client.download(url)
+        metrics.download_bytes.observe(len(content))
+        return content
     except requests.RequestException as e:
+        metrics.download_errors.inc()
         raise HTTPException(status_code=400, detail=f"Failed to download PDF: {str(e)}")
 
 def extract_text_from_pdf(pdf_content: bytes) -> str:
+    import pdfplumber  # deferred: only needed once a PDF is actually parsed
     try:
-        with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
-            text = ""
-            for page in pdf.pages:
-                # Extract text
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-                
-                # Optionally extract tables if needed, but for now we'll rely on LLM to parse the text/structure
-                # tables = page.extract_tables()
-            return text
+        with metrics.pdf_parse_seconds.time():
+            with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
+                text = ""
+                for page in pdf.pages:
+                    # Extract text
+                    page_text = page.extract_text()
+                    if page_text:
+                        text += page_text + "\n"
+                    
+                    # Optionally extract tables if needed, but for now we'll rely on LLM to parse the text/structure
+                    # tables = page.extract_tables()
+                metrics.pdf_pages.inc(len(pdf.pages))
+        metrics.pdf_text_chars.observe(len(text))
+        return text
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to extract text from PDF: {str(e)}")
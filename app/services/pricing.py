@@ -0,0 +1,165 @@
+"""
+Shipment pricing over the compact tariff model.
+
+Chargeable weight is the sum over pieces of max(actual, L x W x H / DIM_DIVISOR)
+(cm and kg). It is then matched to the tariff:
+
+  envelopes      flat "Envelope" rate, up to 0.5 kg
+  weight breaks  rounded up to the next WEIGHT_STEP (0.5 kg); the smallest
+                 break >= that weight gives a fixed price
+  per-kg bands   above the last break, rounded up to a whole kg; the band
+                 containing it ("21-44 kg", "Above 1000 kg",
+                 "1000 kg or more") gives a rate x weight
+  minimum        freight "Min rate" is the floor for the per-kg charge;
+                 weights below the first freight band use that band's rate
+
+Batches are priced with one table lookup per (service, item_type) and
+bisect searches per shipment, so thousands of shipments cost milliseconds.
+"""
+import math
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from app.models.tariff import ENVELOPE, ENVELOPE_MAX_KG, RateTable, Tariff
+
+DIM_DIVISOR = float(os.getenv("DIM_DIVISOR", "5000"))
+WEIGHT_STEP = 0.5
+CURRENCY = "INR"
+
+
+class PricingError(ValueError):
+    """The tariff has no price for this shipment"""
+
+
+@dataclass(slots=True)
+class Piece:
+    weight_kg: float
+    length_cm: float = 0.0
+    width_cm: float = 0.0
+    height_cm: float = 0.0
+
+    def volumetric_kg(self, divisor: float = DIM_DIVISOR) -> float:
+        return self.length_cm * self.width_cm * self.height_cm / divisor
+
+    def chargeable_kg(self, divisor: float = DIM_DIVISOR) -> float:
+        return max(self.weight_kg, self.volumetric_kg(divisor))
+
+
+@dataclass(slots=True)
+class Shipment:
+    pieces: List[Piece]
+    zone: int
+    item_type: str = "non_documents"
+    reference: Optional[str] = None
+
+
+@dataclass(slots=True)
+class Quote:
+    service: str
+    item_type: str
+    zone: int
+    chargeable_kg: float
+    billed_kg: float = 0.0
+    band: Optional[str] = None
+    pricing_type: Optional[str] = None
+    rate: Optional[float] = None
+    amount: Optional[float] = None
+    minimum_applied: bool = False
+    currency: str = CURRENCY
+    error: Optional[str] = None
+    reference: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def round_up(weight_kg: float, step: float = WEIGHT_STEP) -> float:
+    # Guard against float noise: 1.5000000001 kg should still bill as 1.5
+    return math.ceil(round(weight_kg / step, 9)) * step
+
+
+def chargeable_weight(pieces: Sequence[Piece], divisor: float = DIM_DIVISOR) -> float:
+    if not pieces:
+        raise PricingError("Shipment has no pieces")
+    for piece in pieces:
+        if not piece.weight_kg > 0:
+            raise PricingError(f"Piece weight must be positive, got {piece.weight_kg:g} kg")
+        if min(piece.length_cm, piece.width_cm, piece.height_cm) < 0:
+            raise PricingError("Piece dimensions can't be negative")
+    return sum(piece.chargeable_kg(divisor) for piece in pieces)
+
+
+def _price_in_table(quote: Quote, table: RateTable) -> Quote:
+    zone = quote.zone
+    weight = quote.chargeable_kg
+
+    if quote.item_type == "envelopes":
+        row = table.row_of_kind(ENVELOPE)
+        if row is None or weight > ENVELOPE_MAX_KG:
+            raise PricingError(f"Envelopes are limited to {ENVELOPE_MAX_KG} kg")
+        quote.billed_kg = ENVELOPE_MAX_KG
+        rate = row.price(zone)
+        amount = rate
+    else:
+        billed = round_up(weight)
+        row = None
+        if table.weight_breaks and billed <= table.weight_breaks[-1]:
+            row = table.row_for_weight(billed)
+        if row is None:
+            billed = round_up(weight, 1.0)
+            row = table.band_for_weight(billed)
+            if row is None and table.band_rows and billed < table.band_starts[0]:
+                row = table.band_rows[0]
+        if row is None:
+            raise PricingError(f"No {quote.item_type} rate covers {billed:g} kg")
+        quote.billed_kg = billed
+        rate = row.price(zone)
+        amount = rate * billed if rate is not None and row.pricing_type == "per_kg" else rate
+
+    if rate is None:
+        raise PricingError(f"No price for zone {zone} at '{row.label}'")
+    quote.band = row.label
+    quote.pricing_type = row.pricing_type
+    quote.rate = rate
+
+    minimum = table.minimum_row
+    floor = minimum.price(zone) if minimum is not None else None
+    if floor is not None and amount < floor:
+        amount = floor
+        quote.minimum_applied = True
+    quote.amount = round(amount, 2)
+    return quote
+
+
+def price_shipment(tariff: Tariff, service: str, shipment: Shipment, divisor: float = DIM_DIVISOR) -> Quote:
+    """Price one shipment; raises PricingError when the tariff can't price it"""
+    quote = Quote(service, shipment.item_type, shipment.zone, chargeable_weight(shipment.pieces, divisor),
+                  reference=shipment.reference)
+    table = tariff.table(service, shipment.item_type)
+    if table is None or not table.rows:
+        raise PricingError(f"No {shipment.item_type} table for {service}")
+    return _price_in_table(quote, table)
+
+
+def price_batch(tariff: Tariff, service: str, shipments: Sequence[Shipment], divisor: float = DIM_DIVISOR) -> List[Quote]:
+    """
+    Price many shipments under one service. Shipments that can't be priced
+    come back with `error` set instead of aborting the batch.
+    """
+    tables = {}
+    quotes = []
+    for shipment in shipments:
+        quote = Quote(service, shipment.item_type, shipment.zone, 0.0, reference=shipment.reference)
+        if shipment.item_type not in tables:
+            tables[shipment.item_type] = tariff.table(service, shipment.item_type)
+        table = tables[shipment.item_type]
+        try:
+            quote.chargeable_kg = chargeable_weight(shipment.pieces, divisor)
+            if table is None or not table.rows:
+                raise PricingError(f"No {shipment.item_type} table for {service}")
+            _price_in_table(quote, table)
+        except PricingError as e:
+            quote.error = str(e)
+        quotes.append(quote)
+    return quotes
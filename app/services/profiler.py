@@ -0,0 +1,243 @@
+"""
+Opt-in, request-scoped profiling.
+
+An admin can add `X-Profile: 1` (or `?profile=1`) together with a valid
+`X-Admin-Token` to any request. That request then runs under cProfile plus
+a wall-clock stack sampler on the event-loop thread and, for plain `def`
+endpoints on routers built with `route_class=ProfiledRoute`, on the
+threadpool thread that runs the endpoint. The result is written as JSON
+under PROFILE_DIR with a profile ID returned in the `X-Profile-Id` header. The directory is shared by every worker on the host,
+so GET /profiles/{id} works whichever worker serves it; only the newest
+PROFILE_STORE_SIZE profiles are kept.
+
+The sampler output uses the folded-stack format understood by
+flamegraph.pl, speedscope and inferno; the cProfile output is a pstats
+text report. When the header/flag is absent the middleware forwards the
+request untouched.
+"""
+import asyncio
+import cProfile
+import functools
+import glob
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.002"))
+MAX_STORED_PROFILES = int(os.getenv("PROFILE_STORE_SIZE", "20"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "freightflow-profiles"))
+
+_PROFILE_ID = re.compile(r"[0-9a-f]{12}")
+# cProfile can only be active once per process; concurrent profile requests are served unprofiled
+_active = threading.Lock()
+# The profile of the request being handled; context variables follow the request into the threadpool
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """Check an admin token against ADMIN_TOKEN; profiling is disabled when it is unset"""
+    return bool(ADMIN_TOKEN and token and hmac.compare_digest(token, ADMIN_TOKEN))
+
+
+def _profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.json")
+
+
+def get_profile(profile_id: str) -> Optional[Dict]:
+    # IDs become file names, so anything but our own hex IDs is rejected
+    if not _PROFILE_ID.fullmatch(profile_id):
+        return None
+    try:
+        with open(_profile_path(profile_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:  # pruned by another worker meanwhile
+        return 0.0
+
+
+def _store_profile(profile_id: str, profile: Dict):
+    """Write atomically (temp file + rename), then drop all but the newest MAX_STORED_PROFILES"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=PROFILE_DIR, prefix=".profile-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, _profile_path(profile_id))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    paths = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")), key=_mtime, reverse=True)
+    for path in paths[MAX_STORED_PROFILES:]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+class StackSampler:
+    """Periodically samples the Python stacks of a set of threads into folded-stack counts"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.thread_ids = set()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class RequestProfile:
+    """cProfile and stack samples for one request, across every thread that worked on it"""
+
+    def __init__(self):
+        self.profilers = []
+        self.sampler = StackSampler()
+
+    @contextmanager
+    def thread(self):
+        """Profile the calling thread until the block exits"""
+        profiler = cProfile.Profile()
+        thread_id = threading.get_ident()
+        self.profilers.append(profiler)
+        self.sampler.thread_ids.add(thread_id)
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.sampler.thread_ids.discard(thread_id)
+
+    def pstats_report(self) -> str:
+        report = io.StringIO()
+        stats = pstats.Stats(self.profilers[0], stream=report)
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        stats.sort_stats("cumulative").print_stats(60)
+        return report.getvalue()
+
+
+def _profile_in_thread(endpoint):
+    @functools.wraps(endpoint)
+    def run(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        with profile.thread():
+            return endpoint(*args, **kwargs)
+    return run
+
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute that lets a profiled request follow plain `def` endpoints into
+    the threadpool; cProfile on the event-loop thread never sees them.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = _profile_in_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _requested(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile" and value in (b"1", b"true"):
+            return True
+    query = scope.get("query_string", b"")
+    return b"profile=" in query and parse_qs(query.decode()).get("profile", [""])[0] in ("1", "true")
+
+
+def _header(scope, wanted: bytes) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == wanted:
+            return value.decode()
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests carrying the profile flag"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            return await self.app(scope, receive, send)
+        if not is_admin(_header(scope, b"x-admin-token")) or not _active.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        profile.sampler.start()
+        try:
+            with profile.thread():
+                await self.app(scope, receive, send_with_id)
+        finally:
+            profile.sampler.stop()
+            _current.reset(token)
+            _active.release()
+
+            _store_profile(profile_id, {
+                "id": profile_id,
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "duration_s": time.perf_counter() - started,
+                "samples": sum(profile.sampler.samples.values()),
+                "folded": profile.sampler.folded(),
+                "pstats": profile.pstats_report(),
+            })
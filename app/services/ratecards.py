@@ -0,0 +1,122 @@
+"""
+Precomputed per-country rate cards.
+
+A rate card is one country's price grid for one service with the zones
+already resolved: every weight row carries the export and import price for
+that country. Cards are materialized into the `rate_cards` table when a
+tariff is saved. On later saves only the countries touched by the tariff
+diff are rebuilt: zone reassignments, added/removed countries, and
+countries sitting in a zone whose prices changed.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models.database import RateCard
+from app.services import tariff_diff
+from app.services.zone_index import ITEM_TYPE_LABELS, SERVICE_NAMES, service_zones
+
+
+def _country_key(country: Dict[str, Any]) -> str:
+    return (country.get("code") or country.get("name") or "").upper()
+
+
+def build_card(country: Dict[str, Any], service: str, service_prices: Dict[str, Any]) -> Dict[str, Any]:
+    export_zone, import_zone = service_zones(country, service)
+    export_key = f"zone_{export_zone}" if export_zone is not None else None
+    import_key = f"zone_{import_zone}" if import_zone is not None else None
+
+    rates = {}
+    for item_type in ITEM_TYPE_LABELS:
+        rows = []
+        for row in service_prices.get(item_type, []):
+            zones = row.get("zones") or {}
+            rows.append({
+                "weight": row.get("weight"),
+                "pricing_type": row.get("pricing_type", "fixed"),
+                "export_price": zones.get(export_key) if export_key else None,
+                "import_price": zones.get(import_key) if import_key else None,
+            })
+        rates[item_type] = rows
+
+    return {
+        "country": {"name": country.get("name"), "code": country.get("code")},
+        "service": service,
+        "service_name": SERVICE_NAMES.get(service, service),
+        "export_zone": export_zone,
+        "import_zone": import_zone,
+        "currency": "INR",
+        "rates": rates,
+    }
+
+
+def build_cards(data: Dict[str, Any], codes: Optional[Set[str]] = None) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """Yield (country_code, card) for every country x service, or only for `codes`"""
+    prices = data.get("prices") or {}
+    for country in data.get("countries") or []:
+        code = _country_key(country)
+        if codes is not None and code not in codes:
+            continue
+        for service, service_prices in prices.items():
+            yield code, build_card(country, service, service_prices)
+
+
+def affected_countries(diff: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    """Countries whose cards change: direct zone/country changes plus countries in re-priced zones"""
+    affected = diff["affected"]
+    codes = set(affected["countries"])
+    changed_zones = {service: set(zones) for service, zones in affected["zones"].items()}
+    if changed_zones:
+        for country in new.get("countries") or []:
+            for service, zones in changed_zones.items():
+                if any(zone in zones for zone in service_zones(country, service)):
+                    codes.add(_country_key(country))
+                    break
+    return codes
+
+
+def refresh_rate_cards(session, old: Optional[Dict[str, Any]], new: Dict[str, Any], diff: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Bring `rate_cards` in line with `new` inside the caller's transaction.
+    With a previous tariff (and existing cards) only affected countries are
+    rebuilt; otherwise the table is rebuilt in full. Returns cards written.
+    """
+    full = not old or session.query(RateCard.id).first() is None
+    if full:
+        session.query(RateCard).delete()
+        codes = None
+    else:
+        diff = diff or tariff_diff.diff_tariffs(old, new)
+        codes = affected_countries(diff, new)
+        if not codes:
+            return 0
+        session.query(RateCard).filter(RateCard.country_code.in_(codes)).delete(synchronize_session=False)
+
+    now = datetime.utcnow()
+    cards = [
+        RateCard(
+            country_code=code,
+            service=card["service"],
+            export_zone=card["export_zone"],
+            import_zone=card["import_zone"],
+            card=card,
+            updated_at=now,
+        )
+        for code, card in build_cards(new, codes)
+    ]
+    session.add_all(cards)
+    return len(cards)
+
+
+def get_rate_cards(session, country_code: str, service: Optional[str] = None, country_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Cards stored under `country_code`. Codes are not unique in every extraction
+    (the manual extractor derives them from the name), so pass `country_name`
+    to keep only that country's cards.
+    """
+    query = session.query(RateCard).filter(RateCard.country_code == country_code.upper())
+    if service:
+        query = query.filter(RateCard.service == service)
+    cards = [row.card for row in query.order_by(RateCard.id)]
+    if country_name is not None:
+        cards = [card for card in cards if (card.get("country") or {}).get("name") == country_name]
+    return cards
@@ -0,0 +1,34 @@
+"""
+JSON encoding for large tariff payloads.
+
+With FAST_JSON=1 and `orjson` installed, responses and file exports are
+encoded with orjson straight from the already-validated dicts. Otherwise
+the stdlib encoder is used with compact separators.
+"""
+import json
+import os
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+FAST_JSON = os.getenv("FAST_JSON", "").lower() in ("1", "true", "yes") and orjson is not None
+
+
+def dumps(data: Any, indent: bool = False, fast: bool = FAST_JSON) -> bytes:
+    """Encode `data` as UTF-8 JSON bytes"""
+    if fast:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if indent:
+        return json.dumps(data, indent=2).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dump_to_file(data: Any, filename: str, indent: bool = True, fast: bool = FAST_JSON):
+    with open(filename, "wb") as f:
+        f.write(dumps(data, indent=indent, fast=fast))
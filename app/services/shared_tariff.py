@@ -0,0 +1,179 @@
+"""
+Host-wide shared backing for the compiled tariff.
+
+The compact Tariff is written once per version to a file under
+TARIFF_SHARED_DIR: a small JSON header with the row metadata and the
+country table, followed by every zone price as one block of native
+float64s. Workers mmap the file read-only and use memoryview slices of it as their row price
+arrays, so the price data is held once per host no matter how many uvicorn
+workers run, and only the first worker to see a new version reads the
+database and compiles it - the others wait on the file lock and attach.
+
+Only the prices are shared. Each worker still builds its own RateRow
+objects from the header (labels, weight bounds, raw zones) and its own
+country records and lookup indexes. Zone rates are read from the shared
+prices on demand (see ZoneIndex.from_tariff). For a 220-country, 40-row
+tariff that is roughly 0.4 MB per worker against about 28 KB of shared
+prices, so memory still grows with the number of workers.
+
+Files are written to a temp name and renamed into place, so a reader never
+maps a partial file. File names start with a digest of the database URL,
+and a build removes only older versions of its own database, under the
+lock. Unlinking old versions is safe while other workers still have them
+mapped.
+
+Needs fcntl (POSIX); elsewhere, or with TARIFF_SHARED_MEMORY=0, callers fall
+back to building the tariff in-process.
+"""
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from typing import Callable, Tuple
+
+from app.models.database import DATABASE_URL
+from app.models.tariff import CountryZones, RateRow, RateTable, ServiceTariff, Tariff
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+SHARED_DIR = os.getenv("TARIFF_SHARED_DIR", os.path.join(tempfile.gettempdir(), "freightflow-tariff"))
+ENABLED = os.getenv("TARIFF_SHARED_MEMORY", "1") == "1" and fcntl is not None
+
+MAGIC = b"FFTARIF1"
+_PREAMBLE = struct.Struct("<8sQ")  # magic, header length
+_ALIGN = 8
+
+
+def enabled() -> bool:
+    return ENABLED
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(repr(value).encode()).hexdigest()[:16]
+
+
+def _db_prefix() -> str:
+    # Apps on other databases can share the host and the temp dir
+    return f"tariff-{_digest(DATABASE_URL)}-"
+
+
+def path_for(version: tuple) -> str:
+    return os.path.join(SHARED_DIR, f"{_db_prefix()}{_digest(version)}.bin")
+
+
+def _row_meta(row: RateRow, offset: int) -> list:
+    return [row.label, row.kind, row.min_kg, row.max_kg, row.pricing_type, row.integral,
+            row.explicit_pricing_type, row.raw_zones, row.extra, offset, len(row.prices)]
+
+
+def write_tariff(path: str, tariff: Tariff, version: tuple):
+    """Serialize `tariff` to `path` atomically (temp file + rename)"""
+    prices = bytearray()
+    services = {}
+    for name, service in tariff.services.items():
+        tables = {}
+        for item_type, table in service.tables.items():
+            rows = []
+            for row in table.rows:
+                rows.append(_row_meta(row, len(prices) // 8))
+                prices += array("d", row.prices).tobytes()
+            tables[item_type] = {"zone_count": table.zone_count, "rows": rows}
+        services[name] = {"tables": tables, "extra": service.extra}
+
+    header = json.dumps({
+        "version": list(version),
+        "countries": [c.to_dict() for c in tariff.countries],
+        "services": services,
+        "extra": tariff.extra,
+    }, default=str).encode("utf-8")
+    header += b" " * (-(len(header) + _PREAMBLE.size) % _ALIGN)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tariff-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, len(header)))
+            f.write(header)
+            f.write(prices)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def attach(path: str) -> Tuple[Tariff, tuple]:
+    """Map `path` read-only and rebuild the Tariff around memoryviews of its price block"""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, header_len = _PREAMBLE.unpack_from(mm, 0)
+    if magic != MAGIC:
+        mm.close()
+        raise ValueError(f"{path} is not a shared tariff file")
+    data_start = _PREAMBLE.size + header_len
+    header = json.loads(mm[_PREAMBLE.size:data_start])
+    # The memoryviews keep the mapping alive for as long as the tariff is referenced
+    prices = memoryview(mm)[data_start:].cast("d")
+
+    services = {}
+    for name, service in header["services"].items():
+        tables = {}
+        for item_type, table in service["tables"].items():
+            rows = [
+                RateRow(label=label, kind=kind, min_kg=min_kg, max_kg=max_kg, pricing_type=pricing_type,
+                        prices=prices[offset:offset + count], integral=integral,
+                        explicit_pricing_type=explicit, raw_zones=raw_zones, extra=extra)
+                for label, kind, min_kg, max_kg, pricing_type, integral, explicit, raw_zones, extra, offset, count
+                in table["rows"]
+            ]
+            tables[item_type] = RateTable(zone_count=table["zone_count"], rows=rows)
+        services[name] = ServiceTariff(tables=tables, extra=service["extra"])
+
+    tariff = Tariff(
+        countries=[CountryZones.from_dict(c) for c in header["countries"]],
+        services=services,
+        extra=header["extra"],
+    )
+    return tariff, tuple(header["version"])
+
+
+def _remove_stale(keep: str):
+    """Unlink this database's other versions; call with the build lock held"""
+    for path in glob.glob(os.path.join(SHARED_DIR, glob.escape(_db_prefix()) + "*.bin")):
+        if path != keep:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def load(version: tuple, build: Callable[[], Tariff]) -> Tariff:
+    """
+    Attach to the shared file for `version`, building it with `build()` if
+    no worker on this host has yet. Concurrent callers serialize on a lock
+    file so the build runs once.
+    """
+    path = path_for(version)
+    try:
+        return attach(path)[0]
+    except FileNotFoundError:
+        pass  # not built yet, or just replaced by a newer version
+
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    with open(os.path.join(SHARED_DIR, "build.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Files are only created and removed under this lock
+            if not os.path.exists(path):
+                write_tariff(path, build(), version)
+                _remove_stale(keep=path)
+            return attach(path)[0]
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,155 @@
+"""
+Diff two stored tariff versions.
+
+Both versions are flattened into sorted (key, value) entries - prices keyed
+by (service, item_type, weight band, zone) and country zones keyed by
+(country code, service) - and compared in one sort-merge pass, so the cost
+is linear in the size of the tariffs after sorting.
+
+The `affected` section lists the services, zones and countries touched by
+the change, for consumers that re-index incrementally.
+"""
+import re
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.services.zone_index import zones_for
+
+_ZONE_KEY = re.compile(r"^zone_(\d+)$")
+_ABSENT = object()
+
+
+def _zone_sort_key(key: str) -> Tuple[int, str]:
+    # zone_10 sorts after zone_9; unexpected keys go first
+    match = _ZONE_KEY.match(key)
+    return (int(match.group(1)) if match else -1, key)
+
+
+def _price_entries(data: Dict[str, Any]) -> List[Tuple[tuple, Any]]:
+    """[((service, item_type, weight, occurrence, zone_sort), price)] sorted by key"""
+    entries = []
+    for service, tables in (data.get("prices") or {}).items():
+        for item_type, rows in tables.items():
+            if not isinstance(rows, list):
+                continue
+            seen = {}
+            for row in rows:
+                weight = row.get("weight", "")
+                # Repeated labels in one table are told apart by position
+                occurrence = seen[weight] = seen.get(weight, -1) + 1
+                for zone, price in (row.get("zones") or {}).items():
+                    entries.append(((service, item_type, weight, occurrence, _zone_sort_key(zone)), price))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def _country_entries(data: Dict[str, Any]) -> List[Tuple[tuple, Any]]:
+    """[((country_code, service), (export_zone, import_zone, name))] sorted by key"""
+    entries = []
+    for country in data.get("countries") or []:
+        code = (country.get("code") or country.get("name") or "").upper()
+        for service, (export_zone, import_zone) in zones_for(country).items():
+            entries.append(((code, service), (export_zone, import_zone, country.get("name"))))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def _merge(old: list, new: list) -> Iterator[Tuple[tuple, Any, Any]]:
+    """Walk two key-sorted entry lists together, yielding (key, old_value, new_value); missing side is _ABSENT"""
+    i = j = 0
+    while i < len(old) or j < len(new):
+        if j >= len(new) or (i < len(old) and old[i][0] < new[j][0]):
+            yield old[i][0], old[i][1], _ABSENT
+            i += 1
+        elif i >= len(old) or new[j][0] < old[i][0]:
+            yield new[j][0], _ABSENT, new[j][1]
+            j += 1
+        else:
+            yield old[i][0], old[i][1], new[j][1]
+            i += 1
+            j += 1
+
+
+def _delta(old, new):
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)) and not isinstance(old, bool):
+        return new - old
+    return None
+
+
+def diff_tariffs(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare two {"countries", "prices"} extractions"""
+    old_prices, new_prices = _price_entries(old), _price_entries(new)
+    old_bands = {key[:4] for key, _ in old_prices}
+    new_bands = {key[:4] for key, _ in new_prices}
+
+    price_changes = []
+    added_bands, removed_bands = {}, {}
+    affected_services = set()
+    affected_zones: Dict[str, set] = {}
+
+    for key, before, after in _merge(old_prices, new_prices):
+        service, item_type, weight, occurrence, (zone_number, zone) = key
+        band = key[:4]
+        if before is _ABSENT and band not in old_bands:
+            added_bands.setdefault(band, {"service": service, "item_type": item_type, "weight": weight, "zones": {}})["zones"][zone] = after
+        elif after is _ABSENT and band not in new_bands:
+            removed_bands.setdefault(band, {"service": service, "item_type": item_type, "weight": weight, "zones": {}})["zones"][zone] = before
+        elif before is _ABSENT or after is _ABSENT or before != after:
+            price_changes.append({
+                "service": service,
+                "item_type": item_type,
+                "weight": weight,
+                "zone": zone,
+                "from": None if before is _ABSENT else before,
+                "to": None if after is _ABSENT else after,
+                "delta": _delta(before, after),
+            })
+        else:
+            continue
+        affected_services.add(service)
+        if zone_number >= 0:
+            affected_zones.setdefault(service, set()).add(zone_number)
+
+    zone_changes, added_countries, removed_countries = [], {}, {}
+    affected_countries = set()
+    for (code, service), before, after in _merge(_country_entries(old), _country_entries(new)):
+        if before is not _ABSENT and after is not _ABSENT:
+            if before[:2] == after[:2]:
+                continue
+            zone_changes.append({
+                "code": code,
+                "name": after[2],
+                "service": service,
+                "export_zone": {"from": before[0], "to": after[0]},
+                "import_zone": {"from": before[1], "to": after[1]},
+            })
+        elif after is not _ABSENT:
+            added_countries.setdefault(code, {"code": code, "name": after[2], "services": []})["services"].append(service)
+        else:
+            removed_countries.setdefault(code, {"code": code, "name": before[2], "services": []})["services"].append(service)
+        affected_countries.add(code)
+
+    return {
+        "summary": {
+            "price_changes": len(price_changes),
+            "added_bands": len(added_bands),
+            "removed_bands": len(removed_bands),
+            "zone_changes": len(zone_changes),
+            "added_countries": len(added_countries),
+            "removed_countries": len(removed_countries),
+        },
+        "price_changes": price_changes,
+        "added_bands": list(added_bands.values()),
+        "removed_bands": list(removed_bands.values()),
+        "zone_changes": zone_changes,
+        "added_countries": list(added_countries.values()),
+        "removed_countries": list(removed_countries.values()),
+        "affected": {
+            "services": sorted(affected_services),
+            "zones": {service: sorted(zones) for service, zones in sorted(affected_zones.items())},
+            "countries": sorted(affected_countries),
+        },
+    }
+
+
+def is_empty(diff: Dict[str, Any]) -> bool:
+    return not any(diff["summary"].values())
@@ -0,0 +1,174 @@
+"""
+Versioned in-memory tariff store, one per worker process.
+
+A snapshot bundles everything derived from the stored tariff: the raw
+dict, the compact Tariff model, the country index and the zone index. It is
+built off to the side and published with a single reference assignment, so
+a request holding a snapshot never sees a half-built table. When
+shared_tariff is enabled the compiled price arrays are mapped from a
+host-wide file, so only one worker per host reads the database per version.
+
+A background thread polls a cheap version stamp (see
+db_service.get_tariff_version) every TARIFF_POLL_SECONDS and rebuilds when
+it moves; saves in this process wake it immediately via invalidate(). Request
+paths only block on the very first load, or when no poller is running (CLI
+scripts), where a stale snapshot is rebuilt on next access instead.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.models.tariff import Tariff
+from app.services import metrics, shared_tariff
+from app.services.country_index import CountryIndex
+from app.services.zone_index import ZoneIndex
+
+POLL_SECONDS = float(os.getenv("TARIFF_POLL_SECONDS", "30"))
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    version: tuple
+    tariff: Tariff
+    country_index: CountryIndex
+    zone_index: ZoneIndex
+    loaded_at: float
+    source_url: Optional[str] = None  # PDF the live tables were last saved from
+
+
+def _default_stamp() -> tuple:
+    from app.services import db_service
+    return db_service.get_tariff_version()
+
+
+def _default_source() -> Optional[str]:
+    from app.services import db_service
+    return db_service.get_tariff_source_url()
+
+
+def _default_loader() -> Dict[str, Any]:
+    from app.services import db_service
+    return db_service.get_all_data()
+
+
+def build_snapshot(tariff: Tariff, version: tuple = (), source_url: Optional[str] = None) -> Snapshot:
+    # Only the country records become dicts; zone rates are read from the price arrays on demand
+    countries = [country.to_dict() for country in tariff.countries]
+    return Snapshot(
+        version=version,
+        tariff=tariff,
+        country_index=CountryIndex(countries),
+        zone_index=ZoneIndex.from_tariff(tariff, countries),
+        loaded_at=time.time(),
+        source_url=source_url,
+    )
+
+
+class TariffStore:
+    def __init__(self, loader=_default_loader, stamp=_default_stamp, poll_seconds: float = POLL_SECONDS, shared: bool = True,
+                 source=_default_source):
+        self._loader = loader
+        self._source = source
+        self.shared = shared
+        self._stamp = stamp
+        self.poll_seconds = poll_seconds
+        self._snapshot: Optional[Snapshot] = None
+        self._stale = False
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def current(self) -> Snapshot:
+        """The published snapshot; only builds on first use or when stale without a poller"""
+        snapshot = self._snapshot
+        if snapshot is None or (self._stale and not self.running):
+            with self._build_lock:
+                if self._snapshot is None or (self._stale and not self.running):
+                    self._reload()
+            snapshot = self._snapshot
+        return snapshot
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild if the stored version moved (or `force`); returns True when a new snapshot was published"""
+        with self._build_lock:
+            if not force and not self._stale and self._snapshot is not None and self._stamp() == self._snapshot.version:
+                return False
+            self._reload()
+            return True
+
+    def invalidate(self):
+        """Mark the snapshot stale after a local save and wake the poller"""
+        self._stale = True
+        self._wake.set()
+
+    def _reload(self):
+        # Read the stamp first: a write landing mid-load moves it again and triggers another reload
+        start = time.perf_counter()
+        self._stale = False
+        try:
+            version = self._stamp()
+            compile_tariff = lambda: Tariff.from_dict(self._loader())
+            if self.shared and shared_tariff.enabled():
+                tariff = shared_tariff.load(version, compile_tariff)
+            else:
+                tariff = compile_tariff()
+            snapshot = build_snapshot(tariff, version, self._source())
+        except Exception:
+            self._stale = True
+            metrics.tariff_store_reloads.inc(result="error")
+            raise
+        self._snapshot = snapshot
+        metrics.tariff_store_reloads.inc(result="ok")
+        metrics.tariff_store_reload_seconds.observe(time.perf_counter() - start)
+
+    def _poll(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous snapshot; the next poll retries
+                print(f"Tariff store reload failed: {e}")
+
+    def start(self):
+        """Start the background poller (idempotent)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, name="tariff-store-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+_store: Optional[TariffStore] = None
+_store_lock = threading.Lock()
+
+
+def get_tariff_store() -> TariffStore:
+    """Return the process-wide tariff store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TariffStore()
+    return _store
+
+
+def current() -> Snapshot:
+    return get_tariff_store().current()
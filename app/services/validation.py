@@ -0,0 +1,253 @@
+"""
+Consistency checks for an extraction, and targeted re-extraction of the
+services that fail them.
+
+validate_extraction() walks every table row and every country once and
+reports:
+  - zones: rows missing zone_1..zone_N, inconsistent zone counts, non-integer prices
+  - weights: weight breaks or per-kg bands out of order, overlapping or repeated
+  - prices: fixed prices that fall as the weight break rises
+  - duplicates: repeated country codes
+  - row_count: tables with fewer rows than expected, or than the reference extraction
+  - shared_table: Express Plus identical to Express (both read from the shared table heading)
+
+Errors mark a service as failing; repair() re-extracts only those
+services and keeps whichever version has fewer errors. The manual
+(regex) extractor reads Express and Express Plus from the same table by
+design, so with manual=True the shared_table check is only a warning.
+"""
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from app.models.tariff import ABOVE, ITEM_TYPES, OTHER, RANGE, WEIGHT, parse_weight
+from app.services import metrics
+
+ERROR = "error"
+WARNING = "warning"
+
+FREIGHT_SERVICES = ("express_freight", "express_freight_midday")
+# Minimum rows per table; freight services publish only non_documents bands
+MIN_ROWS = {
+    "standard": {"documents": 1, "non_documents": 1},
+    "freight": {"non_documents": 1},
+}
+# Pairs whose tables must differ even though the guide prints them under one heading
+DISTINCT_SERVICES = (("express", "express_plus"),)
+
+
+@dataclass
+class Issue:
+    check: str
+    message: str
+    severity: str = ERROR
+    service: Optional[str] = None
+    item_type: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "check": self.check,
+            "severity": self.severity,
+            "service": self.service,
+            "item_type": self.item_type,
+            "message": self.message,
+        }
+
+
+@dataclass
+class ValidationReport:
+    issues: List[Issue] = field(default_factory=list)
+
+    @property
+    def errors(self) -> List[Issue]:
+        return [i for i in self.issues if i.severity == ERROR]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def failing_services(self) -> List[str]:
+        """Services with at least one error, in first-seen order"""
+        return list(dict.fromkeys(i.service for i in self.errors if i.service))
+
+    def error_count(self, service: str) -> int:
+        return sum(1 for i in self.errors if i.service == service)
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "errors": len(self.errors),
+            "warnings": len(self.issues) - len(self.errors),
+            "failing_services": self.failing_services(),
+            "issues": [i.to_dict() for i in self.issues],
+        }
+
+
+def _is_price(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value == int(value)
+
+
+def _check_table(service: str, item_type: str, rows: list, issues: List[Issue]):
+    def report(check, message, severity=ERROR):
+        issues.append(Issue(check, message, severity, service, item_type))
+
+    # The table's zone count is the one most rows agree on, so one short row doesn't flag the rest
+    counts = Counter(len(row["zones"]) for row in rows if isinstance(row, dict) and isinstance(row.get("zones"), dict))
+    zone_count = counts.most_common(1)[0][0] if counts else None
+    seen_labels = set()
+    last_weight = None  # (kg, label, zones) of the previous fixed weight break
+    last_band = None  # (min_kg, max_kg, label) of the previous per-kg band
+    for row in rows:
+        label = row.get("weight", "") if isinstance(row, dict) else ""
+        zones = row.get("zones") if isinstance(row, dict) else None
+        if not isinstance(zones, dict) or not zones:
+            report("zones", f"{label or 'row'}: no zone prices")
+            continue
+
+        # Zone completeness and price types
+        if len(zones) != zone_count:
+            report("zones", f"{label}: {len(zones)} zones, table has {zone_count}")
+        missing = [f"zone_{i}" for i in range(1, zone_count + 1) if f"zone_{i}" not in zones]
+        if missing:
+            report("zones", f"{label}: missing {', '.join(missing)}")
+        for zone, price in zones.items():
+            if price is None:
+                report("zones", f"{label}: no price for {zone}", WARNING)
+            elif not _is_price(price):
+                report("zones", f"{label}: {zone} price {price!r} is not an integer")
+
+        # Weight ordering and fixed-price monotonicity
+        if label in seen_labels:
+            report("weights", f"{label}: repeated weight row")
+        seen_labels.add(label)
+        kind, min_kg, max_kg = parse_weight(label)
+        if kind == WEIGHT:
+            if last_weight is not None:
+                if min_kg <= last_weight[0]:
+                    report("weights", f"{label} follows {last_weight[1]}")
+                else:
+                    falling = [
+                        zone for zone, price in zones.items()
+                        if _is_price(price) and _is_price(last_weight[2].get(zone)) and price < last_weight[2][zone]
+                    ]
+                    if falling:
+                        report("prices", f"{label} is cheaper than {last_weight[1]} in {', '.join(falling)}")
+            last_weight = (min_kg, label, zones)
+        elif kind in (RANGE, ABOVE):
+            if last_band is not None and (min_kg <= last_band[0] or min_kg < last_band[1]):
+                report("weights", f"{label} overlaps or precedes {last_band[2]}")
+            last_band = (min_kg, max_kg, label)
+        elif kind == OTHER:
+            report("weights", f"unrecognised weight label {label!r}", WARNING)
+        # ENVELOPE and MINIMUM rows have no ordering to check
+    return zone_count
+
+
+def validate_extraction(data: dict, reference: Optional[dict] = None, manual: bool = False) -> ValidationReport:
+    """
+    Check an extraction dict ({"countries": [...], "prices": {...}}).
+    `reference` is an earlier extraction of the same PDF; tables that lost
+    rows against it are reported as errors. `manual` marks output of the
+    regex extractor, whose shared tables are expected.
+    """
+    issues: List[Issue] = []
+    prices = data.get("prices") or {}
+    reference_prices = (reference or {}).get("prices") or {}
+
+    zone_counts = []
+    for service, tables in prices.items():
+        kind = "freight" if service in FREIGHT_SERVICES else "standard"
+        tables = tables or {}
+        for item_type in ITEM_TYPES:
+            rows = tables.get(item_type) or []
+            count = _check_table(service, item_type, rows, issues)
+            if count:
+                zone_counts.append(count)
+            expected = MIN_ROWS[kind].get(item_type, 0)
+            if len(rows) < expected:
+                issues.append(Issue("row_count", f"{len(rows)} rows, expected at least {expected}",
+                                    ERROR, service, item_type))
+            previous = len((reference_prices.get(service) or {}).get(item_type) or [])
+            if len(rows) < previous:
+                issues.append(Issue("row_count", f"{len(rows)} rows, previous extraction had {previous}",
+                                    ERROR, service, item_type))
+
+    for first, second in DISTINCT_SERVICES:
+        if first in prices and second in prices and prices[second] and prices[first] == prices[second]:
+            issues.append(Issue("shared_table", f"{second} prices are identical to {first}",
+                                WARNING if manual else ERROR, second))
+
+    # Countries: duplicate codes and zones outside the rate tables
+    max_zone = max(zone_counts, default=None)
+    seen_codes = {}
+    for country in data.get("countries") or []:
+        code = (country.get("code") or "").strip().upper()
+        name = country.get("name") or code
+        if not code:
+            issues.append(Issue("duplicates", f"{name}: no country code", WARNING))
+        elif code in seen_codes:
+            issues.append(Issue("duplicates", f"{code} used by {seen_codes[code]} and {name}"))
+        else:
+            seen_codes[code] = name
+        for key in ("export_zone", "import_zone"):
+            zone = country.get(key)
+            if zone is None:
+                issues.append(Issue("zones", f"{name}: no {key}", WARNING))
+            elif not isinstance(zone, int) or zone < 1 or (max_zone and zone > max_zone):
+                issues.append(Issue("zones", f"{name}: {key} {zone!r} is not a zone in the rate tables"))
+    reference_countries = len((reference or {}).get("countries") or [])
+    if len(seen_codes) < reference_countries:
+        issues.append(Issue("row_count", f"{len(seen_codes)} countries, previous extraction had {reference_countries}", WARNING))
+
+    return ValidationReport(issues)
+
+
+def repair(
+    data: dict,
+    reextract: Optional[Callable[[str], dict]],
+    reference: Optional[dict] = None,
+    rounds: int = 1,
+    manual: bool = False,
+) -> Tuple[dict, ValidationReport]:
+    """
+    Validate `data`, re-extract only the failing services with
+    `reextract(service)`, and keep each new table only if it has fewer
+    errors. Returns the (possibly patched) data and its final report.
+    With reextract=None (a deterministic extractor, which would return the
+    same tables again) the data is only validated.
+    """
+    report = validate_extraction(data, reference, manual)
+    for _ in range(rounds if reextract else 0):
+        failing = report.failing_services()
+        if not failing:
+            break
+        print(f"Validation failed for {', '.join(failing)} - re-extracting those services...")
+        candidate = dict(data, prices=dict(data.get("prices") or {}))
+        retried = []
+        for service in failing:
+            try:
+                candidate["prices"][service] = reextract(service)
+                retried.append(service)
+            except Exception as e:
+                print(f"  ✗ Re-extraction of {service} failed: {e}")
+                metrics.reextractions.inc(service=service, result="error")
+        candidate_report = validate_extraction(candidate, reference, manual)
+
+        patched = dict(data, prices=dict(data.get("prices") or {}))
+        improved = False
+        for service in retried:
+            if candidate_report.error_count(service) < report.error_count(service):
+                patched["prices"][service] = candidate["prices"][service]
+                improved = True
+                metrics.reextractions.inc(service=service, result="improved")
+            else:
+                metrics.reextractions.inc(service=service, result="unchanged")
+        if not improved:
+            break
+        data = patched
+        report = validate_extraction(data, reference, manual)
+
+    for issue in report.issues:
+        metrics.validation_issues.inc(check=issue.check, severity=issue.severity)
+    return data, report
@@ -0,0 +1,195 @@
+"""
+Precomputed reverse index from (service, direction, zone) to countries.
+
+Zone filters used to be answered by asking Gemini to pick countries out of
+the PDF text. The stored extraction already has every country's zones, so
+the filter is a dict lookup over an index built once per saved tariff.
+"""
+from typing import Dict, List, Optional, Tuple, Any
+
+# Internal service keys -> display names used by the /ingest response shape
+SERVICE_NAMES = {
+    "express_plus": "Express Plus",
+    "express": "Express",
+    "express_saver": "Express Saver",
+    "expedited": "Expedited",
+    "express_freight": "Express Freight",
+    "express_freight_midday": "Express Freight Midday",
+}
+SERVICE_KEYS = {name.lower(): key for key, name in SERVICE_NAMES.items()}
+
+# Services whose rates are returned in zone views (freight is per-kg only, see ai_service prompt)
+RATE_SERVICES = ["express_plus", "express", "express_saver", "expedited"]
+
+ITEM_TYPE_LABELS = {
+    "envelopes": "Envelopes",
+    "documents": "Documents",
+    "non_documents": "Non-Documents",
+}
+
+DIRECTIONS = ("export", "import")
+
+
+def _to_zone(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate(weight: str, price, item_label: str) -> Optional[Dict[str, Any]]:
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return None  # missing or unparseable price
+    return {"weight": weight, "price": price, "currency": "INR", "item_type": item_label}
+
+
+def service_key(name: str) -> str:
+    """Map a display name ("Express Saver") or key ("express_saver") to the internal key"""
+    if name in SERVICE_NAMES:
+        return name
+    return SERVICE_KEYS.get(name.strip().lower(), name.strip().lower().replace(" ", "_"))
+
+
+def zones_for(country: Dict[str, Any]) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    """
+    Return {service_key: (export_zone, import_zone)} for a stored country record.
+    Records with per-service `service_zones` use those; the flat export/import
+    columns come from the Express column of the zone table.
+    """
+    if country.get("service_zones"):
+        return {
+            service_key(sz["service_name"]): (_to_zone(sz.get("export_zone")), _to_zone(sz.get("import_zone")))
+            for sz in country["service_zones"]
+        }
+    return {"express": (_to_zone(country.get("export_zone")), _to_zone(country.get("import_zone")))}
+
+
+def service_zones(country: Dict[str, Any], service: str) -> Tuple[Optional[int], Optional[int]]:
+    """(export_zone, import_zone) for one service; records without per-service zones use the Express columns"""
+    zones = zones_for(country)
+    return zones.get(service_key(service)) or zones.get("express") or (None, None)
+
+
+class ZoneIndex:
+    """Reverse index of countries and rates per zone"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.countries_by_zone: Dict[Tuple[str, str, int], List[Dict[str, Any]]] = {}
+        self.country_zones: Dict[int, Dict[str, Tuple[Optional[int], Optional[int]]]] = {}
+        self.rates_by_zone: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+        self.tariff = None  # set by from_tariff; rates then come from its price arrays
+        data = data or {}
+
+        for country in data.get("countries", []):
+            zones = zones_for(country)
+            self.country_zones[id(country)] = zones
+            # Index every service the same way service_zones() resolves it, so flat
+            # records (Express columns only) are found under the other services too
+            for service in SERVICE_NAMES:
+                pair = zones.get(service) or zones.get("express") or (None, None)
+                for direction, zone in zip(DIRECTIONS, pair):
+                    if zone is not None:
+                        self.countries_by_zone.setdefault((service, direction, zone), []).append(country)
+
+        for service, service_data in data.get("prices", {}).items():
+            for item_type, label in ITEM_TYPE_LABELS.items():
+                for row in service_data.get(item_type, []):
+                    for zone_key, price in row.get("zones", {}).items():
+                        self._add_rate(service, _to_zone(zone_key.replace("zone_", "")), row["weight"], price, label)
+
+    @classmethod
+    def from_tariff(cls, tariff, countries: List[Dict[str, Any]]) -> "ZoneIndex":
+        """
+        Build from a compiled Tariff (app.models.tariff). Only the countries
+        are indexed; rates are read from its price arrays on each
+        rates_in_zone() call, so a tariff mapped from shared_tariff isn't
+        copied into per-worker dicts. `countries` are the country records
+        to index, e.g. the ones the CountryIndex holds.
+        """
+        index = cls({"countries": countries})
+        index.tariff = tariff
+        return index
+
+    def _add_rate(self, service: str, zone: Optional[int], weight: str, price, item_label: str):
+        rate = _rate(weight, price, item_label)
+        if rate is not None and zone is not None:
+            self.rates_by_zone.setdefault((service, zone), []).append(rate)
+
+    def __bool__(self) -> bool:
+        if self.tariff is not None:
+            return bool(self.countries_by_zone or any(
+                table.rows for service in self.tariff.services.values() for table in service.tables.values()
+            ))
+        return bool(self.countries_by_zone or self.rates_by_zone)
+
+    def countries_in_zone(self, zone: int, service: Optional[str] = None, direction: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Countries in `zone` for one service/direction, or for any of them when omitted"""
+        if service:
+            key = service_key(service)
+            services = [key if key in SERVICE_NAMES else "express"]
+        else:
+            services = list(SERVICE_NAMES)
+        directions = [direction] if direction else list(DIRECTIONS)
+
+        result = []
+        seen = set()
+        for svc in services:
+            for d in directions:
+                for country in self.countries_by_zone.get((svc, d, zone), []):
+                    if id(country) not in seen:
+                        seen.add(id(country))
+                        result.append(country)
+        return result
+
+    def rates_in_zone(self, zone: int, service: str) -> List[Dict[str, Any]]:
+        if self.tariff is None:
+            return self.rates_by_zone.get((service_key(service), zone), [])
+        service_tariff = self.tariff.services.get(service_key(service))
+        if service_tariff is None:
+            return []
+        rates = []
+        for item_type, label in ITEM_TYPE_LABELS.items():
+            table = service_tariff.tables.get(item_type)
+            for row in table.rows if table else ():
+                price = row.price(zone)
+                if price is not None:
+                    rates.append(_rate(row.label, price, label))
+                for zone_key, price in (row.raw_zones or {}).items():
+                    if _to_zone(zone_key.replace("zone_", "")) == zone:
+                        rate = _rate(row.label, price, label)
+                        if rate is not None:
+                            rates.append(rate)
+        return rates
+
+    def tariff_response(self, zone: int) -> Dict[str, Any]:
+        """Build the /ingest response shape for a single zone without a model call"""
+        countries = []
+        for country in self.countries_in_zone(zone):
+            countries.append({
+                "country_name": country["name"],
+                "country_code": country["code"],
+                "service_zones": [
+                    {
+                        "service_name": SERVICE_NAMES.get(service, service),
+                        "export_zone": str(export_zone) if export_zone is not None else None,
+                        "import_zone": str(import_zone) if import_zone is not None else None,
+                    }
+                    for service, (export_zone, import_zone) in self.country_zones[id(country)].items()
+                ],
+            })
+
+        zone_rates = {}
+        for service in RATE_SERVICES:
+            rates = self.rates_in_zone(zone, service)
+            if rates:
+                zone_rates[SERVICE_NAMES[service]] = [{"zone_id": str(zone), "rates": rates}]
+
+        return {"provider": "UPS", "countries": countries, "zone_rates": zone_rates}
+
+
+def get_zone_index() -> ZoneIndex:
+    """Return the index from this process's current tariff snapshot (see tariff_store)"""
+    from app.services.tariff_store import current
+    return current().zone_index
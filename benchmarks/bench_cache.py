@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Compare tariff_cache storage and read latency: uncompressed JSON vs compressed payloads.
+
+Stores the same synthetic extraction as a legacy row (plain JSON in `data`)
+and as gzip/zstd payloads, then times get_cached_data for each.
+
+    python -m benchmarks.bench_cache --reads 200
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+# Point the app at a throwaway SQLite file before app.models.database is imported
+_DB_DIR = tempfile.mkdtemp(prefix="freightflow-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+
+from sqlalchemy import JSON, func, select  # noqa: E402
+from benchmarks.synthetic_pdf import generate_tariff_pdf  # noqa: E402
+from app.models.database import SessionLocal, TariffCache, init_db  # noqa: E402
+from app.services import cache_backend, cache_codec, db_service, manual_extractor, pdf_service  # noqa: E402
+from app.services.cache_backend import NullCache  # noqa: E402
+
+
+def synthetic_extraction(countries: int, weight_rows: int) -> dict:
+    text = pdf_service.extract_text_from_pdf(generate_tariff_pdf(countries=countries, weight_rows=weight_rows))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return manual_extractor.extract_full_tariff_manual(text)
+
+
+def store_variants(data: dict) -> dict:
+    """Insert one row per storage variant; returns {variant: url}"""
+    urls = {}
+    session = SessionLocal()
+    try:
+        session.add(TariffCache(pdf_url="bench://legacy", data=data, extracted_at=datetime.utcnow()))
+        urls["uncompressed"] = "bench://legacy"
+        for encoding in ("gzip", "zstd"):
+            if encoding == "zstd" and cache_codec.zstandard is None:
+                continue
+            payload, encoding, digest, size = cache_codec.encode(data, encoding)
+            session.add(TariffCache(pdf_url=f"bench://{encoding}", data=JSON.NULL, payload=payload,
+                                    encoding=encoding, content_hash=digest, size_bytes=size))
+            urls[encoding] = f"bench://{encoding}"
+        session.commit()
+    finally:
+        session.close()
+    return urls
+
+
+def stored_bytes(url: str) -> int:
+    session = SessionLocal()
+    try:
+        row = session.execute(
+            select(func.coalesce(func.length(TariffCache.payload), 0), func.length(TariffCache.data))
+            .where(TariffCache.pdf_url == url)
+        ).first()
+        # Compressed rows still carry the 4-byte JSON 'null' in `data`
+        return row[0] + row[1]
+    finally:
+        session.close()
+
+
+def time_reads(url: str, reads: int) -> dict:
+    # Measure the database read and decode, not the shared cache in front of it
+    cache_backend.set_cache(NullCache())
+    db_service.get_cached_data(url)  # warm-up
+    timings = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        db_service.get_cached_data(url)
+        timings.append(time.perf_counter() - start)
+    return {"median_ms": statistics.median(timings) * 1000, "mean_ms": statistics.fmean(timings) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tariff_cache compression")
+    parser.add_argument("--countries", type=int, default=220)
+    parser.add_argument("--weight-rows", type=int, default=40)
+    parser.add_argument("--reads", type=int, default=100)
+    parser.add_argument("--output", default="bench_cache.json")
+    args = parser.parse_args()
+    init_db()
+
+    data = synthetic_extraction(args.countries, args.weight_rows)
+    raw_size = len(json.dumps(data))
+    urls = store_variants(data)
+
+    results = {}
+    for variant, url in urls.items():
+        size = stored_bytes(url)
+        reads = time_reads(url, args.reads)
+        results[variant] = {"stored_bytes": size, "ratio": raw_size / size, **reads}
+        print(f"  {variant:12} {size:9,} bytes ({raw_size / size:5.1f}x)   "
+              f"read median {reads['median_ms']:7.3f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump({"benchmark": "cache", "json_bytes": raw_size, "reads": args.reads, "variants": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ingestion pipeline stages against synthetic tariff PDFs.
+
+Times download_pdf, extract_text_from_pdf, extract_all_services_manual,
+extract_countries_manual and save_to_database with warm-up and repetition,
+records peak memory per stage and writes the results as JSON.
+
+    python -m benchmarks.bench_ingest --pages 20 --zones 10 --countries 220
+    python -m benchmarks.bench_ingest --baseline old.json --tolerance 0.2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Point the app at a throwaway SQLite file before app.models.database is imported
+_DB_DIR = tempfile.mkdtemp(prefix="freightflow-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+
+from benchmarks.synthetic_pdf import generate_tariff_pdf  # noqa: E402
+from app.models.database import init_db  # noqa: E402
+from app.services import pdf_service, manual_extractor, db_service  # noqa: E402
+
+
+def serve_bytes(payload: bytes):
+    """Serve `payload` on a local HTTP server; returns (server, url)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/tariff-guide.pdf"
+
+
+def measure(fn, warmup: int, repeat: int) -> dict:
+    """Time `fn` after warm-up, then run it once more under tracemalloc for peak memory"""
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        for _ in range(warmup):
+            fn()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "runs": repeat,
+        "min_s": timings[0],
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+        "p95_s": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        "max_s": timings[-1],
+        "peak_memory_bytes": peak,
+    }
+
+
+def run(args) -> dict:
+    pdf = generate_tariff_pdf(pages=args.pages, zones=args.zones, countries=args.countries,
+                              weight_rows=args.weight_rows, seed=args.seed)
+    server, url = serve_bytes(pdf)
+
+    try:
+        text = pdf_service.extract_text_from_pdf(pdf)
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = manual_extractor.extract_full_tariff_manual(text)
+
+        stages = {
+            "download_pdf": lambda: pdf_service.download_pdf(url),
+            "extract_text_from_pdf": lambda: pdf_service.extract_text_from_pdf(pdf),
+            "extract_all_services_manual": lambda: manual_extractor.extract_all_services_manual(text),
+            "extract_countries_manual": lambda: manual_extractor.extract_countries_manual(text),
+            "save_to_database": lambda: db_service.save_to_database(url, data),
+        }
+        results = {}
+        for name, fn in stages.items():
+            if args.stage and name not in args.stage:
+                continue
+            results[name] = measure(fn, args.warmup, args.repeat)
+            print(f"  {name:30} median {results[name]['median_s'] * 1000:9.2f} ms   "
+                  f"peak {results[name]['peak_memory_bytes'] / 1024:9.1f} KiB")
+    finally:
+        server.shutdown()
+
+    return {
+        "benchmark": "ingest",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "pages": args.pages,
+            "zones": args.zones,
+            "countries": args.countries,
+            "weight_rows": args.weight_rows,
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+        },
+        "input": {
+            "pdf_bytes": len(pdf),
+            "text_chars": len(text),
+            "countries_extracted": len(data["countries"]),
+            "price_rows_extracted": sum(len(rows) for service in data["prices"].values() for rows in service.values()),
+        },
+        "stages": results,
+    }
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> list:
+    """Return the stages whose median regressed by more than `tolerance` vs the baseline file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, stats in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            continue
+        ratio = stats["median_s"] / old["median_s"] if old["median_s"] else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append({"stage": name, "baseline_s": old["median_s"], "current_s": stats["median_s"], "ratio": ratio})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tariff ingestion pipeline")
+    parser.add_argument("--pages", type=int, default=12, help="minimum page count of the synthetic PDF")
+    parser.add_argument("--zones", type=int, choices=[9, 10], default=10)
+    parser.add_argument("--countries", type=int, default=220)
+    parser.add_argument("--weight-rows", type=int, default=40, help="document weight rows per rate table")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stage", action="append", help="only run the named stage (repeatable)")
+    parser.add_argument("--output", default="bench_ingest.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed median slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+    init_db()
+
+    print(f"Benchmarking ingestion ({args.pages} pages, {args.zones} zones, "
+          f"{args.countries} countries, {args.weight_rows} weight rows)...")
+    results = run(args)
+
+    if args.baseline:
+        results["regressions"] = compare(results, args.baseline, args.tolerance)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if results.get("regressions"):
+        for r in results["regressions"]:
+            print(f"  ✗ {r['stage']}: {r['baseline_s'] * 1000:.2f} ms -> {r['current_s'] * 1000:.2f} ms ({r['ratio']:.2f}x)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
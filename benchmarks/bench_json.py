@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON encoding of the full tariff payload.
+
+Compares FastAPI's default path (jsonable_encoder + stdlib json, as used by
+JSONResponse), the stdlib encoder alone, the indented export format and
+orjson, reporting encode time and output size.
+
+    python -m benchmarks.bench_json --repeat 50
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.synthetic_pdf import generate_tariff_pdf
+from app.services import manual_extractor, pdf_service, serialization
+
+
+def response_payload(countries: int, weight_rows: int) -> dict:
+    """The /extract_full response shape around a synthetic extraction"""
+    text = pdf_service.extract_text_from_pdf(generate_tariff_pdf(countries=countries, weight_rows=weight_rows))
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = manual_extractor.extract_full_tariff_manual(text)
+    return {"status": "success", "source": "cache", "data": data, "message": "Data loaded from cache"}
+
+
+def encoders():
+    variants = {
+        "fastapi_default": lambda d: json.dumps(jsonable_encoder(d), ensure_ascii=False, allow_nan=False,
+                                                indent=None, separators=(",", ":")).encode("utf-8"),
+        "stdlib_compact": lambda d: serialization.dumps(d, fast=False),
+        "stdlib_indent2_export": lambda d: serialization.dumps(d, indent=True, fast=False),
+    }
+    if serialization.orjson is not None:
+        variants["orjson"] = lambda d: serialization.dumps(d, fast=True)
+        variants["orjson_indent2_export"] = lambda d: serialization.dumps(d, indent=True, fast=True)
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tariff JSON encoding")
+    parser.add_argument("--countries", type=int, default=220)
+    parser.add_argument("--weight-rows", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", default="bench_json.json")
+    args = parser.parse_args()
+
+    payload = response_payload(args.countries, args.weight_rows)
+    results = {}
+    for name, encode in encoders().items():
+        body = encode(payload)  # warm-up
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            encode(payload)
+            timings.append(time.perf_counter() - start)
+        results[name] = {"median_ms": statistics.median(timings) * 1000, "bytes": len(body)}
+        print(f"  {name:24} {results[name]['median_ms']:8.3f} ms   {len(body):9,} bytes")
+
+    with open(args.output, "w") as f:
+        json.dump({"benchmark": "json", "repeat": args.repeat, "encoders": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold-start import time of the app.
+
+Imports the target module (default app.main) in fresh interpreters under
+`python -X importtime`, reports the median wall time and cumulative import
+time, and lists the top-level packages with the most import time in the last run.
+
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --module app.api.routes --top 20
+    python -m benchmarks.bench_startup --baseline old.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# "import time:   self [us] | cumulative | imported package"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list:
+    """[(module, self_us, cumulative_us, depth)] in report order"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            depth = (len(match.group(3)) - 1) // 2
+            entries.append((match.group(4), int(match.group(1)), int(match.group(2)), depth))
+    return entries
+
+
+def import_once(module: str, env: dict) -> dict:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    entries = parse_importtime(proc.stderr)
+    target = next((e for e in reversed(entries) if e[0] == module), None)
+    return {"wall_s": wall, "import_us": target[2] if target else None, "entries": entries}
+
+
+def slowest(entries: list, top: int) -> list:
+    # Sum self time per top-level package, so nested imports are counted once under their own package
+    packages = {}
+    for module, self_us, _, _ in entries:
+        root = module.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": name, "self_ms": us / 1000} for name, us in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app cold-start import time")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level packages to list")
+    parser.add_argument("--output", default="bench_startup.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed median slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # Throwaway database so importing the app can't touch a real one
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='freightflow-bench-'), 'bench.db')}"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+    print(f"Importing {args.module} {args.repeat}x under -X importtime...")
+    runs = [import_once(args.module, env) for _ in range(args.repeat)]
+    wall = statistics.median(run["wall_s"] for run in runs)
+    imports = [run["import_us"] for run in runs if run["import_us"] is not None]
+    import_ms = statistics.median(imports) / 1000 if imports else None
+    packages = slowest(runs[-1]["entries"], args.top)
+
+    print(f"  interpreter + import wall time   median {wall * 1000:9.1f} ms")
+    if import_ms is not None:
+        print(f"  {args.module} cumulative import  median {import_ms:9.1f} ms")
+    print("\n  slowest top-level packages:")
+    for entry in packages:
+        print(f"    {entry['package']:30} {entry['self_ms']:9.1f} ms")
+
+    results = {
+        "benchmark": "startup",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"module": args.module, "repeat": args.repeat},
+        "median_wall_s": wall,
+        "median_import_ms": import_ms,
+        "slowest_packages": packages,
+    }
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        old = baseline.get("median_wall_s")
+        if old:
+            ratio = wall / old
+            results["baseline_ratio"] = ratio
+            regressed = ratio > 1 + args.tolerance
+            if regressed:
+                print(f"\n  ✗ startup: {old * 1000:.1f} ms -> {wall * 1000:.1f} ms ({ratio:.2f}x)")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Synthetic UPS-style tariff PDF generator.
+
+Produces a small, dependency-free PDF whose extracted text has the same
+layout the manual extractor expects (zone table, Express/Saver/Expedited
+rate tables, freight tables), so the ingestion pipeline can be timed
+without downloading the real carrier guide.
+"""
+import random
+from typing import List
+
+EXPRESS_MARKER = "Export - UPS Worldwide Express® and UPS Worldwide Express Plus®"
+SAVER_MARKER = "Export - UPS Worldwide Express Saver™"
+EXPEDITED_MARKER = "UPS Worldwide Expedited®"
+FREIGHT_MARKER = "Export - UPS Worldwide Express Freight™"
+FREIGHT_MIDDAY_MARKER = "Export - UPS Worldwide Express Freight™ Midday"
+
+LINES_PER_PAGE = 60
+FREIGHT_RANGES = [(71, 99), (100, 299), (300, 499), (500, 999)]
+PER_KG_RANGES = [(21, 44), (45, 70), (71, 99), (100, 299), (300, 499), (500, 999), (1000, 1000)]
+
+
+def _price_row(rng: random.Random, base: int, zones: int) -> str:
+    return " ".join(f"{base + rng.randint(0, 400) + 150 * z:,}" for z in range(zones))
+
+
+def _country_names(count: int, rng: random.Random) -> List[str]:
+    letters = "ABCDEFGHIJKLMNOPRSTUVZ"
+    names = []
+    while len(names) < count:
+        name = rng.choice(letters) + "".join(rng.choice("aeiounrstlm") for _ in range(rng.randint(4, 10)))
+        if name not in names:
+            names.append(name)
+    return sorted(names)
+
+
+def _rate_table(rng: random.Random, marker: str, zones: int, weight_rows: int) -> List[str]:
+    lines = [marker, "Zone " + " ".join(str(z) for z in range(1, zones + 1))]
+    lines.append("Envelopes " + _price_row(rng, 3000, zones))
+    lines.append("Documents")
+    lines.append("weight")
+    # Steps wider than the 0-400 jitter, so prices rise with weight like a real tariff
+    for i in range(1, weight_rows + 1):
+        lines.append(f"{i * 0.5:.1f} kg " + _price_row(rng, 3000 + 450 * i, zones))
+    lines.append("Non-Documents")
+    lines.append("weight")
+    for i in range(2, weight_rows + 2):
+        lines.append(f"{i * 0.5:.1f} kg " + _price_row(rng, 3500 + 450 * i, zones))
+    lines.append("For shipment weight above 20 kg, price per kg")
+    for start, end in PER_KG_RANGES[:-1]:
+        lines.append(f"{start}-{end} kg " + _price_row(rng, 600, zones))
+    lines.append("Above 1000 kg " + _price_row(rng, 500, zones))
+    return lines
+
+
+def _freight_table(rng: random.Random, marker: str) -> List[str]:
+    lines = [marker, "Zone 1 2 3 4 5 6 7 8 9"]
+    lines.append("Min rate " + _price_row(rng, 55000, 9))
+    for start, end in FREIGHT_RANGES:
+        lines.append(f"{start} - {end} kg")
+        lines.append("Price per kg " + _price_row(rng, 700, 9))
+    lines.append("1000 kg or more")
+    lines.append("Price per kg " + _price_row(rng, 600, 9))
+    return lines
+
+
+def tariff_lines(countries: int = 220, zones: int = 10, weight_rows: int = 40, seed: int = 7) -> List[str]:
+    """Return the text lines of a synthetic tariff guide"""
+    rng = random.Random(seed)
+    lines = ["UPS Tariff Guide (synthetic)", "Zone Table", "Country Export Zone Import Zone"]
+    for name in _country_names(countries, rng):
+        lines.append(f"{name} {rng.randint(1, zones)} {rng.randint(1, zones)}")
+
+    lines += _rate_table(rng, EXPRESS_MARKER, zones, weight_rows)
+    lines += _rate_table(rng, SAVER_MARKER, zones, weight_rows)
+    lines += _rate_table(rng, EXPEDITED_MARKER, 9, weight_rows)
+    lines += _freight_table(rng, FREIGHT_MARKER)
+    lines += _freight_table(rng, FREIGHT_MIDDAY_MARKER)
+    return lines
+
+
+def _escape(line: str) -> bytes:
+    raw = line.encode("cp1252", "replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def build_pdf(lines: List[str], min_pages: int = 1) -> bytes:
+    """Lay out text lines on A4 pages with the standard Helvetica font"""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    while len(pages) < min_pages:
+        pages.append([f"Terms and conditions page {len(pages) + 1}"])
+
+    objects: List[bytes] = []
+    # 1: catalog, 2: page tree, 3: font; pages and content streams follow
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids).encode()
+    objects.append(b"<< /Type /Pages /Kids [" + kids + b"] /Count " + str(len(pages)).encode() + b" >>")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    for pid, page_lines in zip(page_ids, pages):
+        stream = b"BT /F1 9 Tf 12 TL 36 806 Td\n"
+        stream += b"".join(b"(" + _escape(line) + b") Tj T*\n" for line in page_lines)
+        stream += b"ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents " + str(pid + 1).encode() + b" 0 R >>"
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def generate_tariff_pdf(pages: int = 1, zones: int = 10, countries: int = 220, weight_rows: int = 40, seed: int = 7) -> bytes:
+    """Generate a synthetic tariff PDF with at least `pages` pages"""
+    if zones not in (9, 10):
+        raise ValueError("zones must be 9 or 10")
+    return build_pdf(tariff_lines(countries, zones, weight_rows, seed), min_pages=pages)
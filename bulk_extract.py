@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Bulk tariff extraction - runs many tariff PDFs through a staged pipeline.
+
+    python bulk_extract.py URL [URL ...]
+    python bulk_extract.py --manifest tariffs.txt --text-workers 4 --extract-workers 4
+
+Stages (connected by bounded queues so a slow stage applies back-pressure):
+  1. download   - thread pool over the shared pooled HTTP client
+  2. text       - process pool running pdfplumber text extraction
+  3. extract    - process pool running the regex extractor (no AI quota)
+  4. write      - a single writer saving batches in one DB transaction
+
+Extractions finish in any order, so batches only write tariff_cache
+entries; the live countries/prices tables are rebuilt once at the end from
+the last manifest URL that was saved.
+
+A manifest is either a text file with one URL per line (# comments allowed)
+or a JSON list of URLs / {"url": ...} objects.
+"""
+import argparse
+import contextlib
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from app.models.database import init_db
+from app.services import http_client, db_service
+
+_DONE = object()
+
+
+def load_manifest(path: str) -> list:
+    with open(path) as f:
+        content = f.read()
+    if content.lstrip().startswith(("[", "{")):
+        data = json.loads(content)
+        entries = data.get("urls", []) if isinstance(data, dict) else data
+        return [entry["url"] if isinstance(entry, dict) else entry for entry in entries]
+    return [line.strip() for line in content.splitlines() if line.strip() and not line.strip().startswith("#")]
+
+
+# Stage workers - module level so they can be pickled into the process pools
+
+def download_worker(url: str):
+    start = time.perf_counter()
+    return http_client.download(url), time.perf_counter() - start
+
+
+def text_worker(pdf_content: bytes):
+    from app.services.pdf_service import extract_text_from_pdf
+    start = time.perf_counter()
+    try:
+        text = extract_text_from_pdf(pdf_content)
+    except Exception as e:
+        # HTTPException does not pickle cleanly across processes
+        raise RuntimeError(getattr(e, "detail", str(e)))
+    return text, time.perf_counter() - start
+
+
+def extract_worker(text: str):
+    from app.services.manual_extractor import extract_full_tariff_manual
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = extract_full_tariff_manual(text)
+    return data, time.perf_counter() - start
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.ok = 0
+        self.failed = 0
+        self.busy_s = 0.0
+        self.bytes = 0
+
+
+def run_stage(stats: StageStats, executor, fn, inbox: queue.Queue, outbox: queue.Queue, max_in_flight: int, errors: list):
+    """
+    Move items from `inbox` through `fn` on `executor` into `outbox`, keeping
+    at most `max_in_flight` pending. Items that can't be run (e.g. the pool
+    broke because a worker process died) are counted as failed; the inbox is
+    always read to the end and `outbox` always gets _DONE, so neighbouring
+    stages never block on this one.
+    """
+    in_flight = {}
+    exhausted = False
+
+    def fail(url, e):
+        stats.failed += 1
+        errors.append((stats.name, url, str(e) or type(e).__name__))
+
+    try:
+        while not exhausted or in_flight:
+            while not exhausted and len(in_flight) < max_in_flight:
+                try:
+                    # Only block for new input when nothing is pending
+                    item = inbox.get(timeout=0.05) if in_flight else inbox.get()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    exhausted = True
+                    break
+                url, payload = item
+                try:
+                    in_flight[executor.submit(fn, payload)] = url
+                except Exception as e:  # BrokenProcessPool, or the executor was shut down
+                    fail(url, e)
+
+            if not in_flight:
+                continue
+            done, _ = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = in_flight.pop(future)
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    fail(url, e)
+                    continue
+                stats.ok += 1
+                stats.busy_s += elapsed
+                if isinstance(result, (bytes, str)):
+                    stats.bytes += len(result)
+                outbox.put((url, result))
+    except Exception as e:
+        # Unexpected failure in the stage itself: fail what is pending and what is still queued
+        for url in in_flight.values():
+            fail(url, e)
+        while not exhausted:
+            item = inbox.get()
+            if item is _DONE:
+                exhausted = True
+            else:
+                fail(item[0], e)
+    finally:
+        outbox.put(_DONE)
+
+
+def run_writer(stats: StageStats, inbox: queue.Queue, batch_size: int, errors: list, order: dict):
+    """
+    Single DB writer: saves extractions in batches of `batch_size`, then
+    makes the saved entry latest in manifest order (`order`: url -> position)
+    the live tariff.
+    """
+    batch = []
+    live = None  # (position, url, data) of the saved entry latest in the manifest
+
+    def flush():
+        nonlocal live
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            db_service.save_batch_to_database(batch, update_live=False)
+            stats.ok += len(batch)
+            for url, data in batch:
+                if live is None or order[url] > live[0]:
+                    live = (order[url], url, data)
+        except Exception as e:
+            stats.failed += len(batch)
+            errors.extend(("write", url, str(e)) for url, _ in batch)
+        stats.busy_s += time.perf_counter() - start
+        batch.clear()
+
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            break
+        batch.append(item)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if live is not None:
+        start = time.perf_counter()
+        try:
+            db_service.save_to_database(live[1], live[2])
+        except Exception as e:
+            errors.append(("write", live[1], f"live tables not rebuilt: {e}"))
+        stats.busy_s += time.perf_counter() - start
+
+
+def run_pipeline(urls: list, args) -> dict:
+    queues = [queue.Queue(maxsize=args.queue_size) for _ in range(4)]
+    url_queue, pdf_queue, text_queue, data_queue = queues
+    errors = []
+    stats = {name: StageStats(name) for name in ("download", "text", "extract", "write")}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.download_workers) as downloads, \
+            ProcessPoolExecutor(max_workers=args.text_workers) as text_pool, \
+            ProcessPoolExecutor(max_workers=args.extract_workers) as extract_pool:
+        threads = [
+            threading.Thread(target=run_stage, args=(stats["download"], downloads, download_worker, url_queue, pdf_queue, args.download_workers, errors)),
+            threading.Thread(target=run_stage, args=(stats["text"], text_pool, text_worker, pdf_queue, text_queue, args.text_workers, errors)),
+            threading.Thread(target=run_stage, args=(stats["extract"], extract_pool, extract_worker, text_queue, data_queue, args.extract_workers, errors)),
+            threading.Thread(target=run_writer, args=(stats["write"], data_queue, args.batch_size, errors,
+                                                      {url: i for i, url in enumerate(urls)})),
+        ]
+        for thread in threads:
+            thread.start()
+        for url in urls:
+            url_queue.put((url, url))
+        url_queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    return {"elapsed_s": time.perf_counter() - started, "stages": stats, "errors": errors}
+
+
+def print_report(urls: list, result: dict):
+    elapsed = result["elapsed_s"]
+    stages = result["stages"]
+    written = stages["write"].ok
+
+    print("\n" + "=" * 60)
+    print("THROUGHPUT REPORT")
+    print("=" * 60)
+    print(f"URLs: {len(urls)}   saved: {written}   failed: {len(result['errors'])}   wall time: {elapsed:.2f}s")
+    if elapsed > 0:
+        print(f"Throughput: {written / elapsed:.2f} tariffs/s, "
+              f"{stages['download'].bytes / elapsed / 1e6:.2f} MB/s downloaded")
+    print(f"\n  {'stage':10} {'ok':>5} {'failed':>7} {'busy (s)':>10} {'avg (ms)':>10}")
+    for stage in stages.values():
+        avg = stage.busy_s / stage.ok * 1000 if stage.ok else 0
+        print(f"  {stage.name:10} {stage.ok:5} {stage.failed:7} {stage.busy_s:10.2f} {avg:10.1f}")
+
+    if result["errors"]:
+        print("\nErrors:")
+        for stage, url, message in result["errors"]:
+            print(f"  ✗ [{stage}] {url}: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract many tariff PDFs through a parallel staged pipeline")
+    parser.add_argument("urls", nargs="*", help="tariff PDF URLs")
+    parser.add_argument("--manifest", help="file with one URL per line, or a JSON list")
+    parser.add_argument("--download-workers", type=int, default=8)
+    parser.add_argument("--text-workers", type=int, default=2, help="processes for PDF text extraction")
+    parser.add_argument("--extract-workers", type=int, default=2, help="processes for regex extraction")
+    parser.add_argument("--queue-size", type=int, default=8, help="max items buffered between stages")
+    parser.add_argument("--batch-size", type=int, default=10, help="extractions per DB transaction")
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.manifest:
+        urls += load_manifest(args.manifest)
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        parser.error("no URLs given (pass URLs or --manifest)")
+
+    init_db()
+    print(f"Processing {len(urls)} tariff PDFs...")
+    result = run_pipeline(urls, args)
+    print_report(urls, result)
+    sys.exit(1 if result["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
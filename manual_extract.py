@@ -6,7 +6,8 @@ Run this to extract tariff data using pure regex parsing
 import json
 from app.services.pdf_service import download_pdf, extract_text_from_pdf
 from app.services.manual_extractor import extract_all_services_manual
-from app.services.ai_service_simple import extract_countries_batch
+from app.services.ai_service_simple import extract_countries_chunk
+from app.services.chunk_planner import merge_countries, plan_country_chunks
 
 def main():
     print("=" * 60)
@@ -23,20 +24,20 @@ def main():
     print(f"   Extracted {len(text)} characters")
     
     print("\n3. Extracting countries (using AI - minimal quota usage)...")
-    all_countries = []
-    batches = ["A-C", "D-F", "G-I", "J-L", "M-O", "P-R", "S-U", "V-Z"]
+    results = []
     
-    for batch in batches:
+    for chunk in plan_country_chunks(text):
         try:
-            countries = extract_countries_batch(text, batch)
-            all_countries.extend(countries)
-            print(f"   ✓ {batch}: {len(countries)} countries")
+            countries = extract_countries_chunk(chunk)
+            results.append(countries)
+            print(f"   ✓ {chunk.label}: {len(countries)} countries")
         except Exception as e:
-            print(f"   ✗ {batch}: {e}")
+            print(f"   ✗ {chunk.label}: {e}")
             if "quota" in str(e).lower():
                 print("   ! Quota exceeded for countries. Using cached data if available.")
                 break
     
+    all_countries = merge_countries(results)
     print(f"\n   Total countries: {len(all_countries)}")
     
     print("\n4. Extracting service rates (using regex - no quota)...")
@@ -0,0 +1,68 @@
+"""
+Checks for bulk_extract.run_stage: a worker process that dies must not
+hang the pipeline.
+
+    python test_bulk_extract.py
+"""
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from bulk_extract import _DONE, StageStats, run_stage
+
+
+def _crashing_worker(payload):
+    # Module level so it pickles into the pool
+    if payload == "crash":
+        os._exit(1)
+    return payload.upper(), 0.0
+
+
+def _run(payloads, executor, max_in_flight=2):
+    inbox, outbox = queue.Queue(maxsize=2), queue.Queue()
+    stats, errors = StageStats("text"), []
+
+    def feed():
+        for i, payload in enumerate(payloads):
+            inbox.put((f"url{i}", payload))
+        inbox.put(_DONE)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    stage = threading.Thread(target=run_stage, args=(stats, executor, _crashing_worker, inbox, outbox, max_in_flight, errors), daemon=True)
+    feeder.start()
+    stage.start()
+    stage.join(timeout=30)
+    feeder.join(timeout=5)
+    assert not stage.is_alive() and not feeder.is_alive(), "stage hung"
+    items = []
+    while True:
+        item = outbox.get_nowait()
+        if item is _DONE:
+            break
+        items.append(item)
+    return stats, errors, items
+
+
+def test_worker_process_dies():
+    payloads = ["a", "b", "crash"] + [f"p{i}" for i in range(10)]
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        stats, errors, items = _run(payloads, executor)
+    # The upstream queue was read to the end and every item is accounted for
+    assert stats.ok + stats.failed == len(payloads) and stats.failed >= 10, (stats.ok, stats.failed)
+    assert len(errors) == stats.failed and len(items) == stats.ok
+    assert all(stage == "text" for stage, _, _ in errors)
+    assert ("url12", "P12") not in items
+
+
+def test_healthy_pool():
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        stats, errors, items = _run(["a", "b", "c"], executor)
+    assert (stats.ok, stats.failed, errors) == (3, 0, [])
+    assert sorted(items) == [("url0", "A"), ("url1", "B"), ("url2", "C")]
+
+
+if __name__ == "__main__":
+    test_worker_process_dies()
+    test_healthy_pool()
+    print("✓ bulk extract checks pass")
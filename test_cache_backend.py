@@ -0,0 +1,150 @@
+"""
+Checks for app.services.cache_backend: TTL, LRU eviction, single-flight
+loads (threads, Redis instances and async callers) and lock ownership.
+
+    python test_cache_backend.py
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app.models.database import init_db, make_async_engine, make_engine
+from app.services import db_service, metrics
+from app.services.cache_backend import CacheBackend, MemoryCache, RedisCache, set_cache
+
+try:
+    import fakeredis
+except ImportError:  # Redis checks are skipped without it
+    fakeredis = None
+
+
+def _backends():
+    backends = [MemoryCache(max_entries=8)]
+    if fakeredis is not None:
+        backends.append(RedisCache(client=fakeredis.FakeRedis()))
+    return backends
+
+
+def test_interface_is_abstract():
+    try:
+        CacheBackend()
+    except TypeError:
+        return
+    raise AssertionError("CacheBackend should not be instantiable")
+
+
+def test_ttl():
+    for backend in _backends():
+        backend.set("a", {"x": 1}, ttl=0.05)
+        backend.set("b", [1, 2], ttl=0)  # no expiry
+        assert backend.get("a") == {"x": 1}, backend.name
+        time.sleep(0.08)
+        assert backend.get("a") is None and backend.get("b") == [1, 2], backend.name
+        backend.delete("b")
+        assert backend.get("b") is None, backend.name
+
+
+def test_lru_eviction():
+    cache = MemoryCache(max_entries=3)
+    for i in range(5):
+        cache.set(str(i), i)
+    cache.get("2")  # most recently used now
+    cache.set("5", 5)
+    assert [cache.get(k) for k in "012345"] == [None, None, 2, None, 4, 5] and len(cache) == 3
+
+
+def test_get_or_set_single_flight():
+    for backend in _backends():
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.1)
+            return [1, 2]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(backend.get_or_set("k", load))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1 and results == [[1, 2]] * 8, (backend.name, calls)
+        # None is returned but not cached
+        assert backend.get_or_set("none", lambda: None) is None and backend.get("none") is None
+
+
+def test_redis_lock_across_instances():
+    if fakeredis is None:
+        return
+    server = fakeredis.FakeServer()
+    first = RedisCache(client=fakeredis.FakeRedis(server=server))
+    second = RedisCache(client=fakeredis.FakeRedis(server=server))
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"v": 1}
+
+    thread = threading.Thread(target=lambda: first.get_or_set("q", load))
+    thread.start()
+    time.sleep(0.05)
+    assert second.get_or_set("q", load) == {"v": 1} and len(calls) == 1
+    thread.join()
+
+    # Winning the lock right after another instance stored the value doesn't recompute
+    second.set("r", {"v": 2})
+    assert first._load_and_set("r", load, None) == {"v": 2} and len(calls) == 1
+
+    # A holder whose lock lapsed must not delete the lock another instance now holds
+    lock_key = first._k("q") + ":lock"
+    first.client.set(lock_key, "someone-else")
+    first._release_lock(lock_key, "expired-token")
+    assert first.client.get(lock_key) == b"someone-else"
+    first._release_lock(lock_key, "someone-else")
+    assert first.client.get(lock_key) is None
+
+
+def test_async_single_flight():
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test_cache.db")
+    engine = make_engine(url)
+    init_db(bind=engine)
+    set_cache(MemoryCache())
+    data = {"countries": [{"name": "India", "code": "IN", "export_zone": 1, "import_zone": 1}], "prices": {}}
+    with Session(engine) as session:
+        db_service.save_to_database("https://example.com/guide.pdf", data, session=session)
+    misses = metrics.cache_requests.value(cache="shared", result="miss")
+
+    async def lookups():
+        async_engine = make_async_engine(url)
+        try:
+            # One session per lookup, like concurrent requests
+            sessions = [AsyncSession(async_engine) for _ in range(10)]
+            results = await asyncio.gather(*(
+                db_service.get_cached_data_async("https://example.com/guide.pdf", session=session) for session in sessions
+            ))
+            for session in sessions:
+                await session.close()
+            return results
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(lookups()) == [data] * 10
+    assert metrics.cache_requests.value(cache="shared", result="miss") == misses + 1
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    test_interface_is_abstract()
+    test_ttl()
+    test_lru_eviction()
+    test_get_or_set_single_flight()
+    test_redis_lock_across_instances()
+    test_async_single_flight()
+    print("✓ cache backend checks pass")
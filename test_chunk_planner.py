@@ -0,0 +1,61 @@
+"""
+Checks for app.services.chunk_planner.
+
+    python test_chunk_planner.py
+"""
+from app.services import pdf_service
+from app.services.chunk_planner import FALLBACK_CHARS, FALLBACK_LETTER_RANGES, estimate_tokens, merge_countries, plan_country_chunks, zone_table
+from benchmarks.synthetic_pdf import generate_tariff_pdf
+
+TEXT = pdf_service.extract_text_from_pdf(generate_tariff_pdf(countries=230, weight_rows=20))
+
+
+def test_zone_table_rows():
+    header, rows = zone_table(TEXT)
+    assert len(rows) == 230, len(rows)
+    # The table stops at the first rate table
+    assert not any(row.startswith(("Export", "UPS Worldwide", "Zone 1")) for row in rows)
+
+
+def test_chunks_cover_the_table_in_order():
+    _, rows = zone_table(TEXT)
+    for max_tokens, max_rows in [(3000, 60), (800, 60), (3000, 25), (200, 1000)]:
+        chunks = plan_country_chunks(TEXT, max_tokens=max_tokens, max_rows=max_rows)
+        assert [row for chunk in chunks for row in chunk.rows] == rows, (max_tokens, max_rows)
+        assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+        sizes = [len(chunk.rows) for chunk in chunks]
+        assert max(sizes) - min(sizes) <= 1 and max(sizes) <= max_rows, sizes
+        budget = max_tokens - estimate_tokens(chunks[0].header)
+        assert all(estimate_tokens("\n".join(chunk.rows)) <= budget for chunk in chunks), (max_tokens, sizes)
+        assert all(chunk.header and chunk.text.startswith(chunk.header) for chunk in chunks)
+
+
+def test_fallback_without_zone_table():
+    chunks = plan_country_chunks("x" * (FALLBACK_CHARS + 10))
+    # One small-response request per letter range, not one request for every country
+    assert [chunk.letters for chunk in chunks] == list(FALLBACK_LETTER_RANGES)
+    assert [chunk.index for chunk in chunks] == list(range(len(FALLBACK_LETTER_RANGES)))
+    assert all(not chunk.rows and len(chunk.header) == FALLBACK_CHARS for chunk in chunks)
+    assert chunks[0].label == "letters A-C"
+    # Planned chunks are not restricted by letter
+    assert all(chunk.letters is None for chunk in plan_country_chunks(TEXT))
+
+
+def test_merge_countries():
+    merged = merge_countries([
+        [{"code": "in", "name": "India", "export_zone": None, "import_zone": 4}, {"name": "Atlantis"}],
+        [{"code": "IN", "name": "India", "export_zone": 3, "import_zone": 5}, {"name": "atlantis "}, "junk", {}],
+        None,
+    ])
+    assert merged == [
+        {"code": "in", "name": "India", "export_zone": 3, "import_zone": 4},
+        {"name": "Atlantis"},
+    ], merged
+
+
+if __name__ == "__main__":
+    test_zone_table_rows()
+    test_chunks_cover_the_table_in_order()
+    test_fallback_without_zone_table()
+    test_merge_countries()
+    print("✓ chunk planner checks pass")
@@ -0,0 +1,88 @@
+"""
+Checks that init_db() upgrades a database created by an older version:
+missing columns and indexes are added and legacy tariff_cache rows stay
+readable.
+
+    python test_init_db.py
+"""
+import multiprocessing
+import os
+import tempfile
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from app.models.database import init_db, make_engine
+from app.services import db_service
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE countries (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, code VARCHAR NOT NULL,"
+    " export_zone INTEGER, import_zone INTEGER)",
+    "CREATE TABLE tariff_cache (id INTEGER PRIMARY KEY, pdf_url VARCHAR NOT NULL, data JSON NOT NULL,"
+    " extracted_at DATETIME)",
+]
+LEGACY_DATA = {"countries": [{"name": "India", "code": "IN", "export_zone": 3, "import_zone": 4}], "prices": {}}
+
+
+def _legacy_engine():
+    # A private database, whatever DATABASE_URL other tests imported the app with
+    engine = make_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "legacy.db"))
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(
+            text("INSERT INTO tariff_cache (pdf_url, data, extracted_at) VALUES (:url, :data, CURRENT_TIMESTAMP)"),
+            {"url": "https://example.com/old.pdf", "data": '{"countries": [{"name": "India", "code": "IN", '
+                                                           '"export_zone": 3, "import_zone": 4}], "prices": {}}'},
+        )
+    return engine
+
+
+def _start_worker(url, barrier):
+    engine = make_engine(url)
+    barrier.wait()
+    init_db(bind=engine)
+
+
+def test_upgrade_legacy_database():
+    engine = _legacy_engine()
+    init_db(bind=engine)
+    init_db(bind=engine)  # repeated startups are no-ops
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("tariff_cache")}
+    assert {"payload", "encoding", "content_hash", "size_bytes"} <= columns, columns
+    indexes = {table: {index["name"] for index in inspector.get_indexes(table)} for table in inspector.get_table_names()}
+    assert "ix_tariff_cache_pdf_url" in indexes["tariff_cache"], indexes
+    assert "ix_countries_code" in indexes["countries"], indexes
+
+    # Legacy rows are read as before; new saves are compressed alongside them
+    with Session(engine) as session:
+        assert db_service.get_cached_data("https://example.com/old.pdf", max_age_days=1, session=session) == LEGACY_DATA
+        db_service.save_to_database("https://example.com/new.pdf", LEGACY_DATA, session=session)
+        assert db_service.get_cached_data("https://example.com/new.pdf", session=session) == LEGACY_DATA
+    engine.dispose()
+
+
+def test_concurrent_startup():
+    # Every worker runs init_db in its lifespan; they all see the same missing columns
+    for _ in range(2):
+        engine = _legacy_engine()
+        url = str(engine.url)
+        engine.dispose()
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(4)
+        workers = [context.Process(target=_start_worker, args=(url, barrier)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert [worker.exitcode for worker in workers] == [0] * 4
+        columns = {column["name"] for column in inspect(make_engine(url)).get_columns("tariff_cache")}
+        assert {"payload", "encoding", "content_hash", "size_bytes"} <= columns, columns
+
+
+if __name__ == "__main__":
+    test_upgrade_legacy_database()
+    test_concurrent_startup()
+    print("✓ legacy database upgraded")
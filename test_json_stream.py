@@ -0,0 +1,106 @@
+"""
+Checks for app.services.json_stream: the parser must give the same result
+however the response is split into chunks, and reject bad rows early.
+
+    python test_json_stream.py
+"""
+import json
+import random
+
+from app.services.json_stream import RowStreamParser, StreamError, parse_stream
+
+
+def _row(weight, zones=9, **overrides):
+    row = {"weight": weight, "zones": {f"zone_{i}": 1000 + i for i in range(1, zones + 1)}}
+    row["zones"].update(overrides)
+    return row
+
+
+GOOD = {
+    "envelopes": [_row("Envelope")],
+    "documents": [_row(f"{i / 2} kg") for i in range(1, 41)],
+    "non_documents": [dict(_row("21-44 kg"), pricing_type="per_kg"), _row("45-70 kg", zone_9=None)],
+    "note": 'braces {"in": [strings]} and \\"escapes\\" are not structure',
+}
+EXPECTED = {section: GOOD[section] for section in ("envelopes", "documents", "non_documents")}
+
+
+def _splits(text, seed):
+    """Random chunk boundaries, including 1-character chunks"""
+    rng = random.Random(seed)
+    i = 0
+    while i < len(text):
+        size = rng.choice([1, 2, rng.randint(1, 80)])
+        yield text[i:i + size]
+        i += size
+
+
+def test_any_chunking_gives_the_same_rows():
+    for text in (json.dumps(GOOD), "```json\n" + json.dumps(GOOD, indent=2) + "\n```\n"):
+        assert parse_stream([text]) == EXPECTED
+        assert parse_stream(text) == EXPECTED  # one character at a time
+        for seed in range(50):
+            assert parse_stream(_splits(text, seed)) == EXPECTED, seed
+
+
+def test_rows_are_emitted_as_they_complete():
+    text = json.dumps(GOOD)
+    parser = RowStreamParser()
+    emitted = []
+    for chunk in _splits(text, 1):
+        emitted.extend(parser.feed(chunk))
+        # Every completed row is already out; nothing is held back to the end
+        assert len(emitted) == sum(len(rows) for rows in parser.rows.values())
+    assert [row for _, row in emitted] == GOOD["envelopes"] + GOOD["documents"] + GOOD["non_documents"]
+    assert parser.finish() == EXPECTED
+
+
+def test_bad_row_aborts_before_the_end():
+    bad = dict(GOOD, documents=GOOD["documents"][:3] + [_row("2 kg", zone_3="4,169")] + GOOD["documents"][3:])
+    text = json.dumps(bad)
+    parser = RowStreamParser()
+    consumed = 0
+    try:
+        for chunk in _splits(text, 7):
+            consumed += len(chunk)
+            parser.feed(chunk)
+    except StreamError as e:
+        assert "zone_3" in str(e)
+    else:
+        raise AssertionError("bad row was accepted")
+    assert consumed < len(text) / 4, (consumed, len(text))
+
+
+def test_invalid_responses():
+    for label, text in [
+        ("truncated", json.dumps(GOOD)[:-40]),
+        ("zone count", json.dumps({"documents": [_row("1 kg"), _row("2 kg", zones=8)]})),
+        ("zone names", json.dumps({"documents": [{"weight": "1 kg", "zones": {"zone_1": 1, "zone_3": 2}}]})),
+        ("float price", json.dumps({"documents": [_row("1 kg", zone_2=1.5)]})),
+        ("no weight", json.dumps({"documents": [{"zones": {"zone_1": 1}}]})),
+        ("section not array", '{"documents": {"a": 1}}'),
+        ("scalar row", '{"documents": [1, 2]}'),
+        ("top-level array", "[]"),
+        ("unbalanced", '{"documents": [}]}'),
+        ("trailing data", json.dumps(GOOD) + " {}"),
+    ]:
+        for seed in range(5):
+            try:
+                parse_stream(_splits(text, seed))
+            except StreamError:
+                continue
+            raise AssertionError(f"{label} was accepted")
+
+
+def test_validation_can_be_disabled():
+    text = json.dumps({"documents": [_row("1 kg", zone_2="n/a")]})
+    assert parse_stream([text], validate=False)["documents"][0]["zones"]["zone_2"] == "n/a"
+
+
+if __name__ == "__main__":
+    test_any_chunking_gives_the_same_rows()
+    test_rows_are_emitted_as_they_complete()
+    test_bad_row_aborts_before_the_end()
+    test_invalid_responses()
+    test_validation_can_be_disabled()
+    print("✓ json stream checks pass")
@@ -0,0 +1,161 @@
+"""
+Hand-computed pricing fixtures for app.services.pricing.
+
+    python test_pricing.py
+"""
+import contextlib
+import io
+import random
+
+from app.models.tariff import Tariff
+from app.services import manual_extractor, optimizer, pdf_service
+from app.services.pricing import Piece, Shipment, PricingError, price_batch, price_shipment
+from benchmarks.synthetic_pdf import generate_tariff_pdf
+
+TARIFF = Tariff.from_dict({
+    "countries": [],
+    "prices": {
+        "express": {
+            "envelopes": [{"weight": "Envelope", "zones": {"zone_1": 1000, "zone_2": 1200}}],
+            "documents": [
+                {"weight": "0.5 kg", "zones": {"zone_1": 1500, "zone_2": 1700}},
+                {"weight": "1.0 kg", "zones": {"zone_1": 2000, "zone_2": 2300}},
+            ],
+            "non_documents": [
+                {"weight": "0.5 kg", "zones": {"zone_1": 1800, "zone_2": 2000}},
+                {"weight": "1.0 kg", "zones": {"zone_1": 2400, "zone_2": 2600}},
+                {"weight": "1.5 kg", "zones": {"zone_1": 3000, "zone_2": 3300}},
+                {"weight": "20.0 kg", "zones": {"zone_1": 9000, "zone_2": 9900}},
+                {"weight": "21-44 kg", "pricing_type": "per_kg", "zones": {"zone_1": 400, "zone_2": 450}},
+                {"weight": "45-70 kg", "pricing_type": "per_kg", "zones": {"zone_1": 380, "zone_2": 420}},
+                {"weight": "Above 70 kg", "pricing_type": "per_kg", "zones": {"zone_1": 350, "zone_2": 400}},
+            ],
+        },
+        "express_freight": {
+            "envelopes": [],
+            "documents": [],
+            "non_documents": [
+                {"weight": "Min rate", "pricing_type": "per_kg", "zones": {"zone_1": 50000, "zone_2": 60000}},
+                {"weight": "71-99 kg", "pricing_type": "per_kg", "zones": {"zone_1": 700, "zone_2": 800}},
+                {"weight": "100-299 kg", "pricing_type": "per_kg", "zones": {"zone_1": 650, "zone_2": 750}},
+                {"weight": "1000 kg or more", "pricing_type": "per_kg", "zones": {"zone_1": 500, "zone_2": 600}},
+            ],
+        },
+    },
+})
+
+# (service, item_type, zone, pieces, expected billed kg, expected band, expected amount)
+FIXTURES = [
+    ("express", "envelopes", 2, [Piece(0.2)], 0.5, "Envelope", 1200),
+    ("express", "documents", 1, [Piece(0.7)], 1.0, "1.0 kg", 2000),
+    # 1.2 kg actual rounds up to the 1.5 kg break
+    ("express", "non_documents", 1, [Piece(1.2)], 1.5, "1.5 kg", 3000),
+    # 30x20x10 cm = 1.2 kg volumetric beats 0.4 kg actual
+    ("express", "non_documents", 2, [Piece(0.4, 30, 20, 10)], 1.5, "1.5 kg", 3300),
+    # Two pieces, 10.2 + 10.1 = 20.3 kg -> past the 20 kg break, whole-kg per-kg band: 21 x 400
+    ("express", "non_documents", 1, [Piece(10.2), Piece(10.1)], 21, "21-44 kg", 8400),
+    # 44.2 kg rounds up to 45 kg -> 45-70 band: 45 x 420
+    ("express", "non_documents", 2, [Piece(44.2)], 45, "45-70 kg", 18900),
+    ("express", "non_documents", 1, [Piece(120)], 120, "Above 70 kg", 42000),
+    # 71 kg x 700 = 49,700 is below the 50,000 minimum
+    ("express_freight", "non_documents", 1, [Piece(71)], 71, "71-99 kg", 50000),
+    # Below the first freight band: first band's rate, then the minimum
+    ("express_freight", "non_documents", 2, [Piece(40)], 40, "71-99 kg", 60000),
+    ("express_freight", "non_documents", 1, [Piece(150)], 150, "100-299 kg", 97500),
+    ("express_freight", "non_documents", 2, [Piece(1200)], 1200, "1000 kg or more", 720000),
+]
+
+
+def test_pricing_fixtures():
+    for service, item_type, zone, pieces, billed, band, amount in FIXTURES:
+        quote = price_shipment(TARIFF, service, Shipment(pieces, zone, item_type))
+        assert (quote.billed_kg, quote.band, quote.amount) == (billed, band, amount), (service, item_type, pieces, quote)
+
+
+def test_unpriceable_shipments():
+    for service, item_type, pieces in [
+        ("express", "envelopes", [Piece(0.8)]),
+        ("express", "documents", [Piece(3)]),
+        ("express_freight", "non_documents", [Piece(500)]),
+        ("express", "non_documents", []),
+        ("express", "non_documents", [Piece(0)]),
+        ("express", "non_documents", [Piece(1.0), Piece(-2.0)]),
+        ("express", "non_documents", [Piece(1.0, -10, 10, 10)]),
+    ]:
+        try:
+            price_shipment(TARIFF, service, Shipment(pieces, 1, item_type))
+        except PricingError:
+            continue
+        raise AssertionError(f"{service}/{item_type} {pieces} should not be priceable")
+
+
+def test_batch_matches_single():
+    shipments = [Shipment(pieces, zone, item_type) for service, item_type, zone, pieces, *_ in FIXTURES if service == "express"]
+    shipments.append(Shipment([Piece(0.8)], 1, "envelopes"))
+    quotes = price_batch(TARIFF, "express", shipments)
+    for shipment, quote in zip(shipments[:-1], quotes):
+        assert quote.amount == price_shipment(TARIFF, "express", shipment).amount
+    assert quotes[-1].error and quotes[-1].amount is None
+
+
+
+def _synthetic_shipments(count=300, seed=3):
+    rng = random.Random(seed)
+    shipments = []
+    for _ in range(count):
+        item_type = rng.choice(["envelopes", "documents", "non_documents", "non_documents"])
+        heavy = rng.random() < 0.3
+        pieces = [
+            Piece(round(rng.uniform(0.1, 400 if heavy else 25), 1),
+                  *(rng.choice([0, rng.randint(5, 120)]) for _ in range(3)))
+            for _ in range(rng.randint(1, 3))
+        ]
+        shipments.append(Shipment(pieces, rng.randint(1, 11), item_type))
+    return shipments
+
+
+def test_batch_matches_single_on_synthetic_tariff():
+    text = pdf_service.extract_text_from_pdf(generate_tariff_pdf(countries=20, weight_rows=20))
+    with contextlib.redirect_stdout(io.StringIO()):
+        tariff = Tariff.from_dict(manual_extractor.extract_full_tariff_manual(text))
+    shipments = _synthetic_shipments()
+    for service in optimizer.SERVICES:
+        for shipment, quote in zip(shipments, price_batch(tariff, service, shipments)):
+            try:
+                single = price_shipment(tariff, service, shipment).to_dict()
+            except PricingError as e:
+                assert quote.error == str(e), (service, shipment, quote)
+                continue
+            assert quote.to_dict() == single, (service, shipment, quote)
+
+    # The optimizer's options are the single-shipment prices, cheapest first
+    result = optimizer.optimize(tariff, [
+        {"pieces": [{"weight_kg": p.weight_kg, "length_cm": p.length_cm, "width_cm": p.width_cm, "height_cm": p.height_cm}
+                    for p in shipment.pieces], "zone": shipment.zone, "item_type": shipment.item_type}
+        for shipment in shipments
+    ], lambda query: None)
+    for shipment, row in zip(shipments, result["results"]):
+        for option in row["options"]:
+            assert option["amount"] == price_shipment(tariff, option["service"], shipment).amount
+        amounts = [option["amount"] for option in row["options"]]
+        assert amounts == sorted(amounts)
+
+
+def test_odd_zone_keys_round_trip():
+    data = {"countries": [], "prices": {"express": {"envelopes": [], "documents": [
+        {"weight": "0.5 kg", "zones": {"zone_0": 900, "zone_01": 950, "zone_1": 1000, "zone_3": None, "zone_x": "n/a"}},
+    ], "non_documents": []}}}
+    tariff = Tariff.from_dict(data)
+    table = tariff.table("express", "documents")
+    assert table.zone_count == 3 and table.rows[0].price(1) == 1000 and table.rows[0].price(0) is None
+    assert table.rows[0].raw_zones == {"zone_0": 900, "zone_01": 950, "zone_3": None, "zone_x": "n/a"}
+    assert tariff.to_dict() == data
+
+
+if __name__ == "__main__":
+    test_pricing_fixtures()
+    test_unpriceable_shipments()
+    test_batch_matches_single()
+    test_batch_matches_single_on_synthetic_tariff()
+    test_odd_zone_keys_round_trip()
+    print(f"✓ {len(FIXTURES)} pricing fixtures match")
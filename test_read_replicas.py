@@ -0,0 +1,130 @@
+"""
+Checks for app.models.database.RoutingSession with a primary and two
+replicas (three SQLite files): writes go to the primary, reads to one
+replica per session, and callers read their own writes.
+
+    python test_read_replicas.py
+"""
+import asyncio
+import os
+import tempfile
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import database
+from app.models.database import Base, Country, RoutingSession, make_async_engine, make_engine, mark_write, use_primary
+
+
+def _databases():
+    directory = tempfile.mkdtemp()
+    engines = {}
+    for name in ("primary", "replica1", "replica2"):
+        engines[name] = make_engine("sqlite:///" + os.path.join(directory, f"{name}.db"))
+        Base.metadata.create_all(engines[name])
+        # Each database answers reads with its own name, so a read shows where it was routed
+        with Session(engines[name]) as session:
+            session.add(Country(name=name, code="XX"))
+            session.commit()
+    return engines
+
+
+def _routed(engines):
+    return type("_TestRoutingSession", (RoutingSession,), {
+        "primary": engines["primary"],
+        "replicas": (engines["replica1"], engines["replica2"]),
+    })
+
+
+def _source(session) -> str:
+    return session.execute(select(Country.name).where(Country.code == "XX")).scalar()
+
+
+def test_writes_go_to_the_primary():
+    engines = _databases()
+    session_class = _routed(engines)
+    database._last_write_at = 0.0
+    with session_class() as session:
+        assert _source(session).startswith("replica")
+        session.add(Country(name="Atlantis", code="AT"))
+        session.commit()
+    for name, engine in engines.items():
+        with Session(engine) as session:
+            written = session.execute(select(Country).where(Country.code == "AT")).scalar()
+        assert (written is not None) == (name == "primary"), name
+
+
+def test_one_replica_per_session():
+    engines = _databases()
+    session_class = _routed(engines)
+    database._last_write_at = 0.0
+    used = set()
+    for _ in range(4):
+        with session_class() as session:
+            sources = {_source(session) for _ in range(5)}
+            assert len(sources) == 1 and sources <= {"replica1", "replica2"}, sources
+            used |= sources
+            session.close()
+            assert "replica" not in session.info
+    # Sessions are still spread over both replicas
+    assert used == {"replica1", "replica2"}, used
+
+
+def test_read_your_writes():
+    engines = _databases()
+    session_class = _routed(engines)
+    database._last_write_at = 0.0
+    with session_class() as session:
+        assert _source(session).startswith("replica")
+        with use_primary():
+            assert _source(session) == "primary"
+        # A write in this transaction pins the rest of it to the primary
+        session.add(Country(name="Atlantis", code="AT"))
+        session.flush()
+        assert _source(session) == "primary"
+        session.commit()
+    # The commit marked a write; new sessions read from the primary for a while
+    with session_class() as session:
+        assert _source(session) == "primary"
+    database._last_write_at -= database.READ_YOUR_WRITES_SECONDS + 1
+    with session_class() as session:
+        assert _source(session).startswith("replica")
+    mark_write()
+    with session_class() as session:
+        assert _source(session) == "primary"
+    database._last_write_at = 0.0
+
+
+def test_async_sessions_route_the_same_way():
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    engines = _databases()
+    database._last_write_at = 0.0
+
+    async def reads():
+        async_engines = {name: make_async_engine(str(engine.url)) for name, engine in engines.items()}
+        routed = type("_TestAsyncRoutingSession", (RoutingSession,), {
+            "primary": async_engines["primary"].sync_engine,
+            "replicas": (async_engines["replica1"].sync_engine, async_engines["replica2"].sync_engine),
+        })
+        try:
+            sources = []
+            for _ in range(2):
+                async with AsyncSession(sync_session_class=routed) as session:
+                    sources.append({(await session.execute(select(Country.name).where(Country.code == "XX"))).scalar()
+                                    for _ in range(3)})
+            return sources
+        finally:
+            for engine in async_engines.values():
+                await engine.dispose()
+
+    first, second = asyncio.run(reads())
+    assert len(first) == len(second) == 1 and first | second == {"replica1", "replica2"}, (first, second)
+
+
+if __name__ == "__main__":
+    test_writes_go_to_the_primary()
+    test_one_replica_per_session()
+    test_read_your_writes()
+    test_async_sessions_route_the_same_way()
+    print("✓ read replica routing checks pass")
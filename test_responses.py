@@ -0,0 +1,60 @@
+"""
+Checks for app.api.responses: per-coding ETags, conditional requests and
+Accept-Encoding q-values.
+
+    python test_responses.py
+"""
+import gzip
+import json
+
+from starlette.requests import Request
+
+from app.api.responses import _negotiate_encoding, json_response
+
+PAYLOAD = {"countries": [{"name": "India", "code": "IN"}] * 200}
+
+
+def _request(**headers) -> Request:
+    return Request({"type": "http", "headers": [
+        (name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()
+    ]})
+
+
+def test_etag_differs_per_coding():
+    identity = json_response(_request(), PAYLOAD)
+    gzipped = json_response(_request(accept_encoding="gzip"), PAYLOAD)
+    assert "content-encoding" not in identity.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+    assert json.loads(gzip.decompress(gzipped.body)) == json.loads(identity.body)
+
+
+def test_revalidation_with_any_coding():
+    etag = json_response(_request(), PAYLOAD).headers["etag"]
+    gzip_etag = etag[:-1] + '-gzip"'
+    for sent in (etag, gzip_etag, "W/" + gzip_etag, f'"other", {gzip_etag}'):
+        response = json_response(_request(accept_encoding="gzip", if_none_match=sent), PAYLOAD)
+        assert response.status_code == 304 and not response.body, sent
+    response = json_response(_request(if_none_match='"other"'), PAYLOAD)
+    assert response.status_code == 200 and response.headers["etag"] == etag
+
+
+def test_qvalues():
+    for header, expected in [
+        ("gzip", "gzip"),
+        ("gzip;q=0.5", "gzip"),
+        ("GZIP; Q=1", "gzip"),
+        ("gzip;q=0", None),
+        ("gzip;q=0.0", None),
+        ("gzip; q=0.000, identity", None),
+        ("gzip;q=bogus", None),
+        ("", None),
+    ]:
+        assert _negotiate_encoding(_request(accept_encoding=header)) == expected, header
+
+
+if __name__ == "__main__":
+    test_etag_differs_per_coding()
+    test_revalidation_with_any_coding()
+    test_qvalues()
+    print("✓ response checks pass")
@@ -0,0 +1,83 @@
+"""
+Checks for app.services.tariff_diff.diff_tariffs.
+
+    python test_tariff_diff.py
+"""
+import copy
+
+from app.services.tariff_diff import diff_tariffs, is_empty
+
+
+def _row(weight, *prices):
+    return {"weight": weight, "zones": {f"zone_{i}": price for i, price in enumerate(prices, 1)}}
+
+
+OLD = {
+    "countries": [
+        {"name": "Albania", "code": "AL", "export_zone": 3, "import_zone": 4},
+        {"name": "Belgium", "code": "BE", "export_zone": 1, "import_zone": 1},
+    ],
+    "prices": {
+        "express": {
+            "documents": [_row("0.5 kg", *range(1000, 1011)), _row("1.0 kg", *range(2000, 2011))],
+            "non_documents": [_row("0.5 kg", 1500, 1600), _row("21-44 kg", 400, 450)],
+        },
+    },
+}
+
+
+def test_identical_versions():
+    diff = diff_tariffs(OLD, copy.deepcopy(OLD))
+    assert is_empty(diff) and diff["affected"] == {"services": [], "zones": {}, "countries": []}
+
+
+def test_changes_are_classified():
+    new = copy.deepcopy(OLD)
+    express = new["prices"]["express"]
+    express["documents"][0]["zones"]["zone_10"] += 25  # zone_10 must not sort next to zone_1
+    express["non_documents"].pop()  # removed band
+    express["non_documents"].append(_row("45-70 kg", 380, 420))  # added band
+    new["countries"][0]["export_zone"] = 5
+    new["countries"].pop()
+    new["countries"].append({"name": "Chad", "code": "TD", "export_zone": 9, "import_zone": 9})
+
+    diff = diff_tariffs(OLD, new)
+    assert diff["summary"] == {
+        "price_changes": 1, "added_bands": 1, "removed_bands": 1,
+        "zone_changes": 1, "added_countries": 1, "removed_countries": 1,
+    }, diff["summary"]
+    assert diff["price_changes"] == [{
+        "service": "express", "item_type": "documents", "weight": "0.5 kg",
+        "zone": "zone_10", "from": 1009, "to": 1034, "delta": 25,
+    }]
+    assert diff["added_bands"][0]["weight"] == "45-70 kg" and diff["removed_bands"][0]["weight"] == "21-44 kg"
+    assert diff["zone_changes"][0]["export_zone"] == {"from": 3, "to": 5}
+    assert [c["code"] for c in diff["added_countries"]] == ["TD"]
+    assert [c["code"] for c in diff["removed_countries"]] == ["BE"]
+    assert diff["affected"]["zones"] == {"express": [1, 2, 10]}
+    assert diff["affected"]["countries"] == ["AL", "BE", "TD"]
+
+
+def test_repeated_labels_compare_by_position():
+    old = {"countries": [], "prices": {"expedited": {"non_documents": [_row("Min rate", 100), _row("Min rate", 200)]}}}
+    new = copy.deepcopy(old)
+    new["prices"]["expedited"]["non_documents"][1]["zones"]["zone_1"] = 250
+    diff = diff_tariffs(old, new)
+    assert [(c["from"], c["to"]) for c in diff["price_changes"]] == [(200, 250)]
+
+
+def test_partial_rows_and_missing_prices():
+    new = copy.deepcopy(OLD)
+    del new["prices"]["express"]["non_documents"][0]["zones"]["zone_2"]
+    new["prices"]["express"]["non_documents"][1]["zones"]["zone_1"] = None
+    diff = diff_tariffs(OLD, new)
+    changes = {(c["weight"], c["zone"]): (c["from"], c["to"], c["delta"]) for c in diff["price_changes"]}
+    assert changes == {("0.5 kg", "zone_2"): (1600, None, None), ("21-44 kg", "zone_1"): (400, None, None)}
+
+
+if __name__ == "__main__":
+    test_identical_versions()
+    test_changes_are_classified()
+    test_repeated_labels_compare_by_position()
+    test_partial_rows_and_missing_prices()
+    print("✓ tariff diff checks pass")
@@ -0,0 +1,114 @@
+"""
+Checks for app.services.validation and the manual extractor's table boundaries.
+
+    python test_validation.py
+"""
+import contextlib
+import copy
+import io
+
+from app.services import manual_extractor, pdf_service, validation
+from benchmarks.synthetic_pdf import generate_tariff_pdf
+
+
+def _table(*rows):
+    return [{"weight": weight, "zones": {"zone_1": z1, "zone_2": z2}} for weight, z1, z2 in rows]
+
+
+CLEAN = {
+    "countries": [
+        {"name": "Albania", "code": "AL", "export_zone": 1, "import_zone": 2},
+        {"name": "Belgium", "code": "BE", "export_zone": 2, "import_zone": 1},
+    ],
+    "prices": {
+        "express": {
+            "envelopes": _table(("Envelope", 1000, 1200)),
+            "documents": _table(("0.5 kg", 1500, 1700), ("1.0 kg", 2000, 2300)),
+            "non_documents": _table(("0.5 kg", 1800, 2000), ("1.0 kg", 2400, 2600), ("21-44 kg", 400, 450)),
+        },
+        "express_plus": {
+            "envelopes": _table(("Envelope", 2000, 2200)),
+            "documents": _table(("0.5 kg", 2500, 2700), ("1.0 kg", 3000, 3300)),
+            "non_documents": _table(("0.5 kg", 2800, 3000), ("1.0 kg", 3400, 3600)),
+        },
+        "express_freight": {
+            "envelopes": [],
+            "documents": [],
+            "non_documents": _table(("Min rate", 50000, 60000), ("71-99 kg", 700, 800), ("100-299 kg", 650, 750)),
+        },
+    },
+}
+
+
+def _checks(report):
+    return [(i.check, i.severity, i.service) for i in report.issues]
+
+
+def test_clean_fixture_is_ok():
+    report = validation.validate_extraction(CLEAN, reference=CLEAN)
+    assert report.ok and not report.issues, report.to_dict()
+
+
+def test_detects_broken_tables():
+    bad = copy.deepcopy(CLEAN)
+    docs = bad["prices"]["express"]["documents"]
+    docs[1]["zones"]["zone_2"] = "2,300"
+    bad["prices"]["express_plus"]["non_documents"].reverse()
+    del bad["prices"]["express_freight"]["non_documents"][2]["zones"]["zone_2"]
+    bad["countries"].append({"name": "Bulgaria", "code": "BE", "export_zone": 9, "import_zone": 1})
+    report = validation.validate_extraction(bad, reference=CLEAN)
+    assert ("zones", "error", "express") in _checks(report)
+    assert ("weights", "error", "express_plus") in _checks(report)
+    assert ("zones", "error", "express_freight") in _checks(report)
+    assert ("row_count", "error", "express_freight") not in _checks(report)
+    assert ("duplicates", "error", None) in _checks(report)
+    assert report.failing_services() == ["express", "express_plus", "express_freight"]
+
+
+def test_shared_table_severity():
+    shared = copy.deepcopy(CLEAN)
+    shared["prices"]["express_plus"] = copy.deepcopy(shared["prices"]["express"])
+    assert _checks(validation.validate_extraction(shared)) == [("shared_table", "error", "express_plus")]
+    report = validation.validate_extraction(shared, manual=True)
+    assert _checks(report) == [("shared_table", "warning", "express_plus")] and report.ok
+
+
+def test_repair_keeps_only_improvements():
+    bad = copy.deepcopy(CLEAN)
+    bad["prices"]["express"]["documents"] = []
+    bad["prices"]["express_plus"]["documents"][0]["zones"]["zone_1"] = 3500
+    calls = []
+
+    def reextract(service):
+        calls.append(service)
+        if service == "express":
+            return copy.deepcopy(CLEAN["prices"]["express"])
+        return {"envelopes": [], "documents": [], "non_documents": []}
+
+    fixed, report = validation.repair(bad, reextract, reference=CLEAN)
+    assert calls == ["express", "express_plus"]
+    assert fixed["prices"]["express"] == CLEAN["prices"]["express"]
+    assert fixed["prices"]["express_plus"] == bad["prices"]["express_plus"]
+    assert report.failing_services() == ["express_plus"]
+
+    fixed, report = validation.repair(bad, None, reference=CLEAN)
+    assert fixed is bad and report.failing_services() == ["express", "express_plus"]
+
+
+def test_manual_extraction_stays_in_its_table():
+    text = pdf_service.extract_text_from_pdf(generate_tariff_pdf(countries=20, weight_rows=20))
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = manual_extractor.extract_full_tariff_manual(text)
+    report = validation.validate_extraction(data, manual=True)
+    assert report.ok, [i.to_dict() for i in report.errors]
+    weights = [row["weight"] for row in data["prices"]["express_saver"]["non_documents"]]
+    assert "0 kg" not in weights and len(weights) == len(set(weights)), weights
+
+
+if __name__ == "__main__":
+    test_clean_fixture_is_ok()
+    test_detects_broken_tables()
+    test_shared_table_severity()
+    test_repair_keeps_only_improvements()
+    test_manual_extraction_stays_in_its_table()
+    print("✓ validation checks pass")
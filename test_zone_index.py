@@ -0,0 +1,45 @@
+"""
+Checks for app.services.zone_index: an index over a compiled Tariff reads
+rates from its price arrays and answers exactly like one built from the
+stored dict.
+
+    python test_zone_index.py
+"""
+import contextlib
+import io
+
+from app.models.tariff import Tariff
+from app.services import manual_extractor, pdf_service
+from app.services.zone_index import SERVICE_NAMES, ZoneIndex
+from benchmarks.synthetic_pdf import generate_tariff_pdf
+
+text = pdf_service.extract_text_from_pdf(generate_tariff_pdf(countries=60, weight_rows=20))
+with contextlib.redirect_stdout(io.StringIO()):
+    DATA = manual_extractor.extract_full_tariff_manual(text)
+# Zone keys that can't go in a price slot, a null and a non-numeric price
+DATA["prices"]["express"]["documents"][0]["zones"].update({"zone_0": 5, "zone_02": 7, "zone_3": None, "zone_4": "n/a"})
+
+
+def test_tariff_index_matches_dict_index():
+    from_dict = ZoneIndex(DATA)
+    from_tariff = ZoneIndex.from_tariff(Tariff.from_dict(DATA), DATA["countries"])
+    assert not from_tariff.rates_by_zone  # nothing copied out of the price arrays
+    rates = 0
+    for service in list(SERVICE_NAMES) + ["Express Saver", "unknown"]:
+        for zone in range(-1, 15):
+            assert from_tariff.rates_in_zone(zone, service) == from_dict.rates_in_zone(zone, service), (service, zone)
+            rates += len(from_tariff.rates_in_zone(zone, service))
+    assert rates > 1000, rates
+    for zone in range(12):
+        assert from_tariff.tariff_response(zone) == from_dict.tariff_response(zone), zone
+
+
+def test_empty_tariff():
+    assert not ZoneIndex.from_tariff(Tariff.from_dict({"countries": [], "prices": {}}), [])
+    assert ZoneIndex.from_tariff(Tariff.from_dict(DATA), [])
+
+
+if __name__ == "__main__":
+    test_tariff_index_matches_dict_index()
+    test_empty_tariff()
+    print("✓ zone index checks pass")